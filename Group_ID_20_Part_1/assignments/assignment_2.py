@@ -4,11 +4,13 @@ import logging as log
 import asyncio
 
 from modules.data import Data
+from modules.dimension import Dimension
 from modules.utils import (
     get_root, get_paths, remove_brackets_and_following, 
-    remove_after_symbols, remove_irrelevants, remove_quotes, handle_punctation
+    remove_after_symbols, remove_irrelevants, remove_quotes, handle_punctation, surrogate_key
 )
 from modules.utils import log_execution
+from modules.schema import SCHEMA_DEFINITIONS
 from shapely.wkt import loads
 from typing import List, Dict, Optional, Tuple
 
@@ -71,7 +73,7 @@ def cast_columns(obj: Data, columns: List[str], cast_type: type) -> None:
         obj.cast_column(column, cast_type)
 
 @log_execution
-async def process_crashes(obj: Data, beats: Data) -> None:
+async def process_crashes(obj: Data, beats: Data, integer_keys: bool = False) -> None:
     """
     Processes the crash data by applying replacements, filtering rows, 
     handling missing values, and enhancing data with new calculated fields.
@@ -79,9 +81,11 @@ async def process_crashes(obj: Data, beats: Data) -> None:
     Args:
         `obj (Data)`: The Data object containing the crash data.
         `beats (Data)`: The Data object containing the police beat data for geographic information.
+        `integer_keys (bool, optional)`: Whether to generate integer surrogate keys. Defaults to False.
     """
-    beats_map = {
-        beat["BEAT_NUM"].lstrip('0'): loads(beat["the_geom"])  
+    # Later beats override earlier ones sharing the same number. The beats dataset is left untouched.
+    beat_centroids = {
+        beat["BEAT_NUM"].lstrip('0'): loads(beat["the_geom"]).centroid
         for beat in beats.rows
     }
 
@@ -111,8 +115,8 @@ async def process_crashes(obj: Data, beats: Data) -> None:
     for row in obj.rows:
         if row.get("LONGITUDE") == '' and row.get("LATITUDE") == '':
             beat_num = str(int(float(row["BEAT_OF_OCCURRENCE"]))).lstrip('0')
-            if beat_num in beats_map:
-                centroids = beats_map[beat_num].centroid
+            if beat_num in beat_centroids:
+                centroids = beat_centroids[beat_num]
                 row["LATITUDE"], row["LONGITUDE"] = round(centroids.y, 6), round(centroids.x, 6)
 
         row["LOCATION"] = obj.get_geohash(float(row["LATITUDE"]), float(row["LONGITUDE"]))
@@ -127,24 +131,40 @@ async def process_crashes(obj: Data, beats: Data) -> None:
         for field in ["TRAFFICWAY_TYPE", "REPORT_TYPE", "PRIM_CONTRIBUTORY_CAUSE", "SEC_CONTRIBUTORY_CAUSE"]:
             row[field] = remove_brackets_and_following(row[field])
 
+    # The rows were modified in place, after `filter_rows` indexed them.
+    obj.invalidate_indexes()
+
     cast_columns(obj, [
         "BEAT_OF_OCCURRENCE", "NUM_UNITS", "INJURIES_TOTAL", "INJURIES_FATAL",
         "INJURIES_INCAPACITATING", "INJURIES_NON_INCAPACITATING", 
         "INJURIES_REPORTED_NOT_EVIDENT", "INJURIES_NO_INDICATION"
     ], int)
 
+    # Dimension members are deduplicated on all their attributes, so that crashes sharing the same
+    # date, location or injury profile reference the same surrogate key. The `DATE` and `LOCATION`
+    # members hold the exact time and coordinates of the crash, so they are rarely shared.
+    dimensions = {
+        "DATE_ID": Dimension("DATE_ID", SCHEMA_DEFINITIONS["DATE"][1:], surrogate_key("DT", integer_keys)),
+        "LOCATION_ID": Dimension("LOCATION_ID", SCHEMA_DEFINITIONS["LOCATION"][1:], surrogate_key("LCT", integer_keys)),
+        "INJURY_ID": Dimension("INJURY_ID", SCHEMA_DEFINITIONS["INJURY"][1:], surrogate_key("NJR", integer_keys)),
+    }
+    crash_key = surrogate_key("CRS", integer_keys)
+
     obj.enhance_data(
         rename_mapping={"LOCATION": "LOCATION_POINT"},
         new_columns={
-            "CRASH_ID": lambda _, idx: f"CRS_{idx + 1:06d}",
-            "DATE_ID": lambda _, idx: f"DT_{idx + 1:06d}",
-            "LOCATION_ID": lambda _, idx: f"LCT_{idx + 1:06d}",
-            "INJURY_ID": lambda _, idx: f"NJR_{idx + 1:06d}",
+            "CRASH_ID": lambda _, idx: crash_key(idx),
+            "DATE_ID": lambda row, _: dimensions["DATE_ID"].lookup(row),
+            "LOCATION_ID": lambda row, _: dimensions["LOCATION_ID"].lookup(row),
+            "INJURY_ID": lambda row, _: dimensions["INJURY_ID"].lookup(row),
         }
     )
 
+    for key_column, dimension in dimensions.items():
+        log.info(f"`{key_column}`: {len(dimension)} distinct members over {len(obj.rows)} crashes.")
+
 @log_execution
-async def process_people(obj: Data, crashes: Data, city: str) -> None:
+async def process_people(obj: Data, crashes: Data, city: str, integer_keys: bool = False) -> None:
     """
     Processes the people data by applying replacements, assigning injury classifications,
     and handling various data fields.
@@ -153,8 +173,8 @@ async def process_people(obj: Data, crashes: Data, city: str) -> None:
         `obj (Data)`: The Data object containing the people data.
         `crashes (Data)`: The Data object containing the crash data.
         `city (str)`: The name of the city for city-state correction.
+        `integer_keys (bool, optional)`: Whether to generate integer surrogate keys. Defaults to False.
     """
-    crash_case = {row["RD_NO"]: row for row in crashes.rows}
     await obj.load_city_state(city)
 
     replacements = [
@@ -176,10 +196,9 @@ async def process_people(obj: Data, crashes: Data, city: str) -> None:
     apply_replacements(obj, replacements)
     
     for row in obj.rows:
-        crash_case_id = row.get("RD_NO")
-        if crash_case_id in crash_case:
-            crash_row = crash_case[crash_case_id]
-            row["INJURY_CLASSIFICATION"] = classify_injury(crash_row)
+        crash_rows = crashes.select_rows("RD_NO", row.get("RD_NO"))
+        if crash_rows:
+            row["INJURY_CLASSIFICATION"] = classify_injury(crash_rows[-1])
 
     for row in obj.rows:
         if row["CITY"] != "unknown".upper():
@@ -197,20 +216,25 @@ async def process_people(obj: Data, crashes: Data, city: str) -> None:
         for field in ["CITY", "AIRBAG_DEPLOYED", "DRIVER_VISION"]:
             row[field] = remove_brackets_and_following(row[field])
 
+    obj.invalidate_indexes()
+
     cast_columns(obj, ["AGE", "VEHICLE_ID"], int)
 
+    person_key = surrogate_key("PRS", integer_keys)
+
     obj.enhance_data(
         rename_mapping={"PERSON_ID": "PERSON", "VEHICLE_ID": "VEHICLE", "DAMAGE": "DAMAGE_COST"},
-        new_columns={"PERSON_ID": lambda _, idx: f"PRS_{idx + 1:06d}"}
+        new_columns={"PERSON_ID": lambda _, idx: person_key(idx)}
     )
 
 @log_execution
-async def process_vehicles(obj: Data) -> None:
+async def process_vehicles(obj: Data, integer_keys: bool = False) -> None:
     """
     Processes the vehicle data by applying replacements, cleaning fields, and enhancing data.
 
     Args:
         `obj (Data)`: The Data object containing the vehicle data.
+        `integer_keys (bool, optional)`: Whether to generate integer surrogate keys. Defaults to False.
     """
     replacements = [
         ("VEHICLE_ID", lambda x: not x, 0),
@@ -249,15 +273,19 @@ async def process_vehicles(obj: Data) -> None:
         for field in ["VEHICLE_TYPE", "FIRST_CONTACT_POINT"]:
             row[field] = remove_brackets_and_following(row[field])
 
+    obj.invalidate_indexes()
+
     cast_columns(obj, ["VEHICLE_YEAR", "OCCUPANT_CNT", "VEHICLE_ID"], int)
 
+    vehicle_key = surrogate_key("VHC", integer_keys)
+
     obj.enhance_data(
         rename_mapping={"VEHICLE_ID": "VEHICLE"},
-        new_columns={"VEHICLE_ID": lambda _, idx: f"VHC_{idx + 1:06d}"}
+        new_columns={"VEHICLE_ID": lambda _, idx: vehicle_key(idx)}
     )
 
 @log_execution
-async def process_data() -> None:
+async def process_data(integer_keys: bool = False) -> None:
     """
     Main asynchronous function that processes and cleans the datasets of crashes, people, and vehicles.
 
@@ -266,6 +294,9 @@ async def process_data() -> None:
     2. Applies the necessary processing functions to clean the data.
     3. Exports the cleaned datasets to `CSV` files.
 
+    Args:
+        `integer_keys (bool, optional)`: Whether to generate integer surrogate keys instead of formatted strings. Defaults to False.
+
     Raises:
         Exception: If any errors occur during data processing.
     """
@@ -285,13 +316,13 @@ async def process_data() -> None:
     await asyncio.gather(*(dataset.initialize() for dataset in datasets.values()))
     
     try:
-        await process_crashes(datasets["CRASHES"], datasets["POLICE_BEAT"])
+        await process_crashes(datasets["CRASHES"], datasets["POLICE_BEAT"], integer_keys)
         datasets["CRASHES"].export_csv(os.path.join(root_path, "Group_ID_20_Part_1", "data", "cleaned", "crashes_cleaned.csv"))
 
-        await process_people(datasets["PEOPLE"], datasets["CRASHES"], data_paths["CITY_US"])
+        await process_people(datasets["PEOPLE"], datasets["CRASHES"], data_paths["CITY_US"], integer_keys)
         datasets["PEOPLE"].export_csv(os.path.join(root_path, "Group_ID_20_Part_1", "data", "cleaned", "people_cleaned.csv"))
 
-        await process_vehicles(datasets["VEHICLES"])
+        await process_vehicles(datasets["VEHICLES"], integer_keys)
         datasets["VEHICLES"].export_csv(os.path.join(root_path, "Group_ID_20_Part_1", "data", "cleaned", "vehicles_cleaned.csv"))
 
     except Exception as ex:
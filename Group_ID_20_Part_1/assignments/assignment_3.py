@@ -7,6 +7,8 @@ from modules.utils import (
     get_root, read_json, log_execution
 )
 from modules.database import Database
+from modules.schema import Schema
+from modules.cache import DataVersion
 
 
 log.basicConfig(
@@ -18,8 +20,32 @@ log.basicConfig(
 )
 log.getLogger("asyncio").setLevel(log.WARNING)
 
+def schema_path(root_path: str) -> str:
+    """
+    Returns the path to the schema file. The schema with integer surrogate keys is derived from it (see `Schema.integer_keys`).
+
+    Args:
+        `root_path (str)`: The root path of the project.
+
+    Returns:
+        `str`: The path to the `SQL` schema file.
+    """
+    return os.path.join(root_path, "Group_ID_20_Part_1", "sql", "schema.sql")
+
+def database_version(root_path: str) -> DataVersion:
+    """
+    Returns the version of the data loaded into the database, published whenever the tables are created or populated.
+
+    Args:
+        `root_path (str)`: The root path of the project.
+
+    Returns:
+        `DataVersion`: The version, stored in `data/database_version.json`.
+    """
+    return DataVersion(os.path.join(root_path, "Group_ID_20_Part_1", "data", "database_version.json"))
+
 @log_execution
-async def create_schema():
+async def create_schema(integer_keys: bool = False, load_mode: bool = False, upsert: bool = False):
     """
     Creates the database schema by reading credentials and `SQL` query from files,
     connecting to the database, and executing the `SQL` query to create the schema.
@@ -31,6 +57,17 @@ async def create_schema():
     4. Executes the `SQL` query to create the database schema.
     5. Handles errors and ensures proper disconnection from the database.
 
+    In load mode the tables are created as heaps, without primary keys, unique constraints or
+    foreign keys, which `populate_database` builds once the data is loaded. Otherwise, for the
+    upsert mode of `populate_database`, the fact tables are clustered on their grain (see
+    `Schema.grain_index_statements`), on which `MergeLoader` matches their rows: an index the
+    inserts would otherwise maintain for nothing.
+
+    Args:
+        `integer_keys (bool, optional)`: Whether to create the schema with integer surrogate keys. Defaults to False.
+        `load_mode (bool, optional)`: Whether to create the tables without constraints. Defaults to False.
+        `upsert (bool, optional)`: Whether the tables are to be populated in upsert mode. Defaults to False.
+
     Raises:
         `Exception`: If an error occurs during the schema creation process.
     """
@@ -39,23 +76,27 @@ async def create_schema():
     sys.path.append(root_path)
 
     credentials_path = os.path.join(root_path, "Group_ID_20_Part_1", "data", "group_id_20_db.json")
-    sql_file_path = os.path.join(root_path, "Group_ID_20_Part_1", "sql", "schema.sql")
+    sql_file_path = schema_path(root_path)
     
     credentials = read_json(credentials_path)
     
-    db = Database(
-        server=credentials["server"],
-        db=credentials["db"],
-        user=credentials["user"],
-        pwd=credentials["pwd"]
-    )
+    db = Database.from_credentials(credentials)
     
     try:
         await db.connect()
+        database_version(root_path).invalidate()
         
         sql_query = await db.read_sql_file(sql_file_path)
+        if integer_keys:
+            sql_query = Schema.integer_keys(sql_query)
+
+        if load_mode:
+            sql_query = "\n\n".join(Schema(sql_query).heap_statements())
+        elif upsert:
+            sql_query = "\n\n".join([sql_query] + Schema(sql_query).grain_index_statements())
         
-        await db.execute_query(sql_query)
+        await db.execute_query(db.translate(sql_query))
+        database_version(root_path).publish()
     except Exception as e:
         raise Exception(f"Error during schema creation: {e}")
     finally:
@@ -2,11 +2,20 @@ import sys
 import os
 import asyncio
 import logging as log
-from typing import Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 from modules.utils import (
-    get_root, get_paths, log_execution
+    get_root, get_paths, read_json, log_execution
 )
 from modules.data import Data
+from modules.reader import Reader
+from modules.columnar import ColumnarTable
+from modules.fact import FactBuilder
+from modules.cube import Cube
+from modules.rollup import RollupStore
+from modules.geo import GeoIndex
+from modules.sketch import Sketches
+from modules.cache import DataVersion
+from modules.schema import SCHEMA_DEFINITIONS
 
 log.basicConfig(
     level=log.DEBUG,
@@ -18,72 +27,25 @@ log.basicConfig(
 
 log.getLogger("asyncio").setLevel(log.WARNING)
 
-# Definition of columns for each table (schema) in the dataset.
-SCHEMA_DEFINITIONS = {
-    "CRASH": ["CRASH_ID", "RD_NO", "CRASH_DATE", "POSTED_SPEED_LIMIT", "TRAFFIC_CONTROL_DEVICE", 
-              "DEVICE_CONDITION", "WEATHER_CONDITION", "LIGHTING_CONDITION", "FIRST_CRASH_TYPE", 
-              "TRAFFICWAY_TYPE", "ALIGNMENT", "ROADWAY_SURFACE_COND", "ROAD_DEFECT", "REPORT_TYPE", 
-              "CRASH_TYPE", "PRIM_CONTRIBUTORY_CAUSE", "SEC_CONTRIBUTORY_CAUSE"],
-    "DATE": ["DATE_ID", "CRASH_TIME", "CRASH_PERIOD", "CRASH_DAY", "CRASH_MONTH", "CRASH_YEAR", "CRASH_DAY_OF_WEEK", 
-            "CRASH_SEASON", "DATE_POLICE_NOTIFIED"],
-    "LOCATION": ["LOCATION_ID", "STREET_NO", "STREET_DIRECTION", "STREET_NAME", 
-                 "BEAT_OF_OCCURRENCE", "LATITUDE", "LONGITUDE", "LOCATION_POINT"],
-    "INJURY": ["INJURY_ID", "MOST_SEVERE_INJURY", "INJURIES_TOTAL", "INJURIES_FATAL", 
-               "INJURIES_INCAPACITATING", "INJURIES_NON_INCAPACITATING", 
-               "INJURIES_REPORTED_NOT_EVIDENT", "INJURIES_NO_INDICATION"],
-    "PERSON": ["PERSON_ID", "PERSON_TYPE", "CRASH_DATE", "CITY", "STATE", "SEX", "AGE", 
-               "SAFETY_EQUIPMENT", "AIRBAG_DEPLOYED", "EJECTION", "INJURY_CLASSIFICATION", 
-               "DRIVER_ACTION", "DRIVER_VISION", "PHYSICAL_CONDITION", "BAC_RESULT", 
-               "DAMAGE_CATEGORY"],
-    "VEHICLE": ["VEHICLE_ID", "CRASH_DATE", "UNIT_NO", "UNIT_TYPE", "MAKE", "MODEL", 
-                "LIC_PLATE_STATE", "VEHICLE_YEAR", "VEHICLE_DEFECT", "VEHICLE_TYPE", 
-                "VEHICLE_USE", "TRAVEL_DIRECTION", "MANEUVER", "OCCUPANT_CNT", 
-                "FIRST_CONTACT_POINT"],
-    "DAMAGE": ["DAMAGE_COST", "NUM_UNITS", "CRASH_ID", "DATE_ID", "LOCATION_ID", 
-               "INJURY_ID", "PERSON_ID", "VEHICLE_ID"]
+# Attributes of the dimensions stored along the facts in their columnar copy, for predicate skipping:
+# column: (dimension table, surrogate key).
+ZONE_COLUMNS = {
+    "DAMAGE": {
+        "CRASH_YEAR": ("DATE", "DATE_ID"),
+        "BEAT_OF_OCCURRENCE": ("LOCATION", "LOCATION_ID"),
+    },
 }
 
+# Surrogate keys of the dimensions whose members are shared among crashes.
+DIMENSION_KEYS = {
+    "DATE": "DATE_ID",
+    "LOCATION": "LOCATION_ID",
+    "INJURY": "INJURY_ID",
+}
 
-def join_data(obj1: Data, obj2: Data, column: str) -> "Data":
-    """
-    Merges two datasets based on a common column.
-
-    Args:
-        `obj1 (Data)`: The first dataset.
-        `obj2 (Data)`: The second dataset.
-        `column (str)`: The column name to join the datasets on.
-
-    Returns:
-        `Data`: A new Data object containing the merged data.
-
-    Raises:
-        `KeyError`: If the specified column does not exist in both datasets.
-    """
-    for data in [obj1, obj2]:
-        if column not in data.fieldnames:
-            raise KeyError(f"Column '{column}' is not present in dataset {data}")
-
-    obj1_dict = {row[column]: row for row in obj1.rows}
-
-    headers1 = obj1.fieldnames
-    headers2 = obj2.fieldnames
-    combined_headers = headers1 + [h for h in headers2 if h != column]
-
-    joined_data = []
-    for row in obj2.rows:
-        key = row[column]
-        if key in obj1_dict:
-            joined_row = {**obj1_dict[key], **{k: v for k, v in row.items() if k != column}}
-            joined_data.append(joined_row)
-
-    merged_data = Data.__new__(Data)
-    merged_data.rows = joined_data
-    merged_data.fieldnames = combined_headers
-
-    return merged_data
 
 @log_execution
-async def export_data(obj: Data, columns: List[str], export_path: str) -> None:
+async def export_data(obj: Data, columns: List[str], export_path: str, key: Optional[str] = None) -> None:
     """
     Exports filtered data to a CSV file with selected columns.
 
@@ -91,10 +53,14 @@ async def export_data(obj: Data, columns: List[str], export_path: str) -> None:
         `obj (Data)`: The dataset to export.
         `columns (List[str])`: The list of columns to include in the exported data.
         `export_path (str)`: The file path where the data will be exported.
+        `key (Optional[str])`: The surrogate key column, if rows sharing the same key must be exported once. Defaults to None.
     """
     filtered_data = obj.copy()
     filtered_data.update_columns(columns)
 
+    if key:
+        filtered_data.drop_duplicates(key)
+
     ordered_rows = [
         {col: row.get(col, None) for col in columns} for row in filtered_data.rows
     ]
@@ -105,13 +71,19 @@ async def export_data(obj: Data, columns: List[str], export_path: str) -> None:
     filtered_data.export_csv(export_path)
 
 @log_execution
-async def split_and_export_schemas(datasets: Dict[str, Data], root_path: str) -> None:
+async def split_and_export_schemas(datasets: Dict[str, Data], root_path: str, partition_by: Optional[List[str]] = None) -> None:
     """
     Splits and exports datasets according to predefined schema definitions.
 
     Args:
         `datasets (Dict[str, Data])`: A dictionary of datasets to process.
         `root_path (str)`: The root path of the project, used for defining export directory.
+        `partition_by (Optional[List[str]])`: The `DATE` attributes the fact table is partitioned by (e.g. `["CRASH_YEAR"]` 
+            or `["CRASH_YEAR", "CRASH_MONTH"]`). If given, the facts are exported to one file per partition 
+            in the `damage` directory along with a manifest, instead of a single file. Defaults to None.
+
+    The approximate aggregates of the facts (see `Sketches`) are built while they are streamed out,
+    and saved to `sketches.json`.
     """
     export_dir = os.path.join(root_path, "Group_ID_20_Part_1", "data", "splitted")
     os.makedirs(export_dir, exist_ok=True)
@@ -122,15 +94,138 @@ async def split_and_export_schemas(datasets: Dict[str, Data], root_path: str) ->
                         "VEHICLES" if schema_name == "VEHICLE" else None
 
         if schema_name == "DAMAGE":
-            crashes_people = join_data(datasets["CRASHES"], datasets["PEOPLE"], "RD_NO")
-            merged_data = join_data(datasets["VEHICLES"], crashes_people, "RD_NO")
-            await export_data(merged_data, columns, os.path.join(export_dir, f"{schema_name.lower()}.csv"))
+            builder = FactBuilder(datasets["PEOPLE"], [datasets["CRASHES"], datasets["VEHICLES"]], "RD_NO", columns)
+            sketches = Sketches()
+            builder.observe(sketches.observe, Sketches.COLUMNS)
+            single_file = os.path.join(export_dir, f"{schema_name.lower()}.csv")
+            manifest_file = os.path.join(export_dir, schema_name.lower(), "manifest.json")
+
+            # Only one layout of the fact table is kept, so that loaders never pick a stale one.
+            stale_file = single_file if partition_by else manifest_file
+            if os.path.exists(stale_file):
+                os.remove(stale_file)
+
+            if partition_by:
+                manifest = builder.export_partitions(
+                    os.path.join(export_dir, schema_name.lower()), schema_name.lower(), partition_by
+                )
+                written = sum(partition["rows"] for partition in manifest["partitions"])
+                log.info(f"`{schema_name}`: {written} facts exported in {len(manifest['partitions'])} partitions.")
+            else:
+                written = builder.export_csv(single_file)
+                log.info(f"`{schema_name}`: {written} facts exported.")
+            sketches.save(get_paths(os.path.join(root_path, "Group_ID_20_Part_1"), "splitted")["SKETCHES"])
         else:
             dataset = datasets[source_dataset]
-            await export_data(dataset, columns, os.path.join(export_dir, f"{schema_name.lower()}.csv"))
+            await export_data(
+                dataset, columns, os.path.join(export_dir, f"{schema_name.lower()}.csv"), 
+                key=DIMENSION_KEYS.get(schema_name)
+            )
+
+@log_execution
+async def export_columnar(root_path: str, chunk_size: int = 100000) -> Dict[str, int]:
+    """
+    Copies the splitted files into columnar tables with zone maps (see `ColumnarTable`), in the `columnar` directory.
+
+    The facts are chunked in the order of their files, so that chunks never span two partitions, and
+    carry the attributes of `ZONE_COLUMNS` of their dimensions, so that predicates on the year or the
+    beat skip the chunks of the fact table holding none of the wanted facts.
+
+    Args:
+        `root_path (str)`: The root path of the project.
+        `chunk_size (int, optional)`: The maximum number of rows per chunk. Defaults to 100,000.
+
+    Returns:
+        `Dict[str, int]`: The number of chunks of every table.
+    """
+    splitted_paths = get_paths(os.path.join(root_path, "Group_ID_20_Part_1"), "splitted")
+    os.makedirs(splitted_paths["COLUMNAR"], exist_ok=True)
+
+    async def batches(files: List[str]) -> AsyncIterator[List[Dict[str, Any]]]:
+        for file in files:
+            async for batch in Reader.stream_csv(file, chunk_size):
+                yield batch
+
+    chunks = {}
+    for schema_name, columns in SCHEMA_DEFINITIONS.items():
+        files = [splitted_paths[schema_name]]
+        if schema_name == "DAMAGE" and os.path.exists(splitted_paths["DAMAGE_MANIFEST"]):
+            directory = os.path.dirname(splitted_paths["DAMAGE_MANIFEST"])
+            files = [os.path.join(directory, partition["file"]) for partition in read_json(splitted_paths["DAMAGE_MANIFEST"])["partitions"]]
+
+        zone_columns = {}
+        for column, (dataset_key, key) in ZONE_COLUMNS.get(schema_name, {}).items():
+            dimension = Data(splitted_paths[dataset_key])
+            await dimension.initialize()
+            members = {str(row[key]): row[column] for row in dimension.rows}
+            zone_columns[column] = lambda row, members=members, key=key: members.get(row[key])
+
+        table = await ColumnarTable.write(
+            os.path.join(splitted_paths["COLUMNAR"], schema_name.lower()), batches(files), columns, zone_columns, sources=files
+        )
+        chunks[schema_name] = len(table.meta["chunks"])
+        log.info(f"`{schema_name}`: {len(table)} rows copied in {chunks[schema_name]} columnar chunks.")
+    return chunks
 
 @log_execution
-async def generate_starschema_files() -> None:
+async def materialize_rollups(root_path: str) -> RollupStore:
+    """
+    Materializes the rollups of the star schema from the splitted files and saves them next to them,
+    along with the index of the facts by geohash prefix.
+
+    When the fact table is partitioned and the saved rollups were built from partitions that are all
+    still exported unchanged (same checksums), only the facts of the new partitions are aggregated and
+    appended to the saved rollups and geo index, e.g. when a new month is exported. Otherwise both are
+    rebuilt from all the facts.
+
+    Args:
+        `root_path (str)`: The root path of the project.
+
+    Returns:
+        `RollupStore`: The materialized rollups.
+    """
+    splitted_paths = get_paths(os.path.join(root_path, "Group_ID_20_Part_1"), "splitted")
+    manifest = read_json(splitted_paths["DAMAGE_MANIFEST"]) if os.path.exists(splitted_paths["DAMAGE_MANIFEST"]) else None
+    checksums = {partition["name"]: partition.get("checksum") for partition in manifest["partitions"]} if manifest else {}
+
+    store = None
+    if manifest and os.path.exists(splitted_paths["ROLLUPS"]) and os.path.exists(splitted_paths["GEO_INDEX"]):
+        store = RollupStore.from_file(splitted_paths["ROLLUPS"])
+        unchanged = all(checksums.get(name) == checksum for name, checksum in store.partitions.items())
+        if not store.partitions or not unchanged:
+            store = None
+
+    if store is not None:
+        geo_index = GeoIndex.from_file(splitted_paths["GEO_INDEX"])
+        dimensions = {name: Data(splitted_paths[dataset_key]) for name, (dataset_key, _) in Cube.DIMENSIONS.items()}
+        await asyncio.gather(*(data.initialize() for data in dimensions.values()))
+        directory = os.path.dirname(splitted_paths["DAMAGE_MANIFEST"])
+        appended = 0
+        for partition in manifest["partitions"]:
+            if partition["name"] in store.partitions:
+                continue
+            async for batch in Reader.stream_csv(os.path.join(directory, partition["file"]), 100000):
+                cube = store.append_facts(batch, dimensions)
+                geo_index.add(cube)
+                appended += len(cube)
+            store.partitions[partition["name"]] = partition["checksum"]
+        log.info(f"{appended} facts of new partitions appended to the rollups and the geo index.")
+    else:
+        cube = await Cube.load(splitted_paths)
+        store = RollupStore.build(cube)
+        store.partitions = checksums if all(checksums.values()) else {}
+        geo_index = GeoIndex.build(cube)
+        log.info(f"Rollups and geo index built over {len(cube)} facts.")
+
+    store.save(splitted_paths["ROLLUPS"])
+    geo_index.save(splitted_paths["GEO_INDEX"])
+    for name, rollup in store.rollups.items():
+        log.info(f"Rollup `{name}`: {len(rollup)} groups.")
+    log.info(f"Geo index: {len(geo_index)} points.")
+    return store
+
+@log_execution
+async def generate_starschema_files(partition_by: Optional[List[str]] = None) -> None:
     """
     Initializes datasets and initiates the export process for split schemas.
 
@@ -138,6 +233,13 @@ async def generate_starschema_files() -> None:
     1. Retrieves and processes the dataset paths.
     2. Initializes the datasets.
     3. Splits the datasets according to predefined schema definitions and exports them as `CSV` files.
+    4. Copies the splitted files into columnar tables with zone maps.
+    5. Materializes the rollups of the star schema.
+    6. Publishes a new version of the splitted files, invalidating the query results cached from the previous ones.
+       The previous version is withdrawn first, so that it does not outlive a failed run.
+
+    Args:
+        `partition_by (Optional[List[str]])`: The `DATE` attributes the fact table is partitioned by. Defaults to None (single file).
     """
     root_path = get_root("dss")
     sys.path.append(root_path)
@@ -152,8 +254,14 @@ async def generate_starschema_files() -> None:
 
     await asyncio.gather(*(dataset.initialize() for dataset in datasets.values()))
 
+    version = DataVersion(get_paths(os.path.join(root_path, "Group_ID_20_Part_1"), "splitted")["VERSION"])
+    version.invalidate()
+
     try:
-        await split_and_export_schemas(datasets, root_path)
+        await split_and_export_schemas(datasets, root_path, partition_by)
+        await export_columnar(root_path)
+        await materialize_rollups(root_path)
+        version.publish()
     except Exception as e:
         raise Exception(f"Error during execution: {e}")
 
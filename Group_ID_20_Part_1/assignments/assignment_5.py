@@ -2,11 +2,20 @@ import os
 import sys
 import asyncio
 import logging as log
+from typing import Any, Dict, List, Optional
 from modules.utils import (
-    get_root, get_paths, read_json, log_execution
+    get_root, get_paths, read_json, log_execution, gather_limited
 )
 from modules.data import Data
 from modules.database import Database
+from modules.batching import Checkpoints
+from modules.loader import PipelinedLoader
+from modules.columnar import ColumnarTable
+from modules.merge import MergeLoader
+from modules.validator import Validator
+from modules.schema import Schema
+from assignments.assignment_3 import schema_path, database_version
+from modules.schema import SURROGATE_KEYS
 
 log.basicConfig(
     level=log.DEBUG,
@@ -18,9 +27,211 @@ log.basicConfig(
 
 log.getLogger("asyncio").setLevel(log.WARNING)
 
+COMMIT_EVERY = 100000
+
 
 @log_execution
-async def populate_database():
+async def load_partition(db: Database, directory: str, partition: Dict[str, Any], cast: Dict[str, type], replace: bool = False, bulk: bool = True, checkpoints: Optional[Checkpoints] = None, merger: Optional[MergeLoader] = None) -> None:
+    """
+    Loads a single partition of the damage fact table.
+
+    Args:
+        `db (Database)`: The connected database.
+        `directory (str)`: The directory of the partition files.
+        `partition (Dict[str, Any])`: The partition entry of the manifest.
+        `cast (Dict[str, type])`: Mapping of columns to the type their values are converted to.
+        `replace (bool, optional)`: Whether to delete the facts of the partition already in the database before loading it. 
+            The partition values must be attributes of the `date` table. Defaults to False.
+        `bulk (bool, optional)`: Whether to stream the partition file through the pipelined bulk-load path. Defaults to True.
+        `checkpoints (Optional[Checkpoints], optional)`: The store of the committed offsets. Defaults to None.
+        `merger (Optional[MergeLoader], optional)`: The loader merging the facts into the table. When given, the facts
+            already in the database are updated in place rather than deleted, and with `replace` the facts of the
+            partition missing from its file are deleted by the same `MERGE`. Defaults to None.
+    """
+    conditions = " AND ".join(f"{column.lower()} = ?" for column in partition["values"])
+    params = tuple(int(value) for value in partition["values"].values())
+
+    if merger:
+        await merger.load(
+            os.path.join(directory, partition["file"]), "damage", cast=cast,
+            scope=f"target.date_id IN (SELECT date_id FROM date WHERE {conditions})" if replace else None,
+            params=params if replace else ()
+        )
+        log.info(f"Partition `{partition['name']}`: {partition['rows']} facts merged.")
+        return
+
+    checkpoint_key = f"damage.{partition['name']}"
+    if replace:
+        if checkpoints:
+            checkpoints.reset(checkpoint_key)
+        await db.execute_query(f"DELETE FROM damage WHERE date_id IN (SELECT date_id FROM date WHERE {conditions})", params)
+
+    if bulk:
+        await PipelinedLoader(db).load(
+            os.path.join(directory, partition["file"]), "damage", cast=cast,
+            commit_every=COMMIT_EVERY, checkpoints=checkpoints, checkpoint_key=checkpoint_key
+        )
+    else:
+        data = Data(os.path.join(directory, partition["file"]))
+        await data.initialize()
+        await db.data_to_db(data, "damage", cast=cast, adaptive=True, commit_every=COMMIT_EVERY, checkpoints=checkpoints, checkpoint_key=checkpoint_key)
+    log.info(f"Partition `{partition['name']}`: {partition['rows']} facts loaded.")
+
+async def check_resumable(db: Database, table_names: List[str], checkpoints: Optional[Checkpoints]) -> None:
+    """
+    Checks that tables are either empty or resumed from the checkpoints of a failed load.
+
+    Tables are loaded in parts committed on their own, so a failed load leaves them partly loaded.
+    Loading them again from the first row would duplicate the committed rows: they must be resumed
+    from their checkpoints, or truncated first.
+
+    Args:
+        `db (Database)`: The connected database.
+        `table_names (List[str])`: The names of the tables about to be loaded.
+        `checkpoints (Optional[Checkpoints])`: The store of the committed offsets.
+
+    Raises:
+        `ValueError`: If a table holds rows and has no checkpoint to resume from.
+    """
+    for table_name in table_names:
+        resumed = checkpoints and any(key == table_name or key.startswith(f"{table_name}.") for key in checkpoints.offsets)
+        if resumed:
+            continue
+        filled = (await db.fetch_query(f"SELECT CASE WHEN EXISTS (SELECT 1 FROM {table_name}) THEN 1 ELSE 0 END;"))[0][0]
+        if filled:
+            raise ValueError(
+                f"Table `{table_name}` already holds rows and has no checkpoint to resume from: truncate it before loading it again."
+            )
+
+@log_execution
+async def build_constraints(db: Database, schema: Schema, columnstore: bool = False, grain: bool = False) -> None:
+    """
+    Builds the constraints and indexes of tables created as heaps and already loaded.
+
+    The primary keys and unique constraints are built first, each in a single sort of its table,
+    followed by the indexes of the fact table. Referential integrity of the fact table is then
+    validated in one set-based pass, counting its orphan keys for all the foreign keys at once,
+    and the foreign keys are finally added.
+
+    Args:
+        `db (Database)`: The connected database.
+        `schema (Schema)`: The schema the tables were created from.
+        `columnstore (bool, optional)`: Whether to store the fact table as a clustered columnstore index. Defaults to False.
+        `grain (bool, optional)`: Whether to cluster the fact table on its grain, for later upserts. Defaults to False.
+
+    Raises:
+        `ValueError`: If the fact table holds keys missing from the referenced tables.
+    """
+    for statement in schema.key_statements() + schema.index_statements(columnstore, grain):
+        await db.execute_query(statement)
+
+    for table in schema.tables.values():
+        if not table.foreign_keys:
+            continue
+        query, columns = schema.integrity_query(table.name)
+        orphans = {column: count or 0 for column, count in zip(columns, (await db.fetch_query(query))[0])}
+        if any(orphans.values()):
+            raise ValueError(
+                f"Referential integrity violated in `{table.name}`: " +
+                ", ".join(f"{count} rows with unknown {column}" for column, count in orphans.items() if count)
+            )
+        log.info(f"Referential integrity of `{table.name}` validated.")
+
+    for statement in schema.foreign_key_statements():
+        await db.execute_query(statement)
+
+@log_execution
+async def validate_datasets(root_path: str, integer_keys: bool = False) -> Validator:
+    """
+    Validates the splitted datasets against the constraints of the schema, before loading them.
+
+    The datasets are validated one at a time, the dimension tables before the fact table (or its
+    partitions), so that the foreign keys of the facts are checked against the valid dimension keys.
+    The offending rows of each table are written to `data/quarantine/<table>.csv`.
+
+    Args:
+        `root_path (str)`: The root path of the project.
+        `integer_keys (bool, optional)`: Whether the splitted datasets carry integer surrogate keys. Defaults to False.
+
+    Returns:
+        `Validator`: The validator, holding the violations found.
+    """
+    data_paths = get_paths(os.path.join(root_path, "Group_ID_20_Part_1"), "splitted")
+    quarantine_dir = os.path.join(root_path, "Group_ID_20_Part_1", "data", "quarantine")
+    schema = Schema.from_file(schema_path(root_path), integer_keys)
+    validator = Validator(schema)
+
+    for table_name in schema.tables:
+        quarantine_file = os.path.join(quarantine_dir, f"{table_name}.csv")
+        if os.path.exists(quarantine_file):
+            os.remove(quarantine_file)
+
+        files = [data_paths[table_name.upper()]]
+        if table_name == "damage" and os.path.exists(data_paths["DAMAGE_MANIFEST"]):
+            manifest = read_json(data_paths["DAMAGE_MANIFEST"])
+            directory = os.path.dirname(data_paths["DAMAGE_MANIFEST"])
+            files = [os.path.join(directory, partition["file"]) for partition in manifest["partitions"]]
+
+        for file in files:
+            data = Data(file)
+            await data.initialize()
+            validator.validate(table_name, data, quarantine_file)
+
+    validator.log_report()
+    return validator
+
+class LoadOptions:
+    """
+    The options of a population of the database (see `populate_database`).
+
+    Attributes:
+        `integer_keys (bool)`: Whether the splitted datasets carry integer surrogate keys.
+        `partitions (Optional[List[str]])`: The names of the fact partitions to reload on their own, or None for a full load.
+        `pool_size (int)`: The number of pooled connections, i.e. of tables or parts loaded at the same time.
+        `bulk (bool)`: Whether to use the streaming bulk-load path.
+        `load_mode (bool)`: Whether the tables were created without constraints, to build them after the load.
+        `columnstore (bool)`: In load mode, whether to store the fact table as a clustered columnstore index.
+        `upsert (bool)`: Whether to merge the rows into the tables through staging tables.
+        `validate (bool)`: Whether to validate the datasets against the schema first, loading nothing if any row violates a constraint.
+        `where (Optional[Dict[str, Any]])`: The predicate the loaded facts must match, or None for every fact.
+    """
+
+    def __init__(self, integer_keys: bool = False, partitions: Optional[List[str]] = None, pool_size: int = 4, bulk: bool = True,
+                 load_mode: bool = False, columnstore: bool = False, upsert: bool = False, validate: bool = False,
+                 where: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Initializes a LoadOptions object, checking that the options can be combined.
+
+        Args:
+            `integer_keys (bool, optional)`: Whether the splitted datasets carry integer surrogate keys. Defaults to False.
+            `partitions (Optional[List[str]], optional)`: The names of the fact partitions to reload on their own. Defaults to None (full load).
+            `pool_size (int, optional)`: The number of pooled connections. Defaults to 4.
+            `bulk (bool, optional)`: Whether to use the streaming bulk-load path. Defaults to True.
+            `load_mode (bool, optional)`: Whether the tables were created without constraints. Defaults to False.
+            `columnstore (bool, optional)`: In load mode, whether to store the fact table as a clustered columnstore index. Defaults to False.
+            `upsert (bool, optional)`: Whether to merge the rows into the tables through staging tables. Defaults to False.
+            `validate (bool, optional)`: Whether to validate the datasets against the schema first. Defaults to False.
+            `where (Optional[Dict[str, Any]], optional)`: The predicate the loaded facts must match. Defaults to None (every fact).
+
+        Raises:
+            `ValueError`: If load mode is requested to reload partitions, or if a predicate is given outside a full bulk load.
+        """
+        if load_mode and partitions is not None:
+            raise ValueError("Partitions can only be reloaded into a schema with its constraints built.")
+        if where and (not bulk or upsert or partitions is not None):
+            raise ValueError("Facts can only be filtered by a predicate in a full bulk load.")
+        self.integer_keys = integer_keys
+        self.partitions = partitions
+        self.pool_size = pool_size
+        self.bulk = bulk
+        self.load_mode = load_mode
+        self.columnstore = columnstore
+        self.upsert = upsert
+        self.validate = validate
+        self.where = where
+
+@log_execution
+async def populate_database(options: Optional[LoadOptions] = None):
     """
     Populates the database with data from pre-processed datasets.
 
@@ -33,50 +244,163 @@ async def populate_database():
     6. Inserts data into corresponding database tables.
     7. Handles errors and ensures the database connection is properly closed.
 
+    The dimension tables are independent of each other and are loaded concurrently, each on its own
+    pooled connection, a failed load cancelling the others. The damage fact table references them, so
+    it is loaded afterwards, split into parts (or into the partitions listed in its manifest) loaded
+    concurrently. Passing `partitions` in the options reloads only those partitions, replacing their facts. The dimension files are merged into their
+    tables first (see `MergeLoader`), so that the members the reloaded facts reference, e.g. the dates
+    of a new month, are present and the members already loaded are updated rather than duplicated.
+
+    In bulk mode the splitted files are streamed in batches straight into the tables with multi-row
+    `INSERT` statements, instead of being fully loaded as `Data` objects first. Parsing, conversion
+    and insertion of the batches of each file overlap through a `PipelinedLoader`. Otherwise the
+    batch size is tuned online. Either way every table is committed every `COMMIT_EVERY` rows,
+    recording the committed offsets in `data/checkpoints.json`: a failed run resumes where it stopped,
+    and the checkpoints are cleared once the whole database is populated. The upsert mode and the
+    load of the facts matching a predicate keep no checkpoints, the former being idempotent.
+
+    Every table is committed in parts, so a failed run leaves the tables partly loaded: a rerun resumes
+    them from their checkpoints, and refuses to load a table already holding rows without checkpoints
+    (e.g. populated by an earlier successful run), which must be truncated first. The upsert mode merges
+    the rows instead and can be rerun over any table.
+
+    The version of the database (see `database_version`) is withdrawn before anything is loaded and
+    published again once the population succeeds, so that the results cached by `Database.fetch_query`
+    are neither reused during the load nor after a failed one.
+
+    In load mode the tables are expected to be heaps (see `create_schema`): nothing is checked or
+    maintained while the rows are inserted, and the constraints and indexes are built afterwards.
+
+    In upsert mode the files are streamed into staging tables and merged into the tables on their
+    keys, so that rows already present are updated instead of duplicated: the population can be
+    rerun after a failure, or over tables already holding earlier loads.
+
+    With a predicate on the zone columns of the columnar copy of the fact table (see `export_columnar`),
+    e.g. `{"CRASH_YEAR": (2015, 2016)}`, only the matching facts are loaded, read from that copy: the
+    chunks whose zone maps rule the predicate out are skipped without being read.
+
+    Args:
+        `options (Optional[LoadOptions], optional)`: The options of the population. Defaults to None (a full bulk load, see `LoadOptions`).
+
     Raises:
+        `ValueError`: If load mode is requested on a backend other than `SQL Server`, or if validation finds rows
+            violating the constraints, or if a table to load already holds rows and has no checkpoint to resume from.
+        `FileNotFoundError`: If a predicate is given and the columnar copy of the fact table does not exist or is outdated.
         `Exception`: If there is an error during database population.
     """
+    options = options or LoadOptions()
     root_path = get_root("dss")
     sys.path.append(root_path)
 
     data_paths = get_paths(os.path.join(root_path, "Group_ID_20_Part_1"), "splitted")
 
-    datasets = {
-        "CRASH": Data(data_paths["CRASH"]),
-        "DATE": Data(data_paths["DATE"]),
-        "LOCATION": Data(data_paths["LOCATION"]),
-        "INJURY": Data(data_paths["INJURY"]),
-        "PERSON": Data(data_paths["PERSON"]),
-        "VEHICLE": Data(data_paths["VEHICLE"]),
-        "DAMAGE": Data(data_paths["DAMAGE"]),
-    }
+    if options.validate:
+        validator = await validate_datasets(root_path, options.integer_keys)
+        if validator.quarantined:
+            raise ValueError(f"The datasets violate the constraints of the schema:\n{validator.report()}")
+
+    manifest = read_json(data_paths["DAMAGE_MANIFEST"]) if os.path.exists(data_paths["DAMAGE_MANIFEST"]) else None
+    partitions_dir = os.path.dirname(data_paths["DAMAGE_MANIFEST"])
+    columnar_damage = os.path.join(data_paths["COLUMNAR"], "damage")
+    if options.where:
+        fact_files = [os.path.join(partitions_dir, partition["file"]) for partition in manifest["partitions"]] if manifest else [data_paths["DAMAGE"]]
+        if not ColumnarTable.exists(columnar_damage) or not ColumnarTable(columnar_damage).is_current(fact_files):
+            raise FileNotFoundError("The fact table has no up-to-date columnar copy to filter.")
+
+    if options.partitions is not None:
+        if manifest is None:
+            raise FileNotFoundError("The damage fact table was not exported in partitions.")
+        missing = set(options.partitions) - {partition["name"] for partition in manifest["partitions"]}
+        if missing:
+            raise KeyError(f"The following partitions are not present: {', '.join(sorted(missing))}")
+
+    datasets = {}
+    if options.partitions is None and not options.bulk and not options.upsert:
+        datasets = {
+            "CRASH": Data(data_paths["CRASH"]),
+            "DATE": Data(data_paths["DATE"]),
+            "LOCATION": Data(data_paths["LOCATION"]),
+            "INJURY": Data(data_paths["INJURY"]),
+            "PERSON": Data(data_paths["PERSON"]),
+            "VEHICLE": Data(data_paths["VEHICLE"]),
+        }
+        if manifest is None:
+            datasets["DAMAGE"] = Data(data_paths["DAMAGE"])
 
     await asyncio.gather(*(dataset.initialize() for dataset in datasets.values()))
 
     credentials_path = os.path.join(root_path, "Group_ID_20_Part_1", "data", "group_id_20_db.json")
+    checkpoints_path = os.path.join(root_path, "Group_ID_20_Part_1", "data", "checkpoints.json")
+    checkpoints = None if options.upsert else Checkpoints(checkpoints_path)
+    resume = {"commit_every": COMMIT_EVERY, "checkpoints": checkpoints}
     credentials = read_json(credentials_path)
 
-    db = Database(
-        server=credentials["server"],
-        db=credentials["db"],
-        user=credentials["user"],
-        pwd=credentials["pwd"]
-    )
+    db = Database.from_credentials(credentials, pool_size=options.pool_size)
+    if options.load_mode and db.dialect != "mssql":
+        raise ValueError("The load mode requires the SQL Server backend.")
     
+    key_types: Dict[str, Dict[str, type]] = {
+        dataset_key: {column: int for column in columns} if options.integer_keys else {}
+        for dataset_key, columns in SURROGATE_KEYS.items()
+    }
+
     try:
         await db.connect()
+        database_version(root_path).invalidate()
 
-        for dataset_key, table_name in [
+        merger = MergeLoader(db, Schema.from_file(schema_path(root_path), options.integer_keys)) if options.upsert or options.partitions is not None else None
+        dimensions = [
             ("CRASH", "crash"),
             ("DATE", "date"),
             ("LOCATION", "location"),
             ("INJURY", "injury"),
             ("PERSON", "person"),
             ("VEHICLE", "vehicle"),
-        ]:
-            await db.data_to_db(datasets[dataset_key], table_name)
+        ]
+
+        if options.partitions is not None:
+            await gather_limited([
+                merger.load(data_paths[dataset_key], table_name, cast=key_types[dataset_key])
+                for dataset_key, table_name in dimensions
+            ], options.pool_size)
+            await gather_limited([
+                load_partition(db, partitions_dir, partition, key_types["DAMAGE"], replace=True, bulk=options.bulk, checkpoints=checkpoints, merger=merger if options.upsert else None)
+                for partition in manifest["partitions"] if partition["name"] in options.partitions
+            ], options.pool_size)
+            database_version(root_path).publish()
+            return
+
+        if not options.upsert:
+            await check_resumable(db, [table_name for _, table_name in dimensions] + ["damage"], checkpoints)
+
+        await gather_limited([
+            merger.load(data_paths[dataset_key], table_name, cast=key_types[dataset_key]) if options.upsert else
+            PipelinedLoader(db).load(data_paths[dataset_key], table_name, cast=key_types[dataset_key], **resume) if options.bulk else
+            db.data_to_db(datasets[dataset_key], table_name, cast=key_types[dataset_key], adaptive=True, **resume)
+            for dataset_key, table_name in dimensions
+        ], options.pool_size)
             
-        await db.data_to_db(datasets["DAMAGE"], "damage")
+        if options.where:
+            await PipelinedLoader(db).load(columnar_damage, "damage", cast=key_types["DAMAGE"], where=options.where)
+        elif manifest is None and options.upsert:
+            await merger.load(data_paths["DAMAGE"], "damage", cast=key_types["DAMAGE"])
+        elif manifest is None and options.bulk:
+            await PipelinedLoader(db).load(data_paths["DAMAGE"], "damage", cast=key_types["DAMAGE"], **resume)
+        elif manifest is None:
+            await db.data_to_db_parallel(datasets["DAMAGE"], "damage", cast=key_types["DAMAGE"], adaptive=True, **resume)
+        else:
+            await gather_limited([
+                load_partition(db, partitions_dir, partition, key_types["DAMAGE"], bulk=options.bulk, checkpoints=checkpoints, merger=merger)
+                for partition in manifest["partitions"]
+            ], options.pool_size)
+
+        if options.load_mode:
+            await build_constraints(db, Schema.from_file(schema_path(root_path), options.integer_keys), options.columnstore, options.upsert)
+
+        if checkpoints and os.path.exists(checkpoints_path):
+            os.remove(checkpoints_path)
+
+        database_version(root_path).publish()
 
     except Exception as e:
         raise Exception(f"Error during database population: {e}")
@@ -0,0 +1,76 @@
+import os
+import sys
+import asyncio
+import tempfile
+import logging as log
+from typing import Dict, Optional, Sequence
+from modules.utils import (
+    get_root, get_paths, log_execution
+)
+from modules.cube import Cube
+from modules.reports import Reports
+
+log.basicConfig(
+    level=log.DEBUG,
+    format="%(asctime)s - %(levelname)s - [%(funcName)s] - %(message)s",
+    handlers=[
+        log.StreamHandler()
+    ]
+)
+
+log.getLogger("asyncio").setLevel(log.WARNING)
+
+BENCHMARK_SIZES = (1000000, 10000000)
+
+
+@log_execution
+async def export_reports(output_dir: Optional[str] = None) -> Dict[str, float]:
+    """
+    Computes the outputs of the `SSIS` packages `assignment_6b` to `assignment_9b` from the splitted files.
+
+    Args:
+        `output_dir (Optional[str])`: The output directory. Defaults to None (`data/reports`, with the layout of `SSIS/output_assignments`).
+
+    Returns:
+        `Dict[str, float]`: The elapsed seconds of every report.
+    """
+    root_path = get_root("dss")
+    sys.path.append(root_path)
+    project_path = os.path.join(root_path, "Group_ID_20_Part_1")
+    output_dir = output_dir or os.path.join(project_path, "data", "reports")
+
+    try:
+        cube = await Cube.load(get_paths(project_path, "splitted"))
+        return Reports(cube).export_all(output_dir)
+    except Exception as e:
+        raise Exception(f"Error during execution: {e}")
+
+@log_execution
+async def benchmark_reports(sizes: Sequence[int] = BENCHMARK_SIZES) -> Dict[int, Dict[str, float]]:
+    """
+    Measures the runtime of the reports on cubes of `sizes` facts, drawn from the splitted facts.
+
+    Args:
+        `sizes (Sequence[int], optional)`: The numbers of facts. Defaults to 1M and 10M.
+
+    Returns:
+        `Dict[int, Dict[str, float]]`: The elapsed seconds of every report, per number of facts.
+    """
+    root_path = get_root("dss")
+    sys.path.append(root_path)
+
+    try:
+        cube = await Cube.load(get_paths(os.path.join(root_path, "Group_ID_20_Part_1"), "splitted"))
+        results = {}
+        with tempfile.TemporaryDirectory() as output_dir:
+            for size in sizes:
+                results[size] = Reports(Reports.sample(cube, size)).export_all(output_dir)
+                log.info(f"{size} facts: " + ", ".join(f"`{name}` {seconds:.2f}s" for name, seconds in results[size].items()))
+        return results
+    except Exception as e:
+        raise Exception(f"Error during execution: {e}")
+
+
+if __name__ == "__main__":
+    asyncio.run(export_reports())
+    asyncio.run(benchmark_reports())
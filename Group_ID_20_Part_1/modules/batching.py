@@ -0,0 +1,132 @@
+import os
+import json
+from typing import Dict
+
+class BatchTuner:
+    """
+    Tunes a batch size online from the measured latency and throughput of each batch.
+
+    The size moves by a constant factor in the current direction as long as the throughput
+    improves, and reverses direction when it degrades. Batches slower than the target latency
+    always shrink the size, so that a single batch never holds a transaction for too long.
+
+    Attributes:
+        `size (int)`: The current batch size.
+        `minimum (int)`: The smallest allowed batch size.
+        `maximum (int)`: The largest allowed batch size.
+        `target_latency (float)`: The maximum desired duration of a batch, in seconds.
+        `factor (float)`: The multiplicative step applied to the batch size.
+    """
+
+    def __init__(self, initial: int = 10000, minimum: int = 500, maximum: int = 200000,
+                 target_latency: float = 2.0, factor: float = 1.25) -> None:
+        """
+        Initializes a BatchTuner object.
+
+        Args:
+            `initial (int, optional)`: The initial batch size. Defaults to 10,000.
+            `minimum (int, optional)`: The smallest allowed batch size. Defaults to 500.
+            `maximum (int, optional)`: The largest allowed batch size. Defaults to 200,000.
+            `target_latency (float, optional)`: The maximum desired duration of a batch, in seconds. Defaults to 2.0.
+            `factor (float, optional)`: The multiplicative step applied to the batch size. Defaults to 1.25.
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = max(minimum, min(initial, maximum))
+        self.target_latency = target_latency
+        self.factor = factor
+        self.direction = 1
+        self.last_throughput = None
+
+    def update(self, rows: int, seconds: float) -> int:
+        """
+        Records the outcome of a batch and computes the size of the next one.
+
+        Args:
+            `rows (int)`: The number of rows of the batch.
+            `seconds (float)`: The duration of the batch.
+
+        Returns:
+            `int`: The size of the next batch.
+        """
+        throughput = rows / seconds if seconds > 0 else float("inf")
+
+        if seconds > self.target_latency:
+            self.direction = -1
+        elif self.last_throughput is not None and throughput < self.last_throughput:
+            self.direction = -self.direction
+
+        self.last_throughput = throughput
+        self.size = max(self.minimum, min(int(self.size * self.factor ** self.direction), self.maximum))
+        return self.size
+
+class Checkpoints:
+    """
+    Records in a `JSON` file the number of rows committed for each table, so that a load can resume.
+
+    Attributes:
+        `file_path (str)`: The path to the checkpoint file.
+        `offsets (Dict[str, int])`: Mapping of checkpoint keys (usually table names) to committed row offsets.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """
+        Initializes a Checkpoints object, reading the checkpoint file if it exists.
+
+        Args:
+            `file_path (str)`: The path to the checkpoint file.
+        """
+        self.file_path = file_path
+        self.offsets: Dict[str, int] = {}
+        if os.path.exists(file_path):
+            with open(file_path, "r") as file:
+                self.offsets = json.load(file)
+
+    def get(self, key: str) -> int:
+        """
+        Returns the committed offset of a key.
+
+        Args:
+            `key (str)`: The checkpoint key.
+
+        Returns:
+            `int`: The number of rows already committed, or 0.
+        """
+        return self.offsets.get(key, 0)
+
+    def save(self, key: str, offset: int) -> None:
+        """
+        Records the committed offset of a key and writes the checkpoint file.
+
+        Args:
+            `key (str)`: The checkpoint key.
+            `offset (int)`: The number of rows committed.
+        """
+        self.offsets[key] = offset
+        self._write()
+
+    def reset(self, key: str) -> None:
+        """
+        Forgets the committed offset of a key, so that the next load starts from the first row.
+
+        Args:
+            `key (str)`: The checkpoint key.
+        """
+        if key in self.offsets:
+            del self.offsets[key]
+            self._write()
+
+    def _write(self) -> None:
+        """
+        Writes the checkpoint file, replacing it atomically, so that an interrupted write never loses the committed offsets.
+
+        Raises:
+            `IOError`: If an error occurs while writing to the file.
+        """
+        temporary = f"{self.file_path}.tmp"
+        try:
+            with open(temporary, "w") as file:
+                json.dump(self.offsets, file, indent=4)
+            os.replace(temporary, self.file_path)
+        except IOError as e:
+            raise IOError(f"Error writing to file {self.file_path}: {e}") from e
@@ -0,0 +1,200 @@
+import numpy as np
+from typing import Dict, Iterable, List
+
+# Positions are split into chunks of 2^16 sharing their high bits, as in Roaring bitmaps.
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+
+# Above this many positions a chunk is stored as a bitset (8 KiB) rather than a sorted array.
+ARRAY_LIMIT = 4096
+
+# Number of set bits of every byte.
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.int32)
+
+def _contains(bitset: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Tests the bits of a bitset container at the given low positions.
+    """
+    return ((bitset[values >> 3] >> (values & 7).astype(np.uint8)) & 1).astype(bool)
+
+def _to_bitset(values: np.ndarray) -> np.ndarray:
+    """
+    Converts an array container into a bitset container.
+    """
+    bits = np.zeros(CHUNK_SIZE, dtype=bool)
+    bits[values] = True
+    return np.packbits(bits, bitorder="little")
+
+def _to_array(bitset: np.ndarray) -> np.ndarray:
+    """
+    Converts a bitset container into an array container.
+    """
+    return np.flatnonzero(np.unpackbits(bitset, bitorder="little")).astype(np.uint16)
+
+def _cardinality(container: np.ndarray) -> int:
+    """
+    Returns the number of positions of a container.
+    """
+    return int(POPCOUNT[container].sum()) if container.dtype == np.uint8 else len(container)
+
+def _normalize(container: np.ndarray) -> np.ndarray:
+    """
+    Stores a container in its smallest representation, or returns None if it is empty.
+    """
+    if container.dtype == np.uint8:
+        if _cardinality(container) > ARRAY_LIMIT:
+            return container
+        container = _to_array(container)
+    if not len(container):
+        return None
+    return _to_bitset(container) if len(container) > ARRAY_LIMIT else container
+
+class Bitmap:
+    """
+    A compressed set of fact positions, in the layout of Roaring bitmaps.
+
+    Positions are split into chunks of 65,536 sharing their high bits. A sparse chunk is stored as
+    the sorted array of its low bits (`uint16`), a dense one as a bitset of 8 KiB (`uint8`), so that
+    a bitmap never takes more than about 2 bytes per position nor more than 1 bit per fact. `AND`
+    and `OR` are computed chunk by chunk, only on the chunks present in both (or either) operand.
+
+    Attributes:
+        `containers (Dict[int, np.ndarray])`: The container of each non-empty chunk, by high bits.
+    """
+
+    def __init__(self, containers: Dict[int, np.ndarray] = None) -> None:
+        """
+        Initializes a Bitmap object.
+
+        Args:
+            `containers (Dict[int, np.ndarray], optional)`: The containers, by high bits. Defaults to None (empty).
+        """
+        self.containers = containers or {}
+
+    @classmethod
+    def from_positions(cls, positions: np.ndarray) -> "Bitmap":
+        """
+        Builds a bitmap from sorted, distinct positions.
+
+        Args:
+            `positions (np.ndarray)`: The positions, in ascending order.
+
+        Returns:
+            `Bitmap`: The bitmap.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if not len(positions):
+            return cls()
+        high = positions >> CHUNK_BITS
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(high)) + 1))
+        ends = np.append(starts[1:], len(positions))
+        low = (positions & (CHUNK_SIZE - 1)).astype(np.uint16)
+        return cls({int(high[start]): _normalize(low[start:end]) for start, end in zip(starts, ends)})
+
+    def __len__(self) -> int:
+        """
+        Returns the number of positions of the bitmap.
+        """
+        return sum(_cardinality(container) for container in self.containers.values())
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        containers = {}
+        for key in self.containers.keys() & other.containers.keys():
+            left, right = self.containers[key], other.containers[key]
+            if left.dtype == np.uint8 and right.dtype == np.uint8:
+                result = left & right
+            elif left.dtype == np.uint8:
+                result = right[_contains(left, right)]
+            elif right.dtype == np.uint8:
+                result = left[_contains(right, left)]
+            else:
+                result = np.intersect1d(left, right, assume_unique=True)
+            result = _normalize(result)
+            if result is not None:
+                containers[key] = result
+        return Bitmap(containers)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        containers = dict(self.containers)
+        for key, right in other.containers.items():
+            left = containers.get(key)
+            if left is None:
+                containers[key] = right
+            elif left.dtype == np.uint8 or right.dtype == np.uint8:
+                left = left if left.dtype == np.uint8 else _to_bitset(left)
+                right = right if right.dtype == np.uint8 else _to_bitset(right)
+                containers[key] = left | right
+            else:
+                containers[key] = _normalize(np.union1d(left, right))
+        return Bitmap(containers)
+
+    @staticmethod
+    def union(bitmaps: Iterable["Bitmap"]) -> "Bitmap":
+        """
+        Computes the union of several bitmaps.
+        """
+        result = Bitmap()
+        for bitmap in bitmaps:
+            result = result | bitmap
+        return result
+
+    @staticmethod
+    def intersection(bitmaps: List["Bitmap"]) -> "Bitmap":
+        """
+        Computes the intersection of several bitmaps, starting from the smallest one.
+        """
+        bitmaps = sorted(bitmaps, key=lambda bitmap: len(bitmap.containers))
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            result = result & bitmap
+        return result
+
+    def to_positions(self) -> np.ndarray:
+        """
+        Returns the positions of the bitmap in ascending order.
+        """
+        parts = [
+            (key << CHUNK_BITS) + (_to_array(container) if container.dtype == np.uint8 else container).astype(np.int64)
+            for key, container in sorted(self.containers.items())
+        ]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def to_mask(self, size: int) -> np.ndarray:
+        """
+        Returns the bitmap as a boolean mask over `size` positions.
+        """
+        mask = np.zeros(size, dtype=bool)
+        mask[self.to_positions()] = True
+        return mask
+
+class BitmapIndex:
+    """
+    A bitmap index of a level of the cube: one bitmap of fact positions per member.
+
+    Attributes:
+        `bitmaps (List[Bitmap])`: The bitmap of every member code.
+    """
+
+    def __init__(self, codes: np.ndarray, cardinality: int) -> None:
+        """
+        Initializes a BitmapIndex object, sorting the facts by member once.
+
+        Args:
+            `codes (np.ndarray)`: The member code of every fact.
+            `cardinality (int)`: The number of members.
+        """
+        order = np.argsort(codes, kind="stable")
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=cardinality))))
+        self.bitmaps = [Bitmap.from_positions(order[bounds[code]:bounds[code + 1]]) for code in range(cardinality)]
+
+    def select(self, codes: Iterable[int]) -> Bitmap:
+        """
+        Returns the facts of any of the given members.
+
+        Args:
+            `codes (Iterable[int])`: The member codes.
+
+        Returns:
+            `Bitmap`: The union of their bitmaps.
+        """
+        return Bitmap.union(self.bitmaps[code] for code in codes)
@@ -0,0 +1,257 @@
+import os
+import copy
+import json
+import time
+import uuid
+import pickle
+import hashlib
+import logging as log
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+class DataVersion:
+    """
+    A class for the version of a published dataset, e.g. the splitted files or the database.
+
+    Publishing new data writes a new random version id to a `JSON` file. Readers key what they derive
+    from the data (e.g. cached query results) on the current id, so that it is invalidated as soon as
+    new data is published. Writers remove the file with `invalidate` before they start rewriting the
+    data, so that a failed run never leaves the previous id over half-written data. If the file does
+    not exist, the version is a fingerprint of the paths, sizes and modification times of the source
+    files, or unknown without source files.
+
+    Attributes:
+        `file_path (str)`: The path to the version file.
+        `sources (List[str])`: The files fingerprinted when there is no version file.
+    """
+
+    def __init__(self, file_path: str, sources: List[str] = None) -> None:
+        """
+        Initializes a DataVersion object.
+
+        Args:
+            `file_path (str)`: The path to the version file.
+            `sources (List[str], optional)`: The files fingerprinted when there is no version file. Defaults to None.
+        """
+        self.file_path = file_path
+        self.sources = sources or []
+
+    def current(self) -> Optional[str]:
+        """
+        Returns the current version id.
+
+        Returns:
+            `Optional[str]`: The id written by the last `publish`, the fingerprint of the sources,
+                or None if there is neither (nothing derived from the data must then be reused).
+        """
+        if os.path.exists(self.file_path):
+            with open(self.file_path, mode="r", encoding="utf-8") as file:
+                return json.load(file)["version"]
+        if not self.sources:
+            return None
+        return self.fingerprint(self.sources)
+
+    @staticmethod
+    def fingerprint(sources: List[str]) -> str:
+        """
+        Fingerprints files on their paths, sizes and modification times.
+
+        Args:
+            `sources (List[str])`: The files. Missing files are skipped.
+
+        Returns:
+            `str`: The fingerprint.
+        """
+        digest = hashlib.sha1()
+        for source in sources:
+            if os.path.exists(source):
+                stat = os.stat(source)
+                digest.update(f"{source}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+        return f"files-{digest.hexdigest()[:16]}"
+
+    def invalidate(self) -> None:
+        """
+        Withdraws the published version, before the data is rewritten.
+        """
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+            log.info(f"Data version withdrawn from {self.file_path}.")
+
+    def publish(self) -> str:
+        """
+        Publishes a new version.
+
+        Returns:
+            `str`: The new version id.
+        """
+        version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        with open(self.file_path, mode="w", encoding="utf-8") as file:
+            json.dump({"version": version, "published": time.strftime("%Y-%m-%d %H:%M:%S")}, file)
+        log.info(f"Data version {version} published to {self.file_path}.")
+        return version
+
+class ResultCache:
+    """
+    A size-bounded LRU cache of query results, keyed on a normalized query specification and the data version.
+
+    Every entry records the version of the data it was computed from: a lookup with another version
+    misses and drops the entry, so that results never outlive the data. Results are copied in and out,
+    so that callers may modify them (e.g. with window functions). With a file path, the entries are
+    persisted with `pickle` after every insertion and reloaded on creation.
+
+    Attributes:
+        `max_entries (int)`: The maximum number of entries, the least recently used ones being evicted first.
+        `file_path (Optional[str])`: The path to the persistence file. Defaults to None (in memory only).
+        `hits (int)`: The number of lookups served from the cache.
+        `misses (int)`: The number of lookups not served from the cache.
+    """
+
+    def __init__(self, max_entries: int = 256, file_path: Optional[str] = None) -> None:
+        """
+        Initializes a ResultCache object, reloading the persisted entries if any.
+
+        Args:
+            `max_entries (int, optional)`: The maximum number of entries. Defaults to 256.
+            `file_path (Optional[str])`: The path to the persistence file. Defaults to None.
+        """
+        self.max_entries = max_entries
+        self.file_path = file_path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        if file_path and os.path.exists(file_path):
+            try:
+                with open(file_path, mode="rb") as file:
+                    self._entries = pickle.load(file)
+            except Exception as e:
+                log.warning(f"Ignoring the unreadable result cache {file_path}: {e}")
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of entries of the cache.
+        """
+        return len(self._entries)
+
+    @staticmethod
+    def key(spec: Dict[str, Any]) -> str:
+        """
+        Normalizes a query specification into a cache key.
+
+        Mappings are ordered by key and sets by value, so that equivalent specifications share their key.
+
+        Args:
+            `spec (Dict[str, Any])`: The query specification.
+
+        Returns:
+            `str`: The key.
+        """
+        def normalize(value: Any) -> Any:
+            if isinstance(value, dict):
+                return {str(name): normalize(item) for name, item in value.items()}
+            if isinstance(value, (set, frozenset)):
+                return sorted((normalize(item) for item in value), key=str)
+            if isinstance(value, (list, tuple)):
+                return [normalize(item) for item in value]
+            return value
+
+        text = json.dumps(normalize(spec), sort_keys=True, default=str)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, spec: Dict[str, Any], version: str) -> Tuple[bool, Any]:
+        """
+        Looks up the result of a query.
+
+        Args:
+            `spec (Dict[str, Any])`: The query specification.
+            `version (str)`: The current data version.
+
+        Returns:
+            `Tuple[bool, Any]`: Whether the result was found, and a copy of it.
+        """
+        key = self.key(spec)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] != version:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, copy.deepcopy(entry[1])
+
+    def put(self, spec: Dict[str, Any], version: str, result: Any) -> None:
+        """
+        Stores the result of a query, evicting the least recently used entries beyond `max_entries`.
+
+        Args:
+            `spec (Dict[str, Any])`: The query specification.
+            `version (str)`: The data version the result was computed from.
+            `result (Any)`: The result.
+        """
+        key = self.key(spec)
+        self._entries[key] = (version, copy.deepcopy(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.save()
+
+    def fetch(self, spec: Dict[str, Any], version: str, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached result of a query, computing and storing it on a miss.
+
+        Args:
+            `spec (Dict[str, Any])`: The query specification.
+            `version (str)`: The current data version.
+            `compute (Callable[[], Any])`: The function computing the result.
+
+        Returns:
+            `Any`: The result.
+        """
+        found, result = self.get(spec, version)
+        if not found:
+            result = compute()
+            self.put(spec, version, result)
+        return result
+
+    def prune(self, version: str) -> int:
+        """
+        Drops the entries computed from another version than `version`.
+
+        Returns:
+            `int`: The number of entries dropped.
+        """
+        stale = [key for key, (entry_version, _) in self._entries.items() if entry_version != version]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self.save()
+        return len(stale)
+
+    def clear(self) -> None:
+        """
+        Drops every entry.
+        """
+        self._entries.clear()
+        self.save()
+
+    def save(self) -> None:
+        """
+        Persists the entries to the cache file, if any, replacing it atomically.
+
+        Raises:
+            `IOError`: If an error occurs while writing to the file.
+        """
+        if not self.file_path:
+            return
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        temporary = f"{self.file_path}.tmp"
+        try:
+            with open(temporary, mode="wb") as file:
+                pickle.dump(self._entries, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, self.file_path)
+        except IOError as e:
+            raise IOError(f"Error writing to file {self.file_path}: {e}") from e
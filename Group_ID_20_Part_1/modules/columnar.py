@@ -0,0 +1,314 @@
+import os
+import json
+import shutil
+import aiofiles
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from modules.utils import read_json
+from modules.cache import DataVersion
+
+class ColumnarTable:
+    """
+    A class for a table stored by column in chunks, with zone maps for predicate skipping.
+
+    A table is a directory holding one file per column and a `meta.json` file. The rows are stored in
+    chunks (the batches they were written in): every column file holds one line per chunk, the `JSON`
+    list of the values of the column in the chunk, whose offset is recorded in the metadata. A read
+    therefore only opens the projected columns and seeks to the chunks it needs.
+
+    The metadata also records, for every chunk and column, its zone map: the minimum and maximum
+    values (compared as numbers if every value of the chunk is numeric), the number of empty values,
+    the number of distinct values and, when there are at most `VALUES_LIMIT` of them, the values
+    themselves. A read with a predicate skips every chunk whose zone map rules it out, without
+    reading it, and filters the rows of the other chunks.
+
+    A predicate maps columns to a `(low, high)` range, inclusive and open when a bound is None,
+    or to a value or list of values.
+
+    Attributes:
+        `path (str)`: The directory of the table.
+        `meta (Dict[str, Any])`: The metadata: the stored `fieldnames`, the `columns` read by default, the `chunks`
+            and the fingerprint of the `sources` the table was copied from.
+        `skipped (int)`: The number of chunks skipped by the last read.
+    """
+
+    META_FILE = "meta.json"
+
+    VALUES_LIMIT = 32
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializes a ColumnarTable object from its directory.
+
+        Args:
+            `path (str)`: The directory of the table.
+
+        Raises:
+            `FileNotFoundError`: If the directory does not hold a table.
+        """
+        self.path = path
+        self.meta = read_json(os.path.join(path, self.META_FILE))
+        self.skipped = 0
+
+    def __len__(self) -> int:
+        """
+        Returns the number of rows of the table.
+        """
+        return sum(chunk["rows"] for chunk in self.meta["chunks"])
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        """
+        Returns whether a directory holds a table.
+        """
+        return os.path.exists(os.path.join(path, cls.META_FILE))
+
+    def is_current(self, sources: List[str]) -> bool:
+        """
+        Returns whether the table was copied from the current state of files, i.e. none of them changed since.
+
+        Args:
+            `sources (List[str])`: The files.
+        """
+        return self.meta.get("sources") == DataVersion.fingerprint(sources)
+
+    @staticmethod
+    def _numbers(values: List[str]) -> Optional[List[float]]:
+        """
+        Converts values to numbers, or returns None if any of them is not numeric.
+        """
+        try:
+            return [float(value) for value in values]
+        except ValueError:
+            return None
+
+    @classmethod
+    def _zone_map(cls, values: List[str]) -> Dict[str, Any]:
+        """
+        Computes the statistics of the values of a column in a chunk.
+        """
+        present = set(values)
+        present.discard("")
+        numbers = cls._numbers(list(present))
+        members = numbers if numbers is not None else list(present)
+        stats = {
+            "numeric": numbers is not None,
+            "min": min(members, default=None),
+            "max": max(members, default=None),
+            "nulls": values.count(""),
+            "distinct": len(present),
+        }
+        if len(present) <= cls.VALUES_LIMIT:
+            stats["values"] = sorted(members)
+        return stats
+
+    @classmethod
+    async def write(cls, path: str, batches: AsyncIterator[List[Dict[str, Any]]], columns: List[str],
+                    zone_columns: Optional[Dict[str, Callable[[Dict[str, Any]], Any]]] = None,
+                    sources: Optional[List[str]] = None) -> "ColumnarTable":
+        """
+        Writes a table, one chunk per batch of rows, replacing any table at the same path.
+
+        Args:
+            `path (str)`: The directory of the table.
+            `batches (AsyncIterator[List[Dict[str, Any]]])`: The batches of rows, e.g. from `Reader.stream_csv`.
+            `columns (List[str])`: The columns of the rows.
+            `zone_columns (Optional[Dict[str, Callable[[Dict[str, Any]], Any]]])`: Extra columns computed from every row
+                and stored for predicates only (e.g. the year of a fact), not read by default. Defaults to None.
+            `sources (Optional[List[str]])`: The files the rows are read from, fingerprinted so that `is_current`
+                detects a copy older than them. Defaults to None.
+
+        Returns:
+            `ColumnarTable`: The table.
+
+        Raises:
+            `IOError`: If an error occurs while writing the files.
+        """
+        zone_columns = zone_columns or {}
+        fieldnames = columns + [column for column in zone_columns if column not in columns]
+        temporary = f"{path}.tmp"
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+
+        files = {column: open(os.path.join(temporary, f"{column}.jsonl"), mode="w", encoding="utf-8") for column in fieldnames}
+        chunks = []
+        try:
+            async for batch in batches:
+                if not batch:
+                    continue
+                chunk = {"rows": len(batch), "offsets": {}, "stats": {}}
+                for column in fieldnames:
+                    compute = zone_columns.get(column)
+                    values = list(map(compute, batch)) if compute else [row.get(column) for row in batch]
+                    if not all(type(value) is str for value in values):
+                        values = ["" if value is None else str(value) for value in values]
+                    chunk["offsets"][column] = files[column].tell()
+                    chunk["stats"][column] = cls._zone_map(values)
+                    files[column].write(json.dumps(values) + "\n")
+                chunks.append(chunk)
+        except IOError as e:
+            raise IOError(f"Error writing the columnar table {path}: {e}") from e
+        finally:
+            for file in files.values():
+                file.close()
+
+        with open(os.path.join(temporary, cls.META_FILE), mode="w", encoding="utf-8") as file:
+            meta = {"fieldnames": fieldnames, "columns": columns, "chunks": chunks}
+            if sources is not None:
+                meta["sources"] = DataVersion.fingerprint(sources)
+            json.dump(meta, file)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temporary, path)
+        return cls(path)
+
+    @staticmethod
+    def _predicate(condition: Any) -> Tuple[Optional[Tuple[Any, Any]], Optional[List[Any]]]:
+        """
+        Splits a condition into a `(low, high)` range or a list of values.
+        """
+        if isinstance(condition, tuple) and len(condition) == 2:
+            return condition, None
+        return None, list(condition) if isinstance(condition, (list, tuple, set)) else [condition]
+
+    @classmethod
+    def _members(cls, values: List[Any], numeric: bool) -> set:
+        """
+        Converts the values of a condition to the type of the values of a chunk.
+        """
+        if not numeric:
+            return {str(value) for value in values}
+        members = set()
+        for value in values:
+            try:
+                members.add(float(value))
+            except (TypeError, ValueError):
+                pass
+        return members
+
+    def _may_match(self, stats: Dict[str, Any], condition: Any) -> bool:
+        """
+        Returns whether a chunk may hold rows matching a condition, from its zone map.
+        """
+        if not stats["distinct"]:
+            return False
+        numeric = stats["numeric"]
+        low_high, values = self._predicate(condition)
+        if low_high is not None:
+            low, high = (None if bound is None else float(bound) if numeric else str(bound) for bound in low_high)
+            return (low is None or stats["max"] >= low) and (high is None or stats["min"] <= high)
+        members = self._members(values, numeric)
+        if "values" in stats:
+            return bool(members & set(stats["values"]))
+        return any(stats["min"] <= member <= stats["max"] for member in members)
+
+    def chunks(self, where: Optional[Dict[str, Any]] = None) -> List[int]:
+        """
+        Returns the chunks that may hold rows matching a predicate.
+
+        Args:
+            `where (Optional[Dict[str, Any]])`: The predicate. Defaults to None (every chunk).
+
+        Returns:
+            `List[int]`: The positions of the chunks.
+
+        Raises:
+            `KeyError`: If a column of the predicate is not stored.
+        """
+        missing = [column for column in (where or {}) if column not in self.meta["fieldnames"]]
+        if missing:
+            raise KeyError(f"The following columns are not present in the table: {', '.join(missing)}")
+        return [
+            position for position, chunk in enumerate(self.meta["chunks"])
+            if all(self._may_match(chunk["stats"][column], condition) for column, condition in (where or {}).items())
+        ]
+
+    def _keep(self, values: List[str], condition: Any, numeric: bool) -> List[bool]:
+        """
+        Returns whether every value of a chunk matches a condition.
+        """
+        low_high, members = self._predicate(condition)
+        if numeric:
+            values = [float(value) if value != "" else None for value in values]
+        if low_high is not None:
+            low, high = (None if bound is None else float(bound) if numeric else str(bound) for bound in low_high)
+            return [
+                value is not None and value != "" and (low is None or value >= low) and (high is None or value <= high)
+                for value in values
+            ]
+        members = self._members(members, numeric)
+        return [value in members for value in values]
+
+    async def read(self, columns: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> AsyncIterator[List[Dict[str, str]]]:
+        """
+        Streams the rows of the table matching a predicate, one batch per chunk read.
+
+        Args:
+            `columns (Optional[List[str]])`: The projected columns. Defaults to None (the columns the table was written with).
+            `where (Optional[Dict[str, Any]])`: The predicate. Defaults to None (every row).
+
+        Yields:
+            `List[Dict[str, str]]`: The matching rows of a chunk, restricted to the projected columns.
+
+        Raises:
+            `KeyError`: If a column is not stored.
+            `Exception`: If an error occurs while reading the files.
+        """
+        columns = columns or self.meta["columns"]
+        missing = [column for column in columns if column not in self.meta["fieldnames"]]
+        if missing:
+            raise KeyError(f"The following columns are not present in the table: {', '.join(missing)}")
+
+        where = where or {}
+        selected = self.chunks(where)
+        self.skipped = len(self.meta["chunks"]) - len(selected)
+        needed = list(dict.fromkeys(columns + list(where)))
+
+        files = {}
+        try:
+            for column in needed:
+                files[column] = await aiofiles.open(os.path.join(self.path, f"{column}.jsonl"), mode="r", encoding="utf-8")
+            for position in selected:
+                chunk = self.meta["chunks"][position]
+                data = {}
+                for column in needed:
+                    await files[column].seek(chunk["offsets"][column])
+                    data[column] = json.loads(await files[column].readline())
+
+                keep = None
+                for column, condition in where.items():
+                    matches = self._keep(data[column], condition, chunk["stats"][column]["numeric"])
+                    keep = matches if keep is None else [left and right for left, right in zip(keep, matches)]
+
+                rows = [dict(zip(columns, values)) for values in zip(*(data[column] for column in columns))]
+                if keep is not None:
+                    rows = [row for row, kept in zip(rows, keep) if kept]
+                if rows:
+                    yield rows
+        except KeyError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error reading the columnar table {self.path}: {e}")
+        finally:
+            for file in files.values():
+                await file.close()
+
+    def statistics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Combines the zone maps of the chunks into statistics of every column of the table.
+
+        Returns:
+            `Dict[str, Dict[str, Any]]`: The minimum, maximum, number of empty values and largest number
+                of distinct values in a chunk of every column.
+        """
+        statistics = {}
+        for column in self.meta["fieldnames"]:
+            zone_maps = [chunk["stats"][column] for chunk in self.meta["chunks"] if chunk["stats"][column]["distinct"]]
+            numeric = all(stats["numeric"] for stats in zone_maps)
+            key = (lambda value: value) if numeric else str
+            statistics[column] = {
+                "min": min((stats["min"] for stats in zone_maps), key=key, default=None),
+                "max": max((stats["max"] for stats in zone_maps), key=key, default=None),
+                "nulls": sum(chunk["stats"][column]["nulls"] for chunk in self.meta["chunks"]),
+                "max_chunk_distinct": max((stats["distinct"] for stats in zone_maps), default=0),
+            }
+        return statistics
@@ -0,0 +1,680 @@
+import os
+import asyncio
+import logging as log
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from modules.data import Data
+from modules.bitmap import Bitmap, BitmapIndex
+from modules.topk import TopK
+from modules.cache import DataVersion, ResultCache
+from modules.reader import Reader
+from modules.columnar import ColumnarTable
+from modules.utils import read_json
+
+def encode(values: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encodes values as integer codes into their sorted distinct values.
+
+    Values that are all integers (or all numbers) are converted first, so that members
+    sort numerically (e.g. months 1 to 12) rather than as strings.
+
+    Args:
+        `values (List[Any])`: The values to encode.
+
+    Returns:
+        `Tuple[np.ndarray, np.ndarray]`: The sorted distinct values (the labels), and the code of each value.
+    """
+    for conversion in (int, float):
+        try:
+            converted = np.array([conversion(value) for value in values])
+            break
+        except (TypeError, ValueError):
+            continue
+    else:
+        converted = np.array(["" if value is None else str(value) for value in values], dtype=object)
+    labels, codes = np.unique(converted, return_inverse=True)
+    return labels, codes.astype(np.int32)
+
+def day_night(row: Dict[str, Any]) -> str:
+    """
+    Classifies the time of a crash as `DAY` (8 AM to 9 PM) or `NIGHT`, as the `assignment_7b` package does.
+
+    Args:
+        `row (Dict[str, Any])`: The `DATE` row, with `CRASH_TIME` (`hh:mm:ss`, 12-hour clock) and `CRASH_PERIOD` (`AM`/`PM`).
+
+    Returns:
+        `str`: `DAY` or `NIGHT`.
+    """
+    time, period = row["CRASH_TIME"], row["CRASH_PERIOD"]
+    day = (
+        (period == "AM" and "08:00:00" <= time <= "11:59:59")
+        or (period == "PM" and "12:00:00" <= time <= "12:59:59")
+        or (period == "PM" and "01:00:00" <= time <= "08:59:59")
+    )
+    return "DAY" if day else "NIGHT"
+
+def distinct(values: np.ndarray, return_inverse: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Returns the sorted distinct values of an integer array, by sorting it and keeping the first of each run.
+
+    Args:
+        `values (np.ndarray)`: The values.
+        `return_inverse (bool, optional)`: Whether to also return the position of every value among the distinct ones. Defaults to False.
+
+    Returns:
+        `Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]`: The distinct values, and their inverse if requested.
+    """
+    order = np.argsort(values, kind="stable") if return_inverse else None
+    ordered = values[order] if return_inverse else np.sort(values)
+    first = np.empty(len(ordered), dtype=bool)
+    first[:1] = True
+    np.not_equal(ordered[1:], ordered[:-1], out=first[1:])
+    if not return_inverse:
+        return ordered[first]
+    inverse = np.empty(len(values), dtype=np.int64)
+    inverse[order] = np.cumsum(first) - 1
+    return ordered[first], inverse
+
+class Cube:
+    """
+    An in-process `OLAP` engine over the star schema of the damage facts.
+
+    The foreign keys of the facts are resolved once into the row positions of the dimension
+    tables, and every dimension attribute is encoded as integer codes into its sorted members.
+    A query then maps the facts onto their attribute codes, combines them into a single group
+    code and aggregates the measures with `numpy.bincount`, so that slicing and rolling up
+    millions of facts never touches a Python object per fact.
+
+    Levels are referenced as `Dimension.ATTRIBUTE` (e.g. `Date.CRASH_YEAR`). Any attribute of a
+    dimension table can be used, as well as the derived ones in `DERIVED`. `HIERARCHIES` lists
+    the levels of each hierarchy from the top one down.
+
+    Attributes:
+        `dimensions (Dict[str, Data])`: The dimension tables, by dimension name.
+        `keys (Dict[str, np.ndarray])`: The row position, in each dimension table, of the member of every fact.
+        `values (Dict[str, np.ndarray])`: The columns of the measures of every fact.
+        `indexes (Dict[str, BitmapIndex])`: The bitmap indexes of the levels indexed with `index`.
+        `version (Optional[str])`: The version of the splitted files the cube was loaded from, if known.
+        `cache (Optional[ResultCache])`: The cache of the query results, used when the version is known. Defaults to None.
+    """
+
+    DIMENSIONS = {
+        "Crash": ("CRASH", "CRASH_ID"),
+        "Date": ("DATE", "DATE_ID"),
+        "Location": ("LOCATION", "LOCATION_ID"),
+        "Injury": ("INJURY", "INJURY_ID"),
+        "Person": ("PERSON", "PERSON_ID"),
+        "Vehicle": ("VEHICLE", "VEHICLE_ID"),
+    }
+
+    HIERARCHIES = {
+        "Date": ["Date.CRASH_YEAR", "Date.CRASH_MONTH", "Date.CRASH_DAY"],
+        "Location": ["Location.GEOHASH", "Location.BEAT_OF_OCCURRENCE", "Location.STREET_NAME"],
+        "Vehicle": ["Vehicle.VEHICLE_TYPE", "Vehicle.MAKE", "Vehicle.MODEL"],
+    }
+
+    # Measure name: (aggregation, fact column, or dimension whose distinct members are counted).
+    MEASURES = {
+        "DAMAGE_COST": ("sum", "DAMAGE_COST"),
+        "NUM_UNITS": ("sum", "NUM_UNITS"),
+        "NUM_FACTS": ("count", None),
+        "NUM_CRASHES": ("distinct", "Crash"),
+    }
+
+    GEOHASH_PRECISION = 5
+
+    DERIVED: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+        "Location.GEOHASH": lambda row: row["LOCATION_POINT"][:Cube.GEOHASH_PRECISION],
+        "Date.DAY_NIGHT": day_night,
+        "Date.SEASONS": lambda row: "SUMMER_SPRING" if row["CRASH_SEASON"] in ("SUMMER", "SPRING") else "WINTER_AUTUMN",
+    }
+
+    def __init__(self, dimensions: Dict[str, Data], keys: Dict[str, np.ndarray], values: Dict[str, np.ndarray]) -> None:
+        """
+        Initializes a Cube object from already resolved facts.
+
+        Args:
+            `dimensions (Dict[str, Data])`: The dimension tables, by dimension name.
+            `keys (Dict[str, np.ndarray])`: The row position, in each dimension table, of the member of every fact.
+            `values (Dict[str, np.ndarray])`: The columns of the measures of every fact.
+        """
+        self.dimensions = dimensions
+        self.keys = keys
+        self.values = values
+        self._members: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._codes: Dict[str, np.ndarray] = {}
+        self.indexes: Dict[str, BitmapIndex] = {}
+        self.version: Optional[str] = None
+        self.cache: Optional[ResultCache] = None
+
+    def __len__(self) -> int:
+        """
+        Returns the number of facts of the cube.
+        """
+        return len(next(iter(self.values.values())))
+
+    @classmethod
+    def from_data(cls, facts: Union[Data, List[Dict[str, Any]]], dimensions: Dict[str, Data]) -> "Cube":
+        """
+        Builds a cube from fact rows and dimension tables.
+
+        Facts referencing a member missing from a dimension table are dropped.
+
+        Args:
+            `facts (Union[Data, List[Dict[str, Any]]])`: The fact rows, or a dataset holding them.
+            `dimensions (Dict[str, Data])`: The dimension tables, by dimension name.
+
+        Returns:
+            `Cube`: The cube.
+        """
+        positions = cls._positions(dimensions)
+        return cls._assemble(dimensions, [cls._resolve(positions, facts.rows if isinstance(facts, Data) else facts)])
+
+    @classmethod
+    async def load(cls, data_paths: Dict[str, str], batch_size: int = 100000, where: Optional[Dict[str, Any]] = None) -> "Cube":
+        """
+        Loads a cube from the splitted files, streaming the facts (or their partitions) in batches.
+
+        When the columnar copy of the fact table exists, the facts are read from it, projected on the
+        columns of the cube, and a predicate on its zone columns (e.g. `{"CRASH_YEAR": (2015, 2016)}`)
+        loads only the matching facts, skipping the chunks ruled out by their zone maps.
+
+        The columnar copy is only used if none of the fact files changed since it was written; otherwise
+        the fact files are read.
+
+        The cube records the version of the files published by `generate_starschema_files`, which the
+        cached query results are keyed on. A cube loaded with a predicate holds other facts than the
+        full cube, so the predicate is part of its version.
+
+        Args:
+            `data_paths (Dict[str, str])`: The paths of the splitted files, from `get_paths(..., "splitted")`.
+            `batch_size (int, optional)`: The number of facts parsed at a time. Defaults to 100,000.
+            `where (Optional[Dict[str, Any]])`: The predicate on the columns of the columnar fact table. Defaults to None.
+
+        Returns:
+            `Cube`: The cube.
+
+        Raises:
+            `FileNotFoundError`: If a predicate is given and the columnar copy of the fact table does not exist or is outdated.
+        """
+        version = DataVersion(data_paths["VERSION"], sources=[path for key, path in data_paths.items() if key != "VERSION"]).current()
+        dimensions = {name: Data(data_paths[dataset_key]) for name, (dataset_key, _) in cls.DIMENSIONS.items()}
+        await asyncio.gather(*(data.initialize() for data in dimensions.values()))
+
+        files = [data_paths["DAMAGE"]]
+        if os.path.exists(data_paths["DAMAGE_MANIFEST"]):
+            directory = os.path.dirname(data_paths["DAMAGE_MANIFEST"])
+            files = [os.path.join(directory, partition["file"]) for partition in read_json(data_paths["DAMAGE_MANIFEST"])["partitions"]]
+
+        columnar_path = os.path.join(data_paths["COLUMNAR"], "damage")
+        table = ColumnarTable(columnar_path) if ColumnarTable.exists(columnar_path) else None
+        if table is not None and not table.is_current(files):
+            log.warning("The columnar copy of the fact table is older than the fact files and is ignored.")
+            table = None
+        if where and table is None:
+            raise FileNotFoundError("The fact table has no up-to-date columnar copy to filter.")
+
+        positions = cls._positions(dimensions)
+        parts = []
+        if table is not None:
+            columns = [key_column for _, key_column in cls.DIMENSIONS.values()]
+            columns += [column for aggregation, column in cls.MEASURES.values() if aggregation == "sum"]
+            async for batch in table.read(columns, where):
+                parts.append(cls._resolve(positions, batch))
+            log.info(f"Facts read from {len(table.meta['chunks']) - table.skipped} chunks, {table.skipped} skipped.")
+        else:
+            for file in files:
+                async for batch in Reader.stream_csv(file, batch_size):
+                    parts.append(cls._resolve(positions, batch))
+        cube = cls._assemble(dimensions, parts)
+        cube.version = f"{version}:where-{ResultCache.key(cls._load_spec(where))[:16]}" if version and where else version
+        log.info(f"Cube loaded: {len(cube)} facts.")
+        return cube
+
+    @staticmethod
+    def _load_spec(where: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Normalizes a load predicate, keeping ranges (tuples) apart from lists of values.
+        """
+        return {
+            column: {"range": [str(bound) for bound in condition]} if isinstance(condition, tuple) and len(condition) == 2 else
+            {"values": sorted(str(value) for value in (condition if isinstance(condition, (list, tuple, set)) else [condition]))}
+            for column, condition in where.items()
+        }
+
+    @classmethod
+    def _positions(cls, dimensions: Dict[str, Data]) -> Dict[str, Dict[str, int]]:
+        """
+        Maps the key of every member of each dimension table to its row position.
+        """
+        return {
+            name: {row[key_column]: position for position, row in enumerate(dimensions[name].rows)}
+            for name, (_, key_column) in cls.DIMENSIONS.items()
+        }
+
+    @classmethod
+    def _resolve(cls, positions: Dict[str, Dict[str, int]], batch: List[Dict[str, Any]]) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """
+        Resolves a batch of fact rows into member positions (-1 when missing) and measure columns.
+        """
+        keys = {
+            name: np.fromiter((positions[name].get(row[key_column], -1) for row in batch), dtype=np.int32, count=len(batch))
+            for name, (_, key_column) in cls.DIMENSIONS.items()
+        }
+        values = {
+            column: np.fromiter((float(row[column] or 0) for row in batch), dtype=np.float64, count=len(batch))
+            for aggregation, column in cls.MEASURES.values() if aggregation == "sum"
+        }
+        return keys, values
+
+    @classmethod
+    def _assemble(cls, dimensions: Dict[str, Data], parts: List[Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]]) -> "Cube":
+        """
+        Concatenates resolved batches into a cube, dropping the facts with missing members.
+        """
+        keys = {
+            name: np.concatenate([part[0][name] for part in parts]) if parts else np.empty(0, dtype=np.int32)
+            for name in cls.DIMENSIONS
+        }
+        values = {
+            column: np.concatenate([part[1][column] for part in parts]) if parts else np.empty(0)
+            for aggregation, column in cls.MEASURES.values() if aggregation == "sum"
+        }
+
+        resolved = np.logical_and.reduce([codes >= 0 for codes in keys.values()])
+        if not resolved.all():
+            log.warning(f"{int((~resolved).sum())} facts reference missing dimension members and are dropped.")
+            keys = {name: codes[resolved] for name, codes in keys.items()}
+            values = {column: column_values[resolved] for column, column_values in values.items()}
+
+        return cls(dimensions, keys, values)
+
+    @staticmethod
+    def _split(level: str) -> Tuple[str, str]:
+        """
+        Splits a level reference into its dimension and attribute.
+
+        Raises:
+            `KeyError`: If the reference is not of the form `Dimension.ATTRIBUTE`.
+        """
+        dimension, _, attribute = level.partition(".")
+        if dimension not in Cube.DIMENSIONS or not attribute:
+            raise KeyError(f"Invalid level '{level}': use `Dimension.ATTRIBUTE` with a dimension among {', '.join(Cube.DIMENSIONS)}.")
+        return dimension, attribute
+
+    def members(self, level: str) -> np.ndarray:
+        """
+        Returns the sorted members of a level.
+
+        Args:
+            `level (str)`: The level, as `Dimension.ATTRIBUTE`.
+
+        Returns:
+            `np.ndarray`: The members.
+        """
+        return self._encode(level)[0]
+
+    def _encode(self, level: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the members of a level and the member code of every row of its dimension table, encoding them on first use.
+
+        Raises:
+            `KeyError`: If the attribute is not present in the dimension table.
+        """
+        encoded = self._members.get(level)
+        if encoded is None:
+            dimension, attribute = self._split(level)
+            data = self.dimensions[dimension]
+            derive = self.DERIVED.get(level)
+            if derive is None and attribute not in data.fieldnames:
+                raise KeyError(f"The column '{attribute}' is not present in dimension {dimension}.")
+            encoded = self._members[level] = encode([derive(row) if derive else row[attribute] for row in data.rows])
+        return encoded
+
+    def codes(self, level: str) -> np.ndarray:
+        """
+        Returns the member code of a level for every fact, computing it on first use.
+
+        Args:
+            `level (str)`: The level, as `Dimension.ATTRIBUTE`.
+
+        Returns:
+            `np.ndarray`: The codes, indexing the members of the level.
+        """
+        codes = self._codes.get(level)
+        if codes is None:
+            dimension, _ = self._split(level)
+            codes = self._codes[level] = self._encode(level)[1][self.keys[dimension]]
+        return codes
+
+    def levels(self, hierarchy: str, depth: int = None) -> List[str]:
+        """
+        Returns the levels of a hierarchy from the top one down.
+
+        Args:
+            `hierarchy (str)`: The name of the hierarchy.
+            `depth (int, optional)`: The number of levels. Defaults to None (all of them).
+
+        Returns:
+            `List[str]`: The levels.
+
+        Raises:
+            `KeyError`: If the hierarchy does not exist.
+        """
+        if hierarchy not in self.HIERARCHIES:
+            raise KeyError(f"Hierarchy '{hierarchy}' does not exist.")
+        return self.HIERARCHIES[hierarchy][:depth]
+
+    def _keep(self, level: str, members: Any) -> np.ndarray:
+        """
+        Returns whether each member of a level is among the given member, or list of members.
+        """
+        labels = self.members(level)
+        members = members if isinstance(members, (list, tuple, set)) else [members]
+        return np.isin(labels, np.array([type(labels[0])(member) for member in members] if len(labels) else [], dtype=labels.dtype))
+
+    def index(self, levels: List[str]) -> None:
+        """
+        Builds bitmap indexes on levels, so that slices on them are computed with bitmap operations instead of scans.
+
+        Indexes suit low-cardinality levels filtered often, e.g. `Date.CRASH_SEASON` or `Crash.WEATHER_CONDITION`.
+
+        Args:
+            `levels (List[str])`: The levels to index.
+        """
+        for level in levels:
+            if level not in self.indexes:
+                self.indexes[level] = BitmapIndex(self.codes(level), len(self.members(level)))
+
+    def select(self, where: Dict[str, Any]) -> Bitmap:
+        """
+        Computes the facts selected by a slice on indexed levels, as the intersection over
+        the levels of the union of the bitmaps of their members.
+
+        Args:
+            `where (Dict[str, Any])`: Mapping of indexed levels to the member, or list of members, to keep.
+
+        Returns:
+            `Bitmap`: The selected fact positions.
+
+        Raises:
+            `KeyError`: If a level is not indexed.
+        """
+        missing = [level for level in where if level not in self.indexes]
+        if missing:
+            raise KeyError(f"Levels {', '.join(missing)} are not indexed.")
+        return Bitmap.intersection([
+            self.indexes[level].select(np.flatnonzero(self._keep(level, members)))
+            for level, members in where.items()
+        ])
+
+    def mask(self, where: Optional[Dict[str, Any]] = None) -> Optional[np.ndarray]:
+        """
+        Computes the facts selected by a slice.
+
+        Indexed levels are combined with bitmap operations first, the others by scanning their codes.
+
+        Args:
+            `where (Optional[Dict[str, Any]])`: Mapping of levels to the member, or list of members, to keep. Defaults to None.
+
+        Returns:
+            `Optional[np.ndarray]`: A boolean mask over the facts, or None if every fact is selected.
+        """
+        if not where:
+            return None
+        indexed = {level: members for level, members in where.items() if level in self.indexes}
+        selected = self.select(indexed).to_mask(len(self)) if indexed else None
+        for level, members in where.items():
+            if level in indexed:
+                continue
+            dimension, _ = self._split(level)
+            facts = self._keep(level, members)[self._encode(level)[1]][self.keys[dimension]]
+            selected = facts if selected is None else selected & facts
+        return selected
+
+    def total(self, measure: str, where: Optional[Dict[str, Any]] = None) -> float:
+        """
+        Aggregates a measure over the facts of a slice.
+
+        When every level of the slice is indexed, only the positions of the selected facts are read.
+
+        Args:
+            `measure (str)`: The measure, among `MEASURES`.
+            `where (Optional[Dict[str, Any]])`: Mapping of levels to the member, or list of members, to keep. Defaults to None.
+
+        Returns:
+            `float`: The value of the measure.
+
+        Raises:
+            `KeyError`: If the measure does not exist.
+        """
+        if measure not in self.MEASURES:
+            raise KeyError(f"Measure '{measure}' does not exist.")
+        aggregation, source = self.MEASURES[measure]
+        if where and all(level in self.indexes for level in where):
+            positions = self.select(where).to_positions()
+        else:
+            mask = self.mask(where)
+            positions = np.flatnonzero(mask) if mask is not None else slice(None)
+
+        if aggregation == "sum":
+            return float(self.values[source][positions].sum())
+        if aggregation == "count":
+            return len(self.values[next(iter(self.values))][positions])
+        return len(distinct(self.keys[source][positions]))
+
+    def group(self, rows: List[str], mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Assigns every selected fact to its group of members of the row levels.
+
+        The levels of each dimension are first combined over the rows of the dimension table, so that
+        their group space only spans the member combinations occurring in it (e.g. the cities, states,
+        sexes and ages of the persons). These combinations are then combined across dimensions into a
+        code per fact; when its range is small, the codes are used directly as groups, otherwise they
+        are compacted by sorting.
+
+        Args:
+            `rows (List[str])`: The row levels.
+            `mask (Optional[np.ndarray])`: The selected facts. Defaults to None (all facts).
+
+        Returns:
+            `Tuple[np.ndarray, np.ndarray, int]`: The group of every selected fact, the mixed-radix
+                code of every group, and the number of groups.
+        """
+        size = int(mask.sum()) if mask is not None else len(self)
+        cardinalities = {level: max(1, len(self.members(level))) for level in rows}
+        by_dimension: Dict[str, List[str]] = {}
+        for level in rows:
+            by_dimension.setdefault(self._split(level)[0], []).append(level)
+
+        combined = np.zeros(size, dtype=np.int64)
+        space = 1
+        combinations = []
+        for dimension, levels in by_dimension.items():
+            row_codes = np.zeros(len(self.dimensions[dimension].rows), dtype=np.int64)
+            for level in levels:
+                row_codes = row_codes * cardinalities[level] + self._encode(level)[1]
+            labels, compact = distinct(row_codes, return_inverse=True)
+            keys = self.keys[dimension] if mask is None else self.keys[dimension][mask]
+            combined = combined * max(1, len(labels)) + compact[keys]
+            space *= max(1, len(labels))
+            combinations.append((levels, labels))
+
+        if space <= max(1 << 20, 4 * size):
+            local = np.flatnonzero(np.bincount(combined, minlength=space))
+            remap = np.empty(space, dtype=np.int64)
+            remap[local] = np.arange(len(local))
+            groups = remap[combined]
+        else:
+            local, groups = distinct(combined, return_inverse=True)
+
+        # Back to the mixed-radix code of the members of the row levels, in their order.
+        codes = {}
+        remainder = local
+        for levels, labels in reversed(combinations):
+            row_codes = labels[remainder % max(1, len(labels))]
+            remainder = remainder // max(1, len(labels))
+            for level in reversed(levels):
+                codes[level] = row_codes % cardinalities[level]
+                row_codes = row_codes // cardinalities[level]
+        present = np.zeros(len(local), dtype=np.int64)
+        for level in rows:
+            present = present * cardinalities[level] + codes[level]
+
+        order = np.argsort(present, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        return rank[groups], present[order], len(present)
+
+    def aggregate(self, measure: str, groups: np.ndarray, count: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Aggregates a measure over groups of facts.
+
+        Args:
+            `measure (str)`: The measure, among `MEASURES`.
+            `groups (np.ndarray)`: The group of every selected fact.
+            `count (int)`: The number of groups.
+            `mask (Optional[np.ndarray])`: The selected facts. Defaults to None (all facts).
+
+        Returns:
+            `np.ndarray`: The value of the measure for every group.
+
+        Raises:
+            `KeyError`: If the measure does not exist.
+        """
+        if measure not in self.MEASURES:
+            raise KeyError(f"Measure '{measure}' does not exist.")
+        aggregation, source = self.MEASURES[measure]
+
+        if aggregation == "sum":
+            values = self.values[source] if mask is None else self.values[source][mask]
+            return np.bincount(groups, weights=values, minlength=count)
+        if aggregation == "count":
+            return np.bincount(groups, minlength=count).astype(np.int64)
+
+        members = self.keys[source] if mask is None else self.keys[source][mask]
+        pairs = distinct(groups.astype(np.int64) * len(self.dimensions[source].rows) + members)
+        return np.bincount(pairs // len(self.dimensions[source].rows), minlength=count).astype(np.int64)
+
+    def query(self, rows: List[str], measures: List[str] = None, where: Optional[Dict[str, Any]] = None) -> Data:
+        """
+        Aggregates measures by the members of the row levels, over the facts of a slice.
+
+        Args:
+            `rows (List[str])`: The row levels, e.g. `cube.levels("Date", 2)` to roll up to months.
+            `measures (List[str], optional)`: The measures. Defaults to None (all of them).
+            `where (Optional[Dict[str, Any]])`: Mapping of levels to the member, or list of members, to keep. Defaults to None.
+
+        Returns:
+            `Data`: One row per non-empty group, sorted by members, with a column per level attribute and per measure.
+        """
+        measures = measures or list(self.MEASURES)
+
+        def compute() -> Data:
+            mask = self.mask(where)
+            groups, present, count = self.group(rows, mask)
+
+            fieldnames = [self._split(level)[1] for level in rows]
+            columns = self._decode(rows, present)
+            columns += [self.aggregate(measure, groups, count, mask) for measure in measures]
+
+            result = Data()
+            result.fieldnames = fieldnames + measures
+            result.rows = [dict(zip(result.fieldnames, values)) for values in zip(*(column.tolist() for column in columns))]
+            return result
+
+        return self._cached({"operation": "query", "rows": rows, "measures": measures, "where": self._slice_spec(where)}, compute)
+
+    def _slice_spec(self, where: Optional[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Normalizes a slice for the cache keys, the order of the members of a level being irrelevant.
+        """
+        return {
+            level: sorted(str(member) for member in (members if isinstance(members, (list, tuple, set)) else [members]))
+            for level, members in (where or {}).items()
+        }
+
+    def _cached(self, spec: Dict[str, Any], compute: Callable[[], Data]) -> Data:
+        """
+        Returns the cached result of a query, if the cube has a cache and a version, computing it on a miss.
+        """
+        if self.cache is None or self.version is None:
+            return compute()
+        return self.cache.fetch(spec, self.version, compute)
+
+    def _decode(self, rows: List[str], present: np.ndarray) -> List[np.ndarray]:
+        """
+        Decodes mixed-radix group codes, as returned by `group`, into the members of each row level.
+        """
+        columns = []
+        remainder = present
+        for level in reversed(rows):
+            cardinality = max(1, len(self.members(level)))
+            columns.append(self.members(level)[remainder % cardinality])
+            remainder = remainder // cardinality
+        columns.reverse()
+        return columns
+
+    def top(self, rows: List[str], items: List[str], measure: str = "DAMAGE_COST", k: int = 1, where: Optional[Dict[str, Any]] = None) -> Data:
+        """
+        Finds, for every group of the row levels, the `k` combinations of members of the item levels with the highest measure,
+        as `GENERATE(rows, TOPCOUNT(items, k, measure))` does.
+
+        The combinations are ranked by their aggregated measure, which is only known once every fact has been
+        seen, so the facts cannot be offered one by one to the heaps. The measure is instead aggregated once by
+        rows and items together, with `numpy.bincount`, and only the non-empty combinations are then offered in a
+        single pass to a bounded heap per group (`TopK`), so that no group is ever sorted in full. Among
+        combinations with the same measure, the first one in member order wins.
+
+        Args:
+            `rows (List[str])`: The row levels, e.g. `["Vehicle.VEHICLE_TYPE", "Date.CRASH_YEAR"]`.
+            `items (List[str])`: The item levels, e.g. `["Person.CITY", "Person.STATE", "Person.SEX", "Person.AGE"]`.
+            `measure (str, optional)`: The measure the combinations are ranked by. Defaults to `DAMAGE_COST`.
+            `k (int, optional)`: The number of combinations per group. Defaults to 1.
+            `where (Optional[Dict[str, Any]])`: Mapping of levels to the member, or list of members, to keep. Defaults to None.
+
+        Returns:
+            `Data`: Up to `k` rows per non-empty group, sorted by members then by decreasing measure,
+                with a column per level attribute and the measure.
+        """
+        def compute() -> Data:
+            mask = self.mask(where)
+            groups, present, count = self.group(rows + items, mask)
+            values = self.aggregate(measure, groups, count, mask)
+
+            combinations = 1
+            for level in items:
+                combinations *= max(1, len(self.members(level)))
+            heaps = TopK(k)
+            heaps.extend(zip((present // combinations).tolist(), values.tolist(), present.tolist()))
+
+            selected, scores = [], []
+            for group in sorted(heaps.heaps):
+                for score, code in heaps.result(group):
+                    selected.append(code)
+                    scores.append(score)
+
+            columns = self._decode(rows + items, np.array(selected, dtype=np.int64)) + [np.array(scores)]
+            result = Data()
+            result.fieldnames = [self._split(level)[1] for level in rows + items] + [measure]
+            result.rows = [dict(zip(result.fieldnames, values)) for values in zip(*(column.tolist() for column in columns))]
+            return result
+
+        spec = {"operation": "top", "rows": rows, "items": items, "measure": measure, "k": k, "where": self._slice_spec(where)}
+        return self._cached(spec, compute)
+
+    def rollup(self, hierarchy: str, depth: int, measures: List[str] = None, where: Optional[Dict[str, Any]] = None) -> Data:
+        """
+        Aggregates measures at a level of a hierarchy.
+
+        Args:
+            `hierarchy (str)`: The name of the hierarchy.
+            `depth (int)`: The number of levels from the top (1 for years in the `Date` hierarchy).
+            `measures (List[str], optional)`: The measures. Defaults to None (all of them).
+            `where (Optional[Dict[str, Any]])`: Mapping of levels to the member, or list of members, to keep. Defaults to None.
+
+        Returns:
+            `Data`: One row per non-empty member of the level.
+        """
+        return self.query(self.levels(hierarchy, depth), measures, where)
@@ -8,7 +8,113 @@ from typing import Any, List, Dict, Callable, Tuple
 
 from modules.reader import Reader
 
-class Column:
+class Index:
+    """Multi-value hash index mapping the values of a column to the rows holding them."""
+    def __init__(self, rows: List[Dict[str, Any]], column: str, unique: bool = False) -> None:
+        """Initializes an Index instance.
+
+        Args:
+            `rows (List[Dict[str, Any]])`: The data rows.
+            `column (str)`: The indexed column.
+            `unique (bool)`: Whether every value must identify a single row. Defaults to False.
+
+        Raises:
+            `ValueError`: If the index is unique and a value is held by more than one row.
+        """
+        self.column = column
+        self.unique = unique
+        self.buckets: Dict[Any, List[Dict[str, Any]]] = {}
+
+        for row in rows:
+            self.buckets.setdefault(row.get(column), []).append(row)
+
+        if unique:
+            self.check_unique()
+
+    def check_unique(self) -> None:
+        """Marks the index as unique, checking that every value is held by a single row.
+
+        Raises:
+            `ValueError`: If a value is held by more than one row.
+        """
+        for value, bucket in self.buckets.items():
+            if len(bucket) > 1:
+                raise ValueError(f"Value '{value}' is not unique in column '{self.column}'.")
+        self.unique = True
+
+    def get(self, value: Any) -> List[Dict[str, Any]]:
+        """Returns the rows holding a value.
+
+        Args:
+            `value (Any)`: The value to look up.
+
+        Returns:
+            `List[Dict[str, Any]]`: The matching rows in dataset order, or an empty list.
+        """
+        return self.buckets.get(value, [])
+
+    def __contains__(self, value: Any) -> bool:
+        return value in self.buckets
+
+    def __len__(self) -> int:
+        return len(self.buckets)
+
+class Indexing:
+    """Handles the hash indexes of a dataset, invalidating them when rows change."""
+    @property
+    def rows(self) -> List[Dict[str, Any]]:
+        """The data rows. Replacing them invalidates every index."""
+        return self._rows
+
+    @rows.setter
+    def rows(self, rows: List[Dict[str, Any]]) -> None:
+        self._rows = rows
+        self.invalidate_indexes()
+
+    def create_index(self, column: str, unique: bool = False) -> Index:
+        """Returns the hash index of a column, building it on first use.
+
+        Indexes are kept until the rows or the indexed column change through the dataset
+        methods. Rows modified in place by the caller require `invalidate_indexes`.
+
+        Args:
+            `column (str)`: The column to index.
+            `unique (bool)`: Whether every value must identify a single row. Defaults to False.
+
+        Returns:
+            `Index`: The index of the column.
+
+        Raises:
+            `KeyError`: If the column does not exist.
+            `ValueError`: If the index is unique and a value is held by more than one row.
+        """
+        if column not in self.fieldnames:
+            raise KeyError(f"The column '{column}' is not present.")
+
+        indexes = self.__dict__.setdefault("_indexes", {})
+        index = indexes.get(column)
+        if index is None:
+            index = indexes[column] = Index(self.rows, column, unique)
+        elif unique and not index.unique:
+            index.check_unique()
+        return index
+
+    def invalidate_indexes(self, columns: List[str] = None) -> None:
+        """Drops the indexes of the given columns, or every index.
+
+        Args:
+            `columns (List[str], optional)`: The columns whose index must be dropped. Defaults to None (all columns).
+        """
+        indexes = self.__dict__.get("_indexes")
+        if not indexes:
+            return
+        if columns is None:
+            indexes.clear()
+        else:
+            for column in columns:
+                indexes.pop(column, None)
+
+class Column(Indexing):
     """Handles column-level operations on a dataset."""
     def __init__(self, rows: List[Dict[str, Any]], fieldnames: List[str]) -> None:
         """Initializes a Column instance.
@@ -33,6 +139,7 @@ class Column:
         """
         if column not in self.fieldnames:
             raise KeyError(f"The column `{column}` is not present.")
+        self.invalidate_indexes([column])
         for row in self.rows:
             if condition(row.get(column)):
                 row[column] = new_value(row[column]) if callable(new_value) else new_value
@@ -53,6 +160,7 @@ class Column:
             raise KeyError(f"The column '{column}' is already present.")
         
         self.fieldnames.append(column)
+        self.invalidate_indexes([column])
         
         if enum:
             for idx, row in enumerate(self.rows):
@@ -75,6 +183,7 @@ class Column:
         if missing_columns:
             raise KeyError(f"The following columns are not present: {', '.join(missing_columns)}")
 
+        self.invalidate_indexes(columns)
         for column in columns:
             if column in self.fieldnames:
                 self.fieldnames.remove(column)
@@ -96,6 +205,7 @@ class Column:
         if new in self.fieldnames:
             raise KeyError(f"The column '{new}' is already present.")
 
+        self.invalidate_indexes([old])
         self.fieldnames = [new if col == old else col for col in self.fieldnames]
         for row in self.rows:
             row[new] = row.pop(old)
@@ -110,6 +220,7 @@ class Column:
         Raises:
            `ValueError`: If any value in the column cannot be casted to the specified type.
         """
+        self.invalidate_indexes([column])
         for row in self.rows:
             try:
                 value = row[column]
@@ -136,6 +247,7 @@ class Column:
         if missing_columns:
             raise KeyError(f"The following columns are not present: {', '.join(missing_columns)}")
 
+        self.invalidate_indexes([col for col in self.fieldnames if col not in columns])
         self.fieldnames = columns
         for row in self.rows:
             removed = [key for key in row.keys() if key not in self.fieldnames]
@@ -146,7 +258,7 @@ class Column:
             row.clear()
             row.update(ordered)
 
-class Row:
+class Row(Indexing):
     """Handles row-level operations on a dataset."""
     def __init__(self, rows: List[Dict[str, Any]], fieldnames: List[str]):
         """Initializes a Row instance.
@@ -158,12 +270,17 @@ class Row:
         self.rows = rows
         self.fieldnames = fieldnames
 
-    def filter_rows(self, column: str, condition: Callable[[Dict[str, str]], bool] = None) -> None:
-        """Filters rows based on a condition applied to a column.
+    def filter_rows(self, column: str, condition: Callable[[Dict[str, str]], bool] = None, values: List[Any] = None) -> None:
+        """Removes the rows whose value in a column matches a condition, or equals one of the given values.
+
+        The rows are found through the column index: the condition is evaluated once per distinct
+        value, and the values are looked up directly. The rows and indexes are left untouched when
+        no row matches.
 
         Args:
             `column (str)`: The column to evaluate.
-            `condition (Callable[[Dict[str, str]], bool], optional)`: The condition function. Defaults to None.
+            `condition (Callable[[Dict[str, str]], bool], optional)`: The condition function. Defaults to None (empty values).
+            `values (List[Any], optional)`: The values to remove, instead of a condition. Defaults to None.
 
         Raises:
             `KeyError`: If the column does not exist.
@@ -174,7 +291,52 @@ class Row:
         if condition is None:
             condition = lambda x: not x
 
-        self.rows = [row for row in self.rows if not condition(row.get(column))]
+        index = self.create_index(column)
+        if values is not None:
+            removed = [row for value in set(values) for row in index.get(value)]
+        else:
+            removed = [row for value, bucket in index.buckets.items() if condition(value) for row in bucket]
+        if not removed:
+            return
+
+        removed_ids = {id(row) for row in removed}
+        self.rows = [row for row in self.rows if id(row) not in removed_ids]
+
+    def select_rows(self, column: str, value: Any) -> List[Dict[str, Any]]:
+        """Returns the rows whose value in a column equals the given value, through the column index.
+
+        Args:
+            `column (str)`: The column to evaluate.
+            `value (Any)`: The value to match.
+
+        Returns:
+            `List[Dict[str, Any]]`: The matching rows.
+
+        Raises:
+            `KeyError`: If the column does not exist.
+        """
+        return self.create_index(column).get(value)
+
+    def drop_duplicates(self, column: str) -> None:
+        """Removes rows whose value in a column has already been seen, keeping the first occurrence.
+
+        Args:
+            `column (str)`: The column to evaluate.
+
+        Raises:
+            `KeyError`: If the column does not exist.
+        """
+        if column not in self.fieldnames:
+            raise KeyError(f"The column '{column}' is not present.")
+
+        seen = set()
+        unique_rows = []
+        for row in self.rows:
+            value = row.get(column)
+            if value not in seen:
+                seen.add(value)
+                unique_rows.append(row)
+        self.rows = unique_rows
 
 
 class Data(Reader, Column, Row):
@@ -268,6 +430,7 @@ class Data(Reader, Column, Row):
         else:
             raise KeyError(f"Method {method} not supported. Use 'mean' or 'median'.")
 
+        self.invalidate_indexes([column])
         for row in self.rows:
             if row[column] is not row[column] or not self._is_valid_number(row[column]):
                 row[column] = replacement
@@ -384,6 +547,8 @@ class Data(Reader, Column, Row):
             except Exception as e:
                 raise Exception(f"Something went wrong: {e}")
 
+        self.invalidate_indexes(new_columns)
+
     def get_geohash(self, latitude: float, longitude: float, precision: int = 12) -> str:
         """
         Generate a geohash string for the specified latitude and longitude.
@@ -1,8 +1,38 @@
 import os
-import aioodbc
+import csv
+import time
+import asyncio
 import aiofiles
-from typing import Any
+import logging as log
+from itertools import chain
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple, AsyncIterator
 from modules.data import Data
+from modules.batching import BatchTuner, Checkpoints
+from modules.cache import DataVersion, ResultCache
+from modules.utils import gather_limited
+
+TRANSIENT_SQLSTATES = {
+    "08S01",  # Communication link failure
+    "08001",  # Unable to establish connection
+    "08004",  # Server rejected the connection
+    "40001",  # Serialization failure (deadlock victim)
+    "HYT00",  # Timeout expired
+    "HYT01",  # Connection timeout expired
+}
+
+def is_transient(error: Exception) -> bool:
+    """
+    Checks whether a database error is transient, i.e. whether retrying the operation may succeed.
+
+    Args:
+        `error (Exception)`: The error raised by the driver.
+
+    Returns:
+        `bool`: True if the `SQLSTATE` of the error denotes a lost connection, a deadlock or a timeout.
+    """
+    args = getattr(error, "args", ())
+    return bool(args) and str(args[0]) in TRANSIENT_SQLSTATES
 
 class Database:
     """
@@ -13,10 +43,21 @@ class Database:
         `db (str)`: The database name.
         `user (str)`: The username for database authentication.
         `pwd (str)`: The password for database authentication.
-        `connection`: The active database connection, or None if not connected.
+        `pool_size (int)`: The maximum number of pooled connections.
+        `connection`: The active database connection, or None if not connected or pooled.
+        `pool`: The active connection pool, or None if not connected or not pooled.
+        `dialect (str)`: The `SQL` dialect of the backend.
+        `max_parameters (int)`: The maximum number of parameters of a statement.
+        `max_values_rows (int)`: The maximum number of rows of a `VALUES` clause.
+        `cache (Optional[ResultCache])`: The cache of the fetched results, enabled with `enable_cache`.
+        `data_version (Optional[DataVersion])`: The version of the loaded data the cached results are keyed on.
     """
 
-    def __init__(self, server: str, db: str, user: str, pwd: str) -> None:
+    dialect = "mssql"
+    max_parameters = 2099
+    max_values_rows = 1000
+
+    def __init__(self, server: str, db: str, user: str, pwd: str, pool_size: int = 1) -> None:
         """
         Initializes the Database object with connection parameters.
 
@@ -25,38 +66,146 @@ class Database:
             `db (str)`: The database name.
             `user (str)`: The username for authentication.
             `pwd (str)`: The password for authentication.
+            `pool_size (int, optional)`: The maximum number of connections. With more than one,
+                a pool is created and operations can run concurrently. Defaults to 1.
         """
         self.server = server
         self.db = db 
         self.user = user 
         self.pwd = pwd
+        self.pool_size = pool_size
         self.connection = None
+        self.pool = None
+        self._lock = None
+        self._statements: Dict[Tuple[str, Tuple[str, ...], int], str] = {}
+        self.cache: Optional[ResultCache] = None
+        self.data_version: Optional[DataVersion] = None
+
+    def enable_cache(self, cache: ResultCache, version: DataVersion) -> None:
+        """
+        Caches the results of `fetch_query`, until `populate_database` publishes a new version of the data.
+        No result is cached or reused while no version is published, e.g. during a load.
+
+        Args:
+            `cache (ResultCache)`: The cache.
+            `version (DataVersion)`: The version of the loaded data.
+        """
+        self.cache = cache
+        self.data_version = version
+
+    @classmethod
+    def from_credentials(cls, credentials: Dict[str, str], pool_size: int = 1) -> "Database":
+        """
+        Creates a Database object for the backend named in a credentials mapping.
+
+        Args:
+            `credentials (Dict[str, str])`: The credentials read from `group_id_20_db.json`. With
+                `"backend": "sqlite"`, `db` is the path to a local `SQLite` database file.
+            `pool_size (int, optional)`: The maximum number of connections. Defaults to 1.
+
+        Returns:
+            `Database`: The database of the requested backend.
+
+        Raises:
+            `ValueError`: If the backend is unknown.
+        """
+        backend = credentials.get("backend", "mssql")
+        if backend == "sqlite":
+            from modules.sqlite import SQLiteDatabase
+            return SQLiteDatabase(credentials["db"], pool_size=pool_size)
+        if backend != "mssql":
+            raise ValueError(f"Unknown database backend: {backend}")
+        return cls(
+            server=credentials["server"],
+            db=credentials["db"],
+            user=credentials["user"],
+            pwd=credentials["pwd"],
+            pool_size=pool_size
+        )
+
+    def translate(self, sql: str) -> str:
+        """
+        Translates `SQL Server` statements (e.g. the schema file) to the dialect of the backend.
+
+        Args:
+            `sql (str)`: The `SQL Server` statements.
+
+        Returns:
+            `str`: The statements in the dialect of the backend.
+        """
+        return sql
+
+    @property
+    def dsn(self) -> str:
+        """
+        The `ODBC` connection string of the database.
+        """
+        return (
+            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+            f"SERVER={self.server};"
+            f"DATABASE={self.db};"
+            f"UID={self.user};"
+            f"PWD={self.pwd}"
+        )
 
     async def connect(self):
         """
-        Establishes a connection to the database.
+        Establishes a connection, or a pool of connections, to the database.
 
         Raises:
             `ConnectionError`: If the connection fails.
         """
         try:
-            self.connection = await aioodbc.connect(
-                dsn=f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-                    f"SERVER={self.server};"
-                    f"DATABASE={self.db};"
-                    f"UID={self.user};"
-                    f"PWD={self.pwd}"
-            )
+            import aioodbc
+            if self.pool_size > 1:
+                self.pool = await aioodbc.create_pool(dsn=self.dsn, minsize=1, maxsize=self.pool_size)
+            else:
+                self.connection = await aioodbc.connect(dsn=self.dsn)
+                self._lock = asyncio.Lock()
         except Exception as e:
             raise ConnectionError(f"Connection Error: {e}")
         
     async def disconnect(self):
         """
-        Closes the database connection if it is open.
+        Closes the database connection, or the connection pool, if it is open.
         """
         if self.connection:
             await self.connection.close()
             self.connection = None
+        if self.pool:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    @property
+    def is_connected(self) -> bool:
+        """
+        Whether a connection or a connection pool is open.
+        """
+        return self.connection is not None or self.pool is not None
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Any]:
+        """
+        Acquires a connection for the duration of the context.
+
+        A pooled connection is taken from the pool, waiting for one to be released if all
+        are in use. The single connection is handed out to one operation at a time.
+
+        Yields:
+            `Any`: The connection.
+
+        Raises:
+            `ConnectionError`: If the database is not connected.
+        """
+        if self.pool:
+            async with self.pool.acquire() as connection:
+                yield connection
+        elif self.connection:
+            async with self._lock:
+                yield self.connection
+        else:
+            raise ConnectionError("Database is not connected.")
 
     async def execute_query(self, query: str, params: str = None):
         """
@@ -70,24 +219,25 @@ class Database:
             `ConnectionError`: If the database is not connected.
             `Exception`: If an error occurs during query execution.
         """
-        if not self.connection:
+        if not self.is_connected:
             raise ConnectionError("Database is not connected.")
         try:
-            async with self.connection.cursor() as cursor:
+            async with self.acquire() as connection, connection.cursor() as cursor:
                 if params:
                     await cursor.execute(query, params)
                 else: 
                     await cursor.execute(query)
-                await self.connection.commit()
+                await connection.commit()
         except Exception as e:
             raise Exception(f"Query execution error: {e}")
         
-    async def fetch_query(self, query: str) -> Any:
+    async def fetch_query(self, query: str, params: Tuple = None) -> Any:
         """
         Executes a `SQL` query and `fetches` the results.
 
         Args:
             `query (str)`: The SQL query to execute.
+            `params (Tuple, optional)`: Parameters for the query.
 
         Returns:
             `Any`: The results of the query.
@@ -96,46 +246,365 @@ class Database:
             `ConnectionError`: If the database is not connected.
             `Exception`: If an error occurs during query execution.
         """
-        if not self.connection:
+        if not self.is_connected:
             raise ConnectionError("Database is not connected.")
+        version = self.data_version.current() if self.cache is not None else None
+        if version is not None:
+            spec = {"database": f"{self.server}/{self.db}", "query": " ".join(query.split()).rstrip(";"), "params": list(params or ())}
+            found, rows = self.cache.get(spec, version)
+            if found:
+                return rows
         try:
-            async with self.connection.cursor() as cursor:
-                await cursor.execute(query)
-                return await cursor.fetchall()
+            async with self.acquire() as connection, connection.cursor() as cursor:
+                if params:
+                    await cursor.execute(query, params)
+                else:
+                    await cursor.execute(query)
+                rows = await cursor.fetchall()
         except Exception as e:
             raise Exception(f"Query execution error: {e}")
+        if version is not None:
+            rows = [tuple(row) for row in rows]
+            self.cache.put(spec, version, rows)
+        return rows
+
+    async def stream_query(self, query: str, params: Tuple = None, arraysize: int = 10000) -> AsyncIterator[Data]:
+        """
+        Executes a `SQL` query and streams the results in batches, fetched with `fetchmany`.
+
+        Only one batch is held in memory at a time. The connection stays acquired until
+        the results are exhausted or the iteration is stopped.
+
+        Args:
+            `query (str)`: The SQL query to execute.
+            `params (Tuple, optional)`: Parameters for the query.
+            `arraysize (int, optional)`: The number of rows fetched per batch. Defaults to 10,000.
+
+        Yields:
+            `Data`: A batch of result rows, keyed by the column names of the result set.
+
+        Raises:
+            `ConnectionError`: If the database is not connected.
+            `Exception`: If an error occurs during query execution.
+        """
+        if not self.is_connected:
+            raise ConnectionError("Database is not connected.")
+        try:
+            async with self.acquire() as connection, connection.cursor() as cursor:
+                if params:
+                    await cursor.execute(query, params)
+                else:
+                    await cursor.execute(query)
+                fieldnames = [column[0] for column in cursor.description]
+                while rows := await cursor.fetchmany(arraysize):
+                    batch = Data()
+                    batch.fieldnames = fieldnames
+                    batch.rows = [dict(zip(fieldnames, row)) for row in rows]
+                    yield batch
+        except Exception as e:
+            raise Exception(f"Query execution error: {e}")
+
+    async def query_to_csv(self, query: str, output_file: str, params: Tuple = None, arraysize: int = 10000) -> int:
+        """
+        Executes a `SQL` query and streams its results straight to a `CSV` file.
+        The header is written from the description of the result set, so that an empty
+        result set still produces a file with its header.
+
+        Args:
+            `query (str)`: The SQL query to execute.
+            `output_file (str)`: The path to the output `CSV` file.
+            `params (Tuple, optional)`: Parameters for the query.
+            `arraysize (int, optional)`: The number of rows fetched per batch. Defaults to 10,000.
+
+        Returns:
+            `int`: The number of rows written.
+
+        Raises:
+            `ConnectionError`: If the database is not connected.
+            `IOError`: If an error occurs while writing to the file.
+            `Exception`: If an error occurs during query execution.
+        """
+        if not self.is_connected:
+            raise ConnectionError("Database is not connected.")
+        written = 0
+        try:
+            with open(output_file, mode="w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                async with self.acquire() as connection, connection.cursor() as cursor:
+                    if params:
+                        await cursor.execute(query, params)
+                    else:
+                        await cursor.execute(query)
+                    writer.writerow([column[0] for column in cursor.description])
+                    while rows := await cursor.fetchmany(arraysize):
+                        writer.writerows(rows)
+                        written += len(rows)
+        except IOError as e:
+            raise IOError(f"Error writing to file {output_file}: {e}") from e
+        except Exception as e:
+            raise Exception(f"Query execution error: {e}")
+        log.info(f"{written} rows written to {output_file}.")
+        return written
         
-    async def data_to_db(self, data: Data, table_name: str, batch_size: int = 10000):
+    async def reconnect(self):
+        """
+        Replaces the single connection with a new one, e.g. after a communication failure.
+        Pooled connections are recycled by the pool itself, a retry acquiring a fresh one.
+
+        The connection is replaced while holding the lock it is handed out under, so that
+        no other operation uses it, or is given the closed one, in the meantime.
+
+        Raises:
+            `ConnectionError`: If the connection fails.
+        """
+        if self.pool:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.connection:
+                try:
+                    await self.connection.close()
+                except Exception:
+                    pass
+            try:
+                import aioodbc
+                self.connection = await aioodbc.connect(dsn=self.dsn)
+            except Exception as e:
+                self.connection = None
+                raise ConnectionError(f"Connection Error: {e}")
+
+    async def data_to_db(self, data: Data, table_name: str, batch_size: int = 10000, cast: Dict[str, type] = None,
+                         adaptive: bool = False, commit_every: int = None, checkpoints: Checkpoints = None,
+                         checkpoint_key: str = None, retries: int = 3, backoff: float = 1.0, start: int = 0, stop: int = None):
         """
-        Inserts data from a `Data` object into a database table in batches.
+        Inserts data from a `Data` object, or a range of its rows, into a database table in batches.
+
+        With `adaptive`, the batch size is tuned online from the latency and throughput of each batch.
+        With `commit_every`, the transaction is committed every time that many rows have been inserted,
+        instead of once at the end, and the committed offset is recorded in `checkpoints` so that a
+        rerun resumes after the last committed row. Transient errors (lost connection, deadlock, timeout)
+        roll back the current transaction and are retried from the last committed offset with exponential backoff.
+        The offsets are positions of rows in `data`, whatever range is inserted.
 
         Args:
             `data (Data)`: The data to insert.
             `table_name (str)`: The name of the target database table.
-            `batch_size (int, optional)`: The size of each batch of rows to insert. Defaults to 10,000.
+            `batch_size (int, optional)`: The size of each batch of rows to insert (the initial one, if adaptive). Defaults to 10,000.
+            `cast (Dict[str, type], optional)`: Mapping of columns to the type their values are converted to before insertion (e.g. integer surrogate keys read from `CSV`). Defaults to None.
+            `adaptive (bool, optional)`: Whether to tune the batch size online. Defaults to False.
+            `commit_every (int, optional)`: The number of rows after which the transaction is committed. Defaults to None (a single commit at the end).
+            `checkpoints (Checkpoints, optional)`: The store of the committed offsets. Defaults to None.
+            `checkpoint_key (str, optional)`: The key of the committed offset in `checkpoints`. Defaults to None (the table name).
+            `retries (int, optional)`: The maximum number of retries after a transient error. Defaults to 3.
+            `backoff (float, optional)`: The delay before the first retry, in seconds, doubled at each retry. Defaults to 1.0.
+            `start (int, optional)`: The offset of the first row to insert. Defaults to 0.
+            `stop (int, optional)`: The offset after the last row to insert. Defaults to None (the last row).
 
         Raises:
             `ConnectionError`: If the database is not connected.
             `ValueError`: If the `Data` object is empty or improperly initialized.
             `Exception`: If an error occurs during data insertion.
         """
-        if not self.connection:
+        if not self.is_connected:
             raise ConnectionError("Database is not connected.")
         if not data.rows or not data.fieldnames:
             raise ValueError("Data object is empty or improperly initialized.")
 
-        try:
-            placeholders = ', '.join(['?'] * len(data.fieldnames))
-            query = f"INSERT INTO {table_name} ({', '.join(data.fieldnames)}) VALUES ({placeholders})"
-
-            async with self.connection.cursor() as cursor:
-                rows = [tuple(row[field] for field in data.fieldnames) for row in data.rows]
-                for i in range(0, len(rows), batch_size):
-                    batch = rows[i:i + batch_size]
-                    await cursor.executemany(query, batch)
-                await self.connection.commit()
-        except Exception as e:
-            raise Exception(f"Error during data insertion: {e}")
+        checkpoint_key = checkpoint_key or table_name
+        stop = len(data.rows) if stop is None else min(stop, len(data.rows))
+        committed = max(start, checkpoints.get(checkpoint_key) if checkpoints else 0)
+        tuner = BatchTuner(batch_size) if adaptive else None
+        if committed > start:
+            log.info(f"`{checkpoint_key}`: resuming after row {committed}.")
+
+        attempt = 0
+        while True:
+            offset = committed
+            try:
+                async with self.acquire() as connection, connection.cursor() as cursor:
+                    try:
+                        while offset < stop:
+                            size = min(tuner.size if tuner else batch_size, stop - offset)
+                            began = time.perf_counter()
+                            batch = self.to_tuples(data.rows[offset:offset + size], data.fieldnames, cast)
+                            await self.insert_rows(cursor, table_name, data.fieldnames, batch)
+                            offset += len(batch)
+                            if tuner:
+                                tuner.update(len(batch), time.perf_counter() - began)
+
+                            if commit_every and offset - committed >= commit_every and offset < stop:
+                                await connection.commit()
+                                committed = offset
+                                attempt = 0
+                                if checkpoints:
+                                    checkpoints.save(checkpoint_key, committed)
+                        await connection.commit()
+                        committed = offset
+                    except BaseException:
+                        try:
+                            await connection.rollback()
+                        except Exception:
+                            pass
+                        raise
+                if checkpoints:
+                    checkpoints.save(checkpoint_key, committed)
+                return
+            except Exception as e:
+                if not is_transient(e) or attempt >= retries:
+                    raise Exception(f"Error during data insertion: {e}")
+                attempt += 1
+                delay = backoff * 2 ** (attempt - 1)
+                log.warning(
+                    f"`{checkpoint_key}`: transient error after row {committed}, "
+                    f"retry {attempt}/{retries} in {delay:.1f}s: {e}"
+                )
+                await asyncio.sleep(delay)
+                try:
+                    await self.reconnect()
+                except ConnectionError as reconnect_error:
+                    log.warning(f"`{checkpoint_key}`: reconnection failed: {reconnect_error}")
+
+    @staticmethod
+    async def _data_batches(data: Data, batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yields the rows of a `Data` object in batches.
+
+        Args:
+            `data (Data)`: The data to split.
+            `batch_size (int)`: The number of rows per batch.
+
+        Yields:
+            `List[Dict[str, Any]]`: A batch of rows.
+        """
+        for i in range(0, len(data.rows), batch_size):
+            yield data.rows[i:i + batch_size]
+
+    @staticmethod
+    def to_tuples(rows: List[Dict[str, Any]], fieldnames: List[str], cast: Dict[str, type] = None) -> List[Tuple]:
+        """
+        Converts rows to parameter tuples, applying the requested type conversions.
+
+        Args:
+            `rows (List[Dict[str, Any]])`: The rows to convert.
+            `fieldnames (List[str])`: The columns, in parameter order.
+            `cast (Dict[str, type], optional)`: Mapping of columns to the type their values are converted to. Empty values are left untouched. Defaults to None.
+
+        Returns:
+            `List[Tuple]`: The parameter tuples.
+        """
+        converters = [(cast or {}).get(field) for field in fieldnames]
+        if not any(converters):
+            return [tuple(row[field] for field in fieldnames) for row in rows]
+        return [
+            tuple(
+                converter(row[field]) if converter and row[field] not in (None, "") else row[field]
+                for field, converter in zip(fieldnames, converters)
+            )
+            for row in rows
+        ]
+
+    def insert_statement(self, table_name: str, fieldnames: List[str], rows: int = 1) -> str:
+        """
+        Returns the `INSERT` statement of a table and column set for a number of rows, building it on first use.
+
+        Reusing the same statement text lets the driver and the server reuse its preparation and plan.
+
+        Args:
+            `table_name (str)`: The name of the target database table.
+            `fieldnames (List[str])`: The columns, in parameter order.
+            `rows (int, optional)`: The number of rows of the `VALUES` clause. Defaults to 1.
+
+        Returns:
+            `str`: The `INSERT` statement.
+        """
+        key = (table_name, tuple(fieldnames), rows)
+        statement = self._statements.get(key)
+        if statement is None:
+            row = f"({', '.join(['?'] * len(fieldnames))})"
+            statement = self._statements[key] = (
+                f"INSERT INTO {table_name} ({', '.join(fieldnames)}) VALUES " + ", ".join([row] * rows)
+            )
+        return statement
+
+    def rows_per_statement(self, columns: int) -> int:
+        """
+        Returns the number of rows of the largest multi-row `INSERT` statement allowed by the driver.
+
+        Args:
+            `columns (int)`: The number of columns of each row.
+
+        Returns:
+            `int`: The number of rows, within both the parameter and the `VALUES` limits.
+        """
+        return max(1, min(self.max_values_rows, self.max_parameters // max(1, columns)))
+
+    async def insert_rows(self, cursor: Any, table_name: str, fieldnames: List[str], rows: List[Tuple]) -> None:
+        """
+        Inserts parameter tuples into a database table with the cached `INSERT` statements.
+
+        The rows are sent with multi-row statements of the largest size allowed, and the remaining
+        tail with smaller statements whose sizes are powers of two, so that only a few variants per
+        table are ever cached.
+
+        Args:
+            `cursor (Any)`: The asynchronous cursor.
+            `table_name (str)`: The name of the target database table.
+            `fieldnames (List[str])`: The columns, in parameter order.
+            `rows (List[Tuple])`: The parameter tuples.
+        """
+        size = self.rows_per_statement(len(fieldnames))
+        offset = len(rows) - len(rows) % size
+        if offset:
+            await cursor.executemany(
+                self.insert_statement(table_name, fieldnames, size),
+                [tuple(chain.from_iterable(rows[i:i + size])) for i in range(0, offset, size)]
+            )
+
+        while offset < len(rows):
+            chunk = 1 << ((len(rows) - offset).bit_length() - 1)
+            await cursor.execute(
+                self.insert_statement(table_name, fieldnames, chunk),
+                tuple(chain.from_iterable(rows[offset:offset + chunk]))
+            )
+            offset += chunk
+
+    async def data_to_db_parallel(self, data: Data, table_name: str, parts: int = None, segment_size: int = None, **kwargs):
+        """
+        Inserts data from a `Data` object into a database table, splitting the rows into segments inserted concurrently.
+
+        The segments are ranges of `segment_size` rows, inserted by at most `parts` concurrent loads, each on
+        its own pooled connection and committed on its own. With checkpoints, the committed offset of each
+        segment is recorded under a key naming its first row (e.g. `damage.200000`): the segments only depend
+        on the segment size, so that a rerun resumes them whatever the number of parts.
+
+        A failed segment does not roll back the others, already committed: the table is left partly loaded,
+        and must be resumed with the same checkpoints (see `populate_database`) or truncated before a new load.
+
+        Args:
+            `data (Data)`: The data to insert.
+            `table_name (str)`: The name of the target database table.
+            `parts (int, optional)`: The maximum number of segments inserted at the same time. Defaults to None (the pool size).
+            `segment_size (int, optional)`: The number of rows of each segment. Defaults to None (`commit_every` if given,
+                otherwise the rows split evenly into `parts`).
+            `**kwargs`: Further arguments of `data_to_db`.
+
+        Raises:
+            `ConnectionError`: If the database is not connected.
+            `ValueError`: If the `Data` object is empty or improperly initialized.
+            `Exception`: If an error occurs during data insertion.
+        """
+        if not data.rows or not data.fieldnames:
+            raise ValueError("Data object is empty or improperly initialized.")
+
+        parts = max(1, min(parts or self.pool_size, len(data.rows)))
+        size = segment_size or kwargs.get("commit_every") or -(-len(data.rows) // parts)
+
+        checkpoint_key = kwargs.pop("checkpoint_key", None) or table_name
+        await gather_limited([
+            self.data_to_db(data, table_name, checkpoint_key=f"{checkpoint_key}.{start}", start=start, stop=start + size, **kwargs)
+            for start in range(0, len(data.rows), size)
+        ], parts)
 
     @staticmethod
     async def read_sql_file(file_path: str) -> str:
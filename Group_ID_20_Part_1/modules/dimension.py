@@ -0,0 +1,70 @@
+from typing import Any, List, Dict, Callable, Tuple
+
+class Dimension:
+    """
+    A class for building deduplicated dimension tables with surrogate keys.
+
+    Members are identified by their natural attributes: rows sharing the same
+    attribute values are mapped onto the same surrogate key through a hash lookup.
+
+    Attributes:
+        `key_column (str)`: The name of the surrogate key column.
+        `attributes (List[str])`: The natural attributes identifying a member.
+        `key_format (Callable[[int], Any])`: A function turning a member position into its surrogate key.
+        `members (Dict[Tuple, Any])`: Mapping of natural attribute values to surrogate keys.
+    """
+
+    def __init__(self, key_column: str, attributes: List[str], key_format: Callable[[int], Any]) -> None:
+        """
+        Initializes a Dimension object.
+
+        Args:
+            `key_column (str)`: The name of the surrogate key column.
+            `attributes (List[str])`: The natural attributes identifying a member.
+            `key_format (Callable[[int], Any])`: A function turning a member position (starting from 0) into its surrogate key.
+        """
+        self.key_column = key_column
+        self.attributes = attributes
+        self.key_format = key_format
+        self.members: Dict[Tuple, Any] = {}
+
+    def __len__(self) -> int:
+        """
+        Returns the number of distinct members in the dimension.
+        """
+        return len(self.members)
+
+    def natural_key(self, row: Dict[str, Any]) -> Tuple:
+        """
+        Computes the natural key of a row.
+
+        Values are compared as strings, so that a value loaded from a `CSV` file
+        and the same value computed in memory identify the same member.
+
+        Args:
+            `row (Dict[str, Any])`: The row to process.
+
+        Returns:
+            `Tuple`: The natural attribute values of the row.
+        """
+        return tuple(
+            None if row.get(attribute) is None else str(row.get(attribute))
+            for attribute in self.attributes
+        )
+
+    def lookup(self, row: Dict[str, Any]) -> Any:
+        """
+        Returns the surrogate key of the member described by a row, registering it if it is new.
+
+        Args:
+            `row (Dict[str, Any])`: The row to process.
+
+        Returns:
+            `Any`: The surrogate key of the member.
+        """
+        natural_key = self.natural_key(row)
+        key = self.members.get(natural_key)
+        if key is None:
+            key = self.key_format(len(self.members))
+            self.members[natural_key] = key
+        return key
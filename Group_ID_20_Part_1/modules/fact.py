@@ -0,0 +1,211 @@
+import os
+import csv
+import json
+from typing import Any, Callable, List, Dict, Iterator, Tuple
+
+from modules.data import Data
+from modules.utils import file_checksum
+
+class FactBuilder:
+    """
+    A class for building fact tables in a single streaming pass.
+
+    The rows of a source dataset are streamed, the related rows of the lookup datasets
+    are resolved through the hash indexes of the join column, and only the fact
+    columns are emitted, so that no joined intermediate dataset is ever materialized.
+
+    Attributes:
+        `source (Data)`: The dataset driving the fact table, one fact per matching row.
+        `lookups (List[Data])`: The datasets joined to the source, in order of decreasing precedence.
+        `column (str)`: The column shared by the source and the lookup datasets.
+        `columns (List[str])`: The columns of the fact table.
+        `observers (List[Tuple[Callable[[Dict[str, Any]], None], List[str]]])`: The callbacks receiving every fact
+            as it is streamed, with the extra columns they asked for (see `observe`).
+    """
+
+    def __init__(self, source: Data, lookups: List[Data], column: str, columns: List[str]) -> None:
+        """
+        Initializes a FactBuilder object.
+
+        Args:
+            `source (Data)`: The dataset driving the fact table.
+            `lookups (List[Data])`: The datasets joined to the source. When a column is present
+                in more than one dataset, the value of the source wins, then the one of the first lookup.
+            `column (str)`: The column shared by the source and the lookup datasets.
+            `columns (List[str])`: The columns of the fact table.
+
+        Raises:
+            `KeyError`: If the join column is missing from a dataset, or a fact column is missing from all of them.
+        """
+        self.source = source
+        self.lookups = lookups
+        self.column = column
+        self.columns = columns
+
+        for data in [source] + lookups:
+            if column not in data.fieldnames:
+                raise KeyError(f"Column '{column}' is not present in dataset {data}")
+
+        self.providers = [self._provider(col) for col in columns]
+        self.observers: List[Tuple[Callable[[Dict[str, Any]], None], List[str]]] = []
+
+    def observe(self, callback: Callable[[Dict[str, Any]], None], columns: List[str] = None) -> None:
+        """
+        Registers a callback receiving every fact streamed, e.g. to build summaries in the same pass as the export.
+
+        Args:
+            `callback (Callable[[Dict[str, Any]], None])`: The callback, given the fact row.
+            `columns (List[str], optional)`: Columns the callback also needs besides the fact columns,
+                resolved like them but not emitted. Defaults to None.
+
+        Raises:
+            `KeyError`: If no dataset provides one of the columns.
+        """
+        for col in columns or []:
+            self._provider(col)
+        self.observers.append((callback, columns or []))
+
+    def _provider(self, column: str) -> int:
+        """
+        Finds the position of the dataset providing a fact column.
+
+        Args:
+            `column (str)`: The fact column.
+
+        Returns:
+            `int`: 0 for the source dataset, or the position of the lookup dataset starting from 1.
+
+        Raises:
+            `KeyError`: If no dataset provides the column.
+        """
+        for position, data in enumerate([self.source] + self.lookups):
+            if column in data.fieldnames:
+                return position
+        raise KeyError(f"The column '{column}' is not present in any dataset.")
+
+    def stream(self, extra_columns: List[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streams the fact rows.
+
+        Source rows without a matching row in every lookup dataset are skipped. When a lookup
+        dataset holds several rows for the same key, the last one is used.
+
+        Args:
+            `extra_columns (List[str], optional)`: Columns to emit after the fact columns (e.g. partitioning attributes). Defaults to None.
+
+        Yields:
+            `Dict[str, Any]`: A fact row restricted to the fact columns and the extra columns.
+        """
+        columns = self.columns + (extra_columns or [])
+        observed = [col for _, cols in self.observers for col in cols if col not in columns]
+        observed = list(dict.fromkeys(observed))
+        providers = self.providers + [self._provider(col) for col in (extra_columns or []) + observed]
+        indexes = [data.create_index(self.column) for data in self.lookups]
+
+        for row in self.source.rows:
+            key = row[self.column]
+            matches = [row]
+            for index in indexes:
+                match = index.get(key)
+                if not match:
+                    break
+                matches.append(match[-1])
+            else:
+                fact = {col: matches[provider].get(col) for col, provider in zip(columns + observed, providers)}
+                for callback, _ in self.observers:
+                    callback(fact)
+                for col in observed:
+                    del fact[col]
+                yield fact
+
+    def export_csv(self, output_file: str) -> int:
+        """
+        Streams the fact rows straight to a `CSV` file.
+
+        Args:
+            `output_file (str)`: The path to the output `CSV` file.
+
+        Returns:
+            `int`: The number of fact rows written.
+
+        Raises:
+            `IOError`: If an error occurs while writing to the file.
+        """
+        written = 0
+        try:
+            with open(output_file, mode="w", newline="", encoding="utf-8") as file:
+                writer = csv.DictWriter(file, fieldnames=self.columns)
+                writer.writeheader()
+                for fact in self.stream():
+                    writer.writerow(fact)
+                    written += 1
+        except IOError as e:
+            raise IOError(f"Error writing to file {output_file}: {e}") from e
+        return written
+
+    def export_partitions(self, directory: str, name: str, partition_by: List[str]) -> Dict[str, Any]:
+        """
+        Streams the fact rows to one `CSV` file per partition and writes a `JSON` manifest.
+
+        Each distinct combination of the partitioning columns (e.g. `CRASH_YEAR` and `CRASH_MONTH`)
+        gets its own file, named after the table and the partition values, so that a partition
+        can be loaded or reprocessed on its own. The partition files of a previous export that
+        are not part of this one are deleted.
+
+        Args:
+            `directory (str)`: The directory of the partition files and of `manifest.json`.
+            `name (str)`: The name of the fact table, used as prefix of the partition files.
+            `partition_by (List[str])`: The partitioning columns.
+
+        Returns:
+            `Dict[str, Any]`: The manifest, listing for each partition its values, file, number of rows and the
+                checksum of its file (so that consumers can tell which partitions changed since a previous export).
+
+        Raises:
+            `IOError`: If an error occurs while writing the files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        files, writers, partitions = {}, {}, {}
+
+        try:
+            for fact in self.stream(partition_by):
+                values = tuple(str(fact.pop(col)) for col in partition_by)
+                writer = writers.get(values)
+                if writer is None:
+                    partition_name = "_".join(values)
+                    file_name = f"{name}_{partition_name}.csv"
+                    files[values] = open(os.path.join(directory, file_name), mode="w", newline="", encoding="utf-8")
+                    writer = writers[values] = csv.DictWriter(files[values], fieldnames=self.columns)
+                    writer.writeheader()
+                    partitions[values] = {
+                        "name": partition_name,
+                        "values": dict(zip(partition_by, values)),
+                        "file": file_name,
+                        "rows": 0,
+                    }
+                writer.writerow(fact)
+                partitions[values]["rows"] += 1
+        except IOError as e:
+            raise IOError(f"Error writing partitions to directory {directory}: {e}") from e
+        finally:
+            for file in files.values():
+                file.close()
+
+        for values, partition in partitions.items():
+            partition["checksum"] = file_checksum(os.path.join(directory, partition["file"]))
+
+        exported = {partition["file"] for partition in partitions.values()}
+        for file_name in os.listdir(directory):
+            if file_name.startswith(f"{name}_") and file_name.endswith(".csv") and file_name not in exported:
+                os.remove(os.path.join(directory, file_name))
+
+        manifest = {
+            "table": name,
+            "columns": self.columns,
+            "partition_by": partition_by,
+            "partitions": [partitions[values] for values in sorted(partitions)],
+        }
+        with open(os.path.join(directory, "manifest.json"), mode="w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=4)
+
+        return manifest
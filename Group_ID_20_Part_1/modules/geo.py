@@ -0,0 +1,322 @@
+import json
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from modules.cube import Cube
+from modules.data import Data
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+DIGITS = np.full(128, -1, dtype=np.int64)
+DIGITS[[ord(character) for character in GEOHASH_ALPHABET]] = np.arange(32)
+
+# Sorts after every character of the alphabet, closing the range of the geohashes starting with a prefix.
+PREFIX_END = "~"
+
+def geohash_bounds(geohashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decodes geohashes of the same length into the bounds of their cells, for all of them at once.
+
+    The characters are read as 5-bit digits whose bits alternately halve the longitude and the latitude
+    intervals, so the longitude (latitude) of a cell is the integer made of its even (odd) bits.
+
+    Args:
+        `geohashes (np.ndarray)`: The geohashes, as a `numpy` unicode array.
+
+    Returns:
+        `Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]`: The south, west, north and east bounds of every cell.
+
+    Raises:
+        `ValueError`: If a geohash holds a character outside the geohash alphabet.
+    """
+    length = geohashes.dtype.itemsize // 4
+    characters = np.ascontiguousarray(geohashes).view(np.uint32).reshape(len(geohashes), length)
+    digits = DIGITS[np.minimum(characters, 127)]
+    if (digits < 0).any():
+        raise ValueError("Invalid geohash character.")
+
+    longitude = np.zeros(len(geohashes), dtype=np.int64)
+    latitude = np.zeros(len(geohashes), dtype=np.int64)
+    for position in range(length * 5):
+        bit = (digits[:, position // 5] >> (4 - position % 5)) & 1
+        if position % 2:
+            latitude = (latitude << 1) | bit
+        else:
+            longitude = (longitude << 1) | bit
+
+    height = 180.0 / 2 ** (length * 5 // 2)
+    width = 360.0 / 2 ** ((length * 5 + 1) // 2)
+    south, west = latitude * height - 90.0, longitude * width - 180.0
+    return south, west, south + height, west + width
+
+def prefix_ranges(sorted_geohashes: np.ndarray, prefixes: np.ndarray) -> np.ndarray:
+    """
+    Returns the positions, in a sorted array of geohashes, of those starting with any of the prefixes.
+
+    Args:
+        `sorted_geohashes (np.ndarray)`: The sorted geohashes.
+        `prefixes (np.ndarray)`: The prefixes, with no prefix starting with another one.
+
+    Returns:
+        `np.ndarray`: The positions, in increasing order of prefix.
+    """
+    starts = np.searchsorted(sorted_geohashes, prefixes, side="left")
+    ends = np.searchsorted(sorted_geohashes, np.char.add(prefixes, PREFIX_END), side="left")
+    counts = ends - starts
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(counts.sum())
+
+class GeoIndex:
+    """
+    A geo-rollup index of the facts of a cube, aggregated by geohash prefix.
+
+    The facts are aggregated once by `LOCATION_POINT`, a 12-character geohash, into points sorted by
+    geohash. Since a geohash prefix is the cell holding every geohash starting with it, sorting the
+    points also sorts, and groups, their prefixes: every precision of `PRECISIONS` is one sorted array
+    of prefixes with the sums of its points, computed with a single `np.add.reduceat`. Together they
+    act as a prefix trie stored level by level, the children of a cell being the range of the next
+    level starting with it, found by binary search.
+
+    A heat map at a zoom level is the level of that precision. A bounding box is answered by
+    descending the levels from the coarsest one: cells inside the box are added whole, cells crossing
+    its border are refined at the next level, and the points of the cells still crossing it at the
+    finest level are tested one by one. No fact is read again.
+
+    The crashes are counted per point: every crash happens at a single location, so they add up
+    across points and prefixes.
+
+    Attributes:
+        `measures (List[str])`: The aggregated measures.
+        `points (np.ndarray)`: The sorted geohashes of the points.
+        `values (np.ndarray)`: The values of the measures at every point, one row per point.
+        `levels (Dict[int, Tuple[np.ndarray, np.ndarray]])`: The sorted prefixes and their values, by precision.
+    """
+
+    PRECISIONS = range(4, 9)
+
+    MEASURES = ["DAMAGE_COST", "NUM_UNITS", "NUM_FACTS", "NUM_CRASHES"]
+
+    def __init__(self, points: np.ndarray, values: np.ndarray, measures: List[str] = None) -> None:
+        """
+        Initializes a GeoIndex object, building its levels.
+
+        Args:
+            `points (np.ndarray)`: The geohashes of the points, in any order.
+            `values (np.ndarray)`: The values of the measures at every point.
+            `measures (List[str], optional)`: The measures. Defaults to None (`MEASURES`).
+        """
+        self.measures = measures or list(self.MEASURES)
+        points = np.asarray(points, dtype="U12")
+        values = np.asarray(values, dtype=float).reshape(len(points), len(self.measures))
+        order = np.argsort(points, kind="stable")
+        self.points, self.values = points[order], values[order]
+        self.levels: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._bounds: Dict[int, Tuple[np.ndarray, ...]] = {}
+        self._build()
+
+    def __len__(self) -> int:
+        """
+        Returns the number of points of the index.
+        """
+        return len(self.points)
+
+    def _build(self) -> None:
+        """
+        Merges the duplicate points and aggregates them by prefix at every precision.
+        """
+        for precision in [12] + list(self.PRECISIONS):
+            prefixes = self.points.astype(f"U{precision}")
+            starts = np.flatnonzero(np.concatenate(([True], prefixes[1:] != prefixes[:-1]))) if len(prefixes) else np.zeros(0, dtype=np.int64)
+            values = np.add.reduceat(self.values, starts, axis=0) if len(starts) else self.values
+            if precision == 12:
+                self.points, self.values = prefixes[starts], values
+            else:
+                self.levels[precision] = (prefixes[starts], values)
+        self._bounds = {}
+
+    @classmethod
+    def build(cls, cube: Cube, measures: List[str] = None) -> "GeoIndex":
+        """
+        Builds the index of the facts of a cube.
+
+        Args:
+            `cube (Cube)`: The cube.
+            `measures (List[str], optional)`: The measures, additive across locations. Defaults to None (`MEASURES`).
+
+        Returns:
+            `GeoIndex`: The index.
+        """
+        index = cls(np.zeros(0, dtype="U12"), np.zeros((0, len(measures or cls.MEASURES))), measures)
+        index.add(cube)
+        return index
+
+    def add(self, cube: Cube) -> None:
+        """
+        Adds the facts of a cube to the index, aggregating only them.
+
+        The crashes being counted per point, the new facts must belong to new crashes, e.g. to a new
+        partition of the crash dates.
+
+        Args:
+            `cube (Cube)`: A cube holding only the new facts.
+        """
+        if not len(cube):
+            return
+        result = cube.query(["Location.LOCATION_POINT"], self.measures)
+        rows = [row for row in result.rows if row["LOCATION_POINT"]]
+        points = np.array([row["LOCATION_POINT"] for row in rows], dtype="U12")
+        values = np.array([[row[measure] for measure in self.measures] for row in rows], dtype=float).reshape(len(rows), len(self.measures))
+        order = np.argsort(np.concatenate((self.points, points)), kind="stable")
+        self.points = np.concatenate((self.points, points))[order]
+        self.values = np.concatenate((self.values, values))[order]
+        self._build()
+
+    def _level(self, precision: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the prefixes of a precision and their values.
+
+        Raises:
+            `ValueError`: If the precision is not indexed.
+        """
+        if precision not in self.levels:
+            raise ValueError(f"The precision {precision} is not indexed (available: {self.PRECISIONS.start}-{self.PRECISIONS.stop - 1}).")
+        return self.levels[precision]
+
+    def bounds(self, precision: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the bounds of the cells of a precision, decoded once.
+
+        Args:
+            `precision (int)`: The precision, or 12 for the points.
+
+        Returns:
+            `Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]`: The south, west, north and east bounds of every cell.
+        """
+        if precision not in self._bounds:
+            prefixes = self.points if precision == 12 else self._level(precision)[0]
+            self._bounds[precision] = geohash_bounds(prefixes)
+        return self._bounds[precision]
+
+    def _columns(self, measures: Optional[List[str]]) -> Tuple[List[str], List[int]]:
+        """
+        Returns the measures of a query and their columns.
+
+        Raises:
+            `KeyError`: If a measure is not aggregated by the index.
+        """
+        measures = measures or self.measures
+        missing = [measure for measure in measures if measure not in self.measures]
+        if missing:
+            raise KeyError(f"The following measures are not indexed: {', '.join(missing)}")
+        return measures, [self.measures.index(measure) for measure in measures]
+
+    def heat_map(self, zoom: int, measures: List[str] = None, box: Optional[Tuple[float, float, float, float]] = None) -> Data:
+        """
+        Returns the cells of a zoom level with their values, e.g. to draw a heat map.
+
+        Args:
+            `zoom (int)`: The zoom level, i.e. the geohash precision of the cells.
+            `measures (List[str], optional)`: The measures. Defaults to None (all of them).
+            `box (Optional[Tuple[float, float, float, float]])`: The `(south, west, north, east)` bounds the cells must intersect. Defaults to None.
+
+        Returns:
+            `Data`: One row per non-empty cell, with its `GEOHASH`, the `LATITUDE` and `LONGITUDE` of its center, and its values.
+        """
+        measures, columns = self._columns(measures)
+        prefixes, values = self._level(zoom)
+        south, west, north, east = self.bounds(zoom)
+        selected = np.arange(len(prefixes))
+        if box is not None:
+            selected = selected[(south < box[2]) & (north > box[0]) & (west < box[3]) & (east > box[1])]
+
+        result = Data()
+        result.fieldnames = ["GEOHASH", "LATITUDE", "LONGITUDE"] + measures
+        columns = [
+            prefixes[selected], ((south + north) / 2)[selected], ((west + east) / 2)[selected]
+        ] + [values[selected, column] for column in columns]
+        result.rows = [dict(zip(result.fieldnames, row)) for row in zip(*(column.tolist() for column in columns))]
+        return result
+
+    def prefix(self, geohash: str, measures: List[str] = None) -> Dict[str, float]:
+        """
+        Returns the totals of the cell of a geohash prefix of any length.
+
+        Args:
+            `geohash (str)`: The prefix.
+            `measures (List[str], optional)`: The measures. Defaults to None (all of them).
+
+        Returns:
+            `Dict[str, float]`: The totals of the measures.
+        """
+        measures, columns = self._columns(measures)
+        precision = next((precision for precision in self.PRECISIONS if precision >= len(geohash)), 12)
+        prefixes, values = self.levels[precision] if precision != 12 else (self.points, self.values)
+        positions = prefix_ranges(prefixes, np.array([geohash]))
+        totals = values[positions].sum(axis=0)
+        return {measure: float(totals[column]) for measure, column in zip(measures, columns)}
+
+    def bbox(self, south: float, west: float, north: float, east: float, measures: List[str] = None) -> Dict[str, float]:
+        """
+        Returns the totals of the facts located inside a bounding box.
+
+        Args:
+            `south (float)`: The minimum latitude.
+            `west (float)`: The minimum longitude.
+            `north (float)`: The maximum latitude.
+            `east (float)`: The maximum longitude.
+            `measures (List[str], optional)`: The measures. Defaults to None (all of them).
+
+        Returns:
+            `Dict[str, float]`: The totals of the measures.
+        """
+        measures, columns = self._columns(measures)
+        totals = np.zeros(len(self.measures))
+        crossing = None
+        for precision in self.PRECISIONS:
+            prefixes, values = self.levels[precision]
+            candidates = np.arange(len(prefixes)) if crossing is None else prefix_ranges(prefixes, crossing)
+            bottom, left, top, right = (bound[candidates] for bound in self.bounds(precision))
+            inside = (bottom >= south) & (top <= north) & (left >= west) & (right <= east)
+            overlap = (bottom < north) & (top > south) & (left < east) & (right > west)
+            totals += values[candidates[inside]].sum(axis=0)
+            crossing = prefixes[candidates[overlap & ~inside]]
+            if not len(crossing):
+                break
+        else:
+            candidates = prefix_ranges(self.points, crossing)
+            bottom, left, top, right = (bound[candidates] for bound in self.bounds(12))
+            latitude, longitude = (bottom + top) / 2, (left + right) / 2
+            inside = (latitude >= south) & (latitude <= north) & (longitude >= west) & (longitude <= east)
+            totals += self.values[candidates[inside]].sum(axis=0)
+        return {measure: float(totals[column]) for measure, column in zip(measures, columns)}
+
+    def save(self, file_path: str) -> None:
+        """
+        Writes the points of the index to a `JSON` file, the levels being rebuilt when it is read.
+
+        Args:
+            `file_path (str)`: The path to the `JSON` file.
+        """
+        content = {
+            "measures": self.measures,
+            "points": [[point] + values for point, values in zip(self.points.tolist(), self.values.tolist())],
+        }
+        with open(file_path, mode="w", encoding="utf-8") as file:
+            json.dump(content, file)
+
+    @classmethod
+    def from_file(cls, file_path: str) -> "GeoIndex":
+        """
+        Reads an index written by `save`.
+
+        Args:
+            `file_path (str)`: The path to the `JSON` file.
+
+        Returns:
+            `GeoIndex`: The index.
+        """
+        with open(file_path, mode="r", encoding="utf-8") as file:
+            content = json.load(file)
+        points = [entry[0] for entry in content["points"]]
+        values = [entry[1:] for entry in content["points"]]
+        return cls(np.array(points, dtype="U12"), np.array(values, dtype=float), content["measures"])
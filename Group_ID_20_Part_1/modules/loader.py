@@ -0,0 +1,219 @@
+import time
+import asyncio
+import logging as log
+from typing import Any, Dict, Optional
+
+from modules.reader import Reader
+from modules.batching import Checkpoints
+from modules.columnar import ColumnarTable
+from modules.database import Database, is_transient
+
+class QueueMetrics:
+    """
+    Collects depth statistics of a pipeline queue.
+
+    Attributes:
+        `name (str)`: The name of the queue.
+        `samples (int)`: The number of depth samples, one per item put in the queue.
+        `total_depth (int)`: The sum of the sampled depths.
+        `max_depth (int)`: The maximum sampled depth.
+        `full_waits (int)`: The number of times a producer had to wait for the queue to have room.
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        Initializes a QueueMetrics object.
+
+        Args:
+            `name (str)`: The name of the queue.
+        """
+        self.name = name
+        self.samples = 0
+        self.total_depth = 0
+        self.max_depth = 0
+        self.full_waits = 0
+
+    async def put(self, queue: asyncio.Queue, item: Any) -> None:
+        """
+        Puts an item in a queue, sampling its depth and recording backpressure.
+
+        Args:
+            `queue (asyncio.Queue)`: The queue.
+            `item (Any)`: The item to put.
+        """
+        if queue.full():
+            self.full_waits += 1
+        await queue.put(item)
+        depth = queue.qsize()
+        self.samples += 1
+        self.total_depth += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def report(self) -> Dict[str, float]:
+        """
+        Returns the collected statistics.
+
+        Returns:
+            `Dict[str, float]`: The mean and maximum depth, and the number of backpressure waits.
+        """
+        return {
+            "mean_depth": self.total_depth / self.samples if self.samples else 0.0,
+            "max_depth": self.max_depth,
+            "full_waits": self.full_waits,
+        }
+
+class PipelinedLoader:
+    """
+    A class for loading `CSV` files into database tables through a read-transform-insert pipeline.
+
+    Parsing of `CSV` chunks, conversion of rows into parameter tuples and `executemany` batches run
+    as concurrent stages connected by bounded queues, so that the database works on one batch while
+    the next ones are parsed. A full queue blocks the upstream stage (backpressure), bounding memory
+    to `queue_size` batches per queue.
+
+    Like `Database.data_to_db`, a load can commit every `commit_every` rows and record the committed
+    offset in checkpoints, so that a rerun skips the committed rows, and retries transient errors
+    from the last committed offset with exponential backoff.
+
+    Attributes:
+        `db (Database)`: The connected database.
+        `batch_size (int)`: The number of rows per batch.
+        `queue_size (int)`: The maximum number of batches waiting in each queue.
+    """
+
+    _DONE = object()
+
+    def __init__(self, db: Database, batch_size: int = 10000, queue_size: int = 4) -> None:
+        """
+        Initializes a PipelinedLoader object.
+
+        Args:
+            `db (Database)`: The connected database.
+            `batch_size (int, optional)`: The number of rows per batch. Defaults to 10,000.
+            `queue_size (int, optional)`: The maximum number of batches waiting in each queue. Defaults to 4.
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+
+    async def load(self, input_file: str, table_name: str, cast: Optional[Dict[str, type]] = None, where: Optional[Dict[str, Any]] = None,
+                   commit_every: Optional[int] = None, checkpoints: Optional[Checkpoints] = None, checkpoint_key: Optional[str] = None,
+                   retries: int = 3, backoff: float = 1.0) -> Dict[str, Any]:
+        """
+        Loads a `CSV` file, or a columnar table (see `ColumnarTable`), into a database table.
+
+        Args:
+            `input_file (str)`: The path to the `CSV` file, or to the directory of the columnar table.
+            `table_name (str)`: The name of the target database table.
+            `cast (Optional[Dict[str, type]])`: Mapping of columns to the type their values are converted to. Defaults to None.
+            `where (Optional[Dict[str, Any]])`: The predicate the rows of a columnar table must match, the other ones
+                not being loaded. Defaults to None.
+            `commit_every (Optional[int])`: The number of rows after which the transaction is committed. Defaults to None
+                (a single commit at the end).
+            `checkpoints (Optional[Checkpoints])`: The store of the committed offsets. Defaults to None.
+            `checkpoint_key (Optional[str])`: The key of the committed offset in `checkpoints`. Defaults to None (the table name).
+            `retries (int, optional)`: The maximum number of retries after a transient error. Defaults to 3.
+            `backoff (float, optional)`: The delay before the first retry, in seconds, doubled at each retry. Defaults to 1.0.
+
+        Returns:
+            `Dict[str, Any]`: The number of rows loaded, the elapsed seconds, the throughput in rows per second
+                and the depth statistics of the `parsed` and `converted` queues.
+
+        Raises:
+            `ConnectionError`: If the database is not connected.
+            `ValueError`: If a predicate is given for a `CSV` file.
+            `Exception`: If an error occurs in any stage of the pipeline.
+        """
+        if not self.db.is_connected:
+            raise ConnectionError("Database is not connected.")
+        columnar = ColumnarTable.exists(input_file)
+        if where and not columnar:
+            raise ValueError("Predicates can only be applied to columnar tables.")
+
+        metrics = {"parsed": QueueMetrics("parsed"), "converted": QueueMetrics("converted")}
+        checkpoint_key = checkpoint_key or table_name
+        committed = checkpoints.get(checkpoint_key) if checkpoints else 0
+        if committed:
+            log.info(f"`{checkpoint_key}`: resuming after {committed} committed rows.")
+        loaded, attempt = 0, 0
+        start = time.perf_counter()
+
+        async def read(skip: int) -> None:
+            batches = ColumnarTable(input_file).read(where=where) if columnar else Reader.stream_csv(input_file, self.batch_size)
+            async for batch in batches:
+                if skip:
+                    batch, skip = batch[skip:], max(0, skip - len(batch))
+                for start in range(0, len(batch), self.batch_size):
+                    await metrics["parsed"].put(parsed, batch[start:start + self.batch_size])
+            await parsed.put(self._DONE)
+
+        async def transform() -> None:
+            fieldnames = None
+            while (batch := await parsed.get()) is not self._DONE:
+                if fieldnames is None:
+                    fieldnames = list(batch[0].keys())
+                rows = await asyncio.to_thread(self.db.to_tuples, batch, fieldnames, cast)
+                await metrics["converted"].put(converted, (fieldnames, rows))
+            await converted.put(self._DONE)
+
+        async def insert() -> None:
+            nonlocal loaded, committed, attempt
+            offset = committed
+            async with self.db.acquire() as connection, connection.cursor() as cursor:
+                try:
+                    while (item := await converted.get()) is not self._DONE:
+                        fieldnames, rows = item
+                        await self.db.insert_rows(cursor, table_name, fieldnames, rows)
+                        offset += len(rows)
+                        if commit_every and offset - committed >= commit_every:
+                            await connection.commit()
+                            loaded, committed, attempt = loaded + offset - committed, offset, 0
+                            if checkpoints:
+                                checkpoints.save(checkpoint_key, committed)
+                    await connection.commit()
+                    loaded, committed = loaded + offset - committed, offset
+                except BaseException:
+                    try:
+                        await connection.rollback()
+                    except Exception:
+                        pass
+                    raise
+            if checkpoints:
+                checkpoints.save(checkpoint_key, committed)
+
+        while True:
+            parsed, converted = asyncio.Queue(self.queue_size), asyncio.Queue(self.queue_size)
+            tasks = [asyncio.create_task(read(committed)), asyncio.create_task(transform()), asyncio.create_task(insert())]
+            try:
+                await asyncio.gather(*tasks)
+                break
+            except Exception as e:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                if not is_transient(e) or attempt >= retries:
+                    raise Exception(f"Error during pipelined load into `{table_name}`: {e}")
+                attempt += 1
+                delay = backoff * 2 ** (attempt - 1)
+                log.warning(
+                    f"`{checkpoint_key}`: transient error after {committed} committed rows, "
+                    f"retry {attempt}/{retries} in {delay:.1f}s: {e}"
+                )
+                await asyncio.sleep(delay)
+                try:
+                    await self.db.reconnect()
+                except ConnectionError as reconnect_error:
+                    log.warning(f"`{checkpoint_key}`: reconnection failed: {reconnect_error}")
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "rows": loaded,
+            "seconds": elapsed,
+            "rows_per_second": loaded / elapsed if elapsed > 0 else 0.0,
+            "queues": {name: metric.report() for name, metric in metrics.items()},
+        }
+        log.info(
+            f"`{table_name}`: {loaded} rows loaded in {elapsed:.2f}s ({stats['rows_per_second']:,.0f} rows/s), "
+            f"queue depths: {stats['queues']}."
+        )
+        return stats
@@ -0,0 +1,219 @@
+import time
+import logging as log
+from typing import Dict, List, Optional, Tuple, Union
+
+from modules.data import Data
+from modules.reader import Reader
+from modules.schema import Schema
+from modules.database import Database
+
+class MergeLoader:
+    """
+    A class for loading rows idempotently into database tables through staging tables.
+
+    The rows are bulk-inserted in batches into a temporary staging table shaped like the target and
+    indexed on its key, then applied to the target with a single set-based `MERGE` on the key of the
+    table: rows whose key is already present are updated and the others inserted. Loading the same rows
+    twice, e.g. when rerunning a failed population or loading daily increments, therefore leaves the
+    table unchanged. A scope restricts the target rows the source replaces as a whole (e.g. the facts
+    of a partition): those of them missing from the source are deleted in the transaction of the `MERGE`.
+
+    The target is expected to be indexed on its key too (see `Schema.grain_index_statements` for the
+    fact tables), so that the `MERGE` joins the two tables once instead of scanning the target.
+
+    On `SQLite`, which has no `MERGE`, the staging table is a temporary table ordered by its `rowid`,
+    and it is applied with an `UPDATE ... FROM` of the rows present followed by an `INSERT` of the others.
+
+    Attributes:
+        `db (Database)`: The connected database.
+        `schema (Schema)`: The schema of the target tables, providing their keys.
+        `batch_size (int)`: The number of rows per batch.
+    """
+
+    def __init__(self, db: Database, schema: Schema, batch_size: int = 10000) -> None:
+        """
+        Initializes a MergeLoader object.
+
+        Args:
+            `db (Database)`: The connected database.
+            `schema (Schema)`: The schema of the target tables.
+            `batch_size (int, optional)`: The number of rows per batch. Defaults to 10,000.
+        """
+        self.db = db
+        self.schema = schema
+        self.batch_size = batch_size
+
+    def key_columns(self, table_name: str) -> List[str]:
+        """
+        Returns the key on which rows of a table are matched: its primary key, or for
+        a fact table without primary key, the combination of its foreign keys (its grain).
+
+        Args:
+            `table_name (str)`: The name of the table.
+
+        Returns:
+            `List[str]`: The key columns.
+
+        Raises:
+            `KeyError`: If the table is not part of the schema, or has no key.
+        """
+        table = self.schema.tables.get(table_name)
+        if table is None:
+            raise KeyError(f"Table `{table_name}` is not part of the schema.")
+        if table.primary_key:
+            return [table.primary_key]
+        if table.foreign_keys:
+            return [column for column, _, _, _ in table.foreign_keys]
+        raise KeyError(f"Table `{table_name}` has no key to merge on.")
+
+    @staticmethod
+    def merge_statement(table_name: str, staging: str, fieldnames: List[str], keys: List[str], dialect: str = "mssql") -> str:
+        """
+        Builds the `MERGE` statement applying a staging table to its target.
+
+        Rows of the staging table sharing the same key are reduced to the last one staged (the highest
+        `_row`, or `rowid` on `SQLite`), which the `MERGE` would otherwise reject.
+
+        Args:
+            `table_name (str)`: The name of the target table.
+            `staging (str)`: The name of the staging table.
+            `fieldnames (List[str])`: The columns of the staging table.
+            `keys (List[str])`: The key columns, among the fieldnames.
+            `dialect (str, optional)`: The `SQL` dialect of the backend. Defaults to `"mssql"`.
+
+        Returns:
+            `str`: The `MERGE` statement, or on `SQLite` the `UPDATE` and `INSERT` statements.
+        """
+        condition = " AND ".join(f"target.{key} = source.{key}" for key in keys)
+        updates = [field for field in fieldnames if field not in keys]
+        source = (
+            f"(SELECT * FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY {', '.join(keys)} "
+            f"ORDER BY {'rowid' if dialect == 'sqlite' else '_row'} DESC) AS _rank"
+            f" FROM {staging}) AS ranked WHERE _rank = 1)"
+        )
+        if dialect == "sqlite":
+            statement = ""
+            if updates:
+                statement += (
+                    f"UPDATE {table_name} AS target SET " + ", ".join(f"{field} = source.{field}" for field in updates) +
+                    f" FROM {source} AS source WHERE {condition}; "
+                )
+            return statement + (
+                f"INSERT INTO {table_name} ({', '.join(fieldnames)}) SELECT {', '.join(f'source.{field}' for field in fieldnames)}"
+                f" FROM {source} AS source WHERE NOT EXISTS (SELECT 1 FROM {table_name} AS target WHERE {condition});"
+            )
+
+        statement = f"MERGE INTO {table_name} WITH (HOLDLOCK) AS target USING {source} AS source ON {condition}"
+        if updates:
+            statement += " WHEN MATCHED THEN UPDATE SET " + ", ".join(f"target.{field} = source.{field}" for field in updates)
+        statement += (
+            f" WHEN NOT MATCHED BY TARGET THEN INSERT ({', '.join(fieldnames)})"
+            f" VALUES ({', '.join(f'source.{field}' for field in fieldnames)});"
+        )
+        return statement
+
+    @staticmethod
+    def delete_statement(table_name: str, staging: str, keys: List[str], scope: str, dialect: str = "mssql") -> str:
+        """
+        Builds the statement deleting the rows of a scope of the target missing from its staging table.
+
+        Args:
+            `table_name (str)`: The name of the target table.
+            `staging (str)`: The name of the staging table.
+            `keys (List[str])`: The key columns.
+            `scope (str)`: The condition on the `target` rows replaced by the staging table.
+            `dialect (str, optional)`: The `SQL` dialect of the backend. Defaults to `"mssql"`.
+
+        Returns:
+            `str`: The `DELETE` statement.
+        """
+        condition = " AND ".join(f"source.{key} = target.{key}" for key in keys)
+        return (
+            f"DELETE {'' if dialect == 'sqlite' else 'target '}FROM {table_name} AS target WHERE {scope}"
+            f" AND NOT EXISTS (SELECT 1 FROM {staging} AS source WHERE {condition});"
+        )
+
+    async def load(self, source: Union[Data, str], table_name: str, cast: Dict[str, type] = None,
+                   scope: Optional[str] = None, params: Tuple = ()) -> Dict[str, float]:
+        """
+        Merges rows into a database table.
+
+        The rows are staged one batch at a time, then merged at once in a single transaction, so that
+        a failed load can simply be rerun. Rows sharing the same key are reduced to the last one.
+
+        Args:
+            `source (Union[Data, str])`: The rows to merge, or the path to a `CSV` file.
+            `table_name (str)`: The name of the target database table.
+            `cast (Dict[str, type], optional)`: Mapping of columns to the type their values are converted to. Defaults to None.
+            `scope (Optional[str], optional)`: The condition on the `target` rows the source replaces as a whole, e.g.
+                `"target.date_id IN (SELECT date_id FROM date WHERE crash_year = ?)"`. Defaults to None.
+            `params (Tuple, optional)`: The parameters of the scope. Defaults to an empty tuple.
+
+        Returns:
+            `Dict[str, float]`: The number of rows merged, the elapsed seconds and the throughput in rows per second.
+
+        Raises:
+            `ConnectionError`: If the database is not connected.
+            `KeyError`: If the key columns are missing from the rows.
+            `Exception`: If an error occurs during the merge.
+        """
+        if not self.db.is_connected:
+            raise ConnectionError("Database is not connected.")
+
+        batches = Database._data_batches(source, self.batch_size) if isinstance(source, Data) else Reader.stream_csv(source, self.batch_size)
+        dialect = self.db.dialect
+        if dialect == "sqlite":
+            staging = f"staging_{table_name}"
+            drop = f"DROP TABLE IF EXISTS temp.{staging};"
+        else:
+            staging = f"#staging_{table_name}"
+            drop = f"IF OBJECT_ID('tempdb..{staging}') IS NOT NULL DROP TABLE {staging};"
+        merged = 0
+        start = time.perf_counter()
+
+        try:
+            async with self.db.acquire() as connection, connection.cursor() as cursor:
+                merge, fieldnames, keys = None, None, None
+                async for batch in batches:
+                    if merge is None:
+                        fieldnames = list(batch[0].keys())
+                        table_keys = {key.lower() for key in self.key_columns(table_name)}
+                        keys = [field for field in fieldnames if field.lower() in table_keys]
+                        if len(keys) != len(table_keys):
+                            raise KeyError(f"The key columns of `{table_name}` are missing from the rows.")
+                        await cursor.execute(drop)
+                        if dialect == "sqlite":
+                            await cursor.execute(f"CREATE TEMP TABLE {staging} AS SELECT {', '.join(fieldnames)} FROM {table_name} WHERE 0;")
+                        else:
+                            await cursor.execute(f"SELECT TOP 0 {', '.join(fieldnames)} INTO {staging} FROM {table_name};")
+                            await cursor.execute(f"ALTER TABLE {staging} ADD _row BIGINT IDENTITY(1, 1);")
+                        merge = self.merge_statement(table_name, staging, fieldnames, keys, dialect)
+
+                    rows = self.db.to_tuples(batch, fieldnames, cast)
+                    await self.db.insert_rows(cursor, staging, fieldnames, rows)
+                    await connection.commit()
+                    merged += len(rows)
+
+                if merge is not None:
+                    if dialect == "sqlite":
+                        await cursor.execute(f"CREATE INDEX temp.ix_{staging} ON {staging} ({', '.join(keys)});")
+                    else:
+                        await cursor.execute(f"CREATE CLUSTERED INDEX cix_staging ON {staging} ({', '.join(keys)}, _row);")
+                    if scope:
+                        await cursor.execute(self.delete_statement(table_name, staging, keys, scope, dialect), params)
+                    await cursor.execute(merge)
+                    await cursor.execute(drop)
+                    await connection.commit()
+        except KeyError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error during merge into `{table_name}`: {e}")
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "rows": merged,
+            "seconds": elapsed,
+            "rows_per_second": merged / elapsed if elapsed > 0 else 0.0,
+        }
+        log.info(f"`{table_name}`: {merged} rows merged in {elapsed:.2f}s ({stats['rows_per_second']:,.0f} rows/s).")
+        return stats
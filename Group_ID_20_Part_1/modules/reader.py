@@ -1,6 +1,6 @@
 import aiofiles
 import csv
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, AsyncIterator
 
 class Reader:
     """
@@ -40,6 +40,57 @@ class Reader:
         except Exception as e:
             raise Exception(f"Error loading data from file {input_file}: {e}")
 
+    @staticmethod
+    async def stream_csv(input_file: str, batch_size: int = 10000, chunk_size: int = 1 << 20) -> AsyncIterator[List[Dict[str, str]]]:
+        """
+        Asynchronously streams the rows of a `CSV` file in batches, without loading the whole file.
+
+        Args:
+            `input_file (str)`: The path to the `CSV` file to stream.
+            `batch_size (int, optional)`: The number of rows per batch. Defaults to 10,000.
+            `chunk_size (int, optional)`: The number of characters read from the file at a time. Defaults to 1,048,576.
+
+        Yields:
+            `List[Dict[str, str]]`: A batch of rows, keyed by the header of the file.
+
+        Raises:
+            `Exception`: If an error occurs while reading the file.
+        """
+        try:
+            async with aiofiles.open(input_file, mode="r", encoding="utf-8", newline="") as file:
+                fieldnames = None
+                batch, record, pending = [], "", ""
+                while True:
+                    chunk = await file.read(chunk_size)
+                    lines = (pending + chunk).split("\n")
+                    pending = lines.pop() if chunk else ""
+
+                    records = []
+                    for line in lines:
+                        record += line + "\n"
+                        # A record with an odd number of quotes continues on the next line.
+                        if record.count('"') % 2 == 0:
+                            records.append(record)
+                            record = ""
+
+                    for values in csv.reader(records):
+                        if not values:
+                            continue
+                        if fieldnames is None:
+                            fieldnames = values
+                            continue
+                        batch.append(dict(zip(fieldnames, values)))
+                        if len(batch) >= batch_size:
+                            yield batch
+                            batch = []
+
+                    if not chunk:
+                        break
+                if batch:
+                    yield batch
+        except Exception as e:
+            raise Exception(f"Error streaming data from file {input_file}: {e}")
+
     def export_csv(self, output_file: str) -> None:
         """
         Exports the loaded data to a `CSV` file.
@@ -0,0 +1,262 @@
+import os
+import csv
+import time
+import logging as log
+import numpy as np
+from typing import Any, Callable, Dict, Iterable, List, Sequence
+
+from modules.cube import Cube
+from modules.data import Data
+
+def format_r8(value: float) -> str:
+    """
+    Formats a double as the `SSIS` flat file destination writes `DT_R8` values.
+
+    Values are written with 17 significant digits without trailing zeros, in scientific
+    notation with an unpadded exponent below 0.1 (e.g. `4.1446786612703984E-2`).
+
+    Args:
+        `value (float)`: The value.
+
+    Returns:
+        `str`: The formatted value.
+    """
+    if value == 0:
+        return "0"
+    if abs(value) >= 0.1:
+        text = "%.17G" % value
+        if "E" not in text:
+            return text
+    mantissa, exponent = ("%.16E" % value).split("E")
+    exponent = int(exponent)
+    return f"{mantissa.rstrip('0').rstrip('.')}E{'+' if exponent > 0 else ''}{exponent}"
+
+def ssis_value(value: Any) -> str:
+    """
+    Formats a value as the `SSIS` flat file destination writes it.
+    """
+    if isinstance(value, (float, np.floating)):
+        return format_r8(float(value))
+    return "" if value is None else str(value)
+
+class Reports:
+    """
+    A class reproducing the aggregations of the `SSIS` packages on the cube.
+
+    The packages `assignment_6b`, `7b`, `8b` and `9b` read the star schema from the database and
+    aggregate it in their data flows. Here the same computations run on the vectorized engine of the
+    cube, over the splitted files. Sums are accumulated in fact order, as the `SSIS` aggregates do,
+    and the outputs are written with the same columns, row order and number formatting as the files
+    in `SSIS/output_assignments`.
+
+    Attributes:
+        `cube (Cube)`: The cube of the damage facts.
+    """
+
+    OUTPUTS = {
+        "6b": "output_assignment_6b.csv",
+        "7b": os.path.join("output_assignment_7b", "output_assignment_7b.csv"),
+        "7b_percentages": os.path.join("output_assignment_7b", "total_damage_costs.csv"),
+        "8b": "output_assignment_8b.csv",
+        "9b": "output_assignment_9b.csv",
+    }
+
+    LISTING_FIELDNAMES = ["damage_cost", "vehicle_type", "city", "state", "sex", "age"]
+
+    def __init__(self, cube: Cube) -> None:
+        """
+        Initializes a Reports object.
+
+        Args:
+            `cube (Cube)`: The cube of the damage facts.
+        """
+        self.cube = cube
+
+    @staticmethod
+    def _rename(result: Data, columns: Dict[str, str], fieldnames: List[str], cast: Dict[str, type] = None) -> Data:
+        """
+        Renames and reorders the columns of a query result.
+        """
+        data = Data()
+        data.fieldnames = fieldnames
+        data.rows = []
+        for row in result.rows:
+            renamed = {columns.get(field, field): value for field, value in row.items()}
+            for field, conversion in (cast or {}).items():
+                renamed[field] = conversion(renamed[field])
+            data.rows.append(renamed)
+        return data
+
+    def damage_listing(self) -> Iterable[Sequence[Any]]:
+        """
+        Lists the damage cost of every fact with its vehicle type and person, by decreasing cost (`assignment_6b`).
+
+        Returns:
+            `Iterable[Sequence[Any]]`: The rows, with the columns of `LISTING_FIELDNAMES`.
+        """
+        costs = self.cube.values["DAMAGE_COST"]
+        order = np.argsort(-costs, kind="stable")
+        columns = [costs[order]] + [
+            self.cube.members(level)[self.cube.codes(level)[order]]
+            for level in ("Vehicle.VEHICLE_TYPE", "Person.CITY", "Person.STATE", "Person.SEX", "Person.AGE")
+        ]
+        return zip(*(column.tolist() for column in columns))
+
+    def damage_by_period(self) -> Data:
+        """
+        Computes the damage costs of every month, split between day and night crashes (`assignment_7b`).
+
+        Returns:
+            `Data`: The rows `crash_month, crash_year, total_damage_cost, crash_period`, by year, month and period.
+        """
+        result = self.cube.query(["Date.CRASH_YEAR", "Date.CRASH_MONTH", "Date.DAY_NIGHT"], ["DAMAGE_COST"])
+        return self._rename(
+            result,
+            {"CRASH_YEAR": "crash_year", "CRASH_MONTH": "crash_month", "DAY_NIGHT": "crash_period", "DAMAGE_COST": "total_damage_cost"},
+            ["crash_month", "crash_year", "total_damage_cost", "crash_period"],
+        )
+
+    @staticmethod
+    def damage_percentages(monthly: Data) -> Data:
+        """
+        Computes the damage costs of every month and period as a percentage of the average monthly
+        damage costs of the year (`assignment_7b`).
+
+        Args:
+            `monthly (Data)`: The output of `damage_by_period`.
+
+        Returns:
+            `Data`: The rows `crash_month, crash_year, crash_period, percentage`, by month, year and period.
+                The percentages of a year without any damage cost are 0.
+        """
+        totals: Dict[Any, float] = {}
+        months: Dict[Any, set] = {}
+        for row in monthly.rows:
+            totals[row["crash_year"]] = totals.get(row["crash_year"], 0.0) + row["total_damage_cost"]
+            months.setdefault(row["crash_year"], set()).add(row["crash_month"])
+        averages = {year: total / len(months[year]) for year, total in totals.items()}
+
+        data = Data()
+        data.fieldnames = ["crash_month", "crash_year", "crash_period", "percentage"]
+        data.rows = [
+            {
+                "crash_month": row["crash_month"],
+                "crash_year": row["crash_year"],
+                "crash_period": row["crash_period"],
+                "percentage": row["total_damage_cost"] / averages[row["crash_year"]] * 100 if averages[row["crash_year"]] else 0.0,
+            }
+            for row in sorted(monthly.rows, key=lambda row: (row["crash_month"], row["crash_year"], row["crash_period"]))
+        ]
+        return data
+
+    def damage_by_weather_vehicle(self) -> Data:
+        """
+        Computes the damage costs of every weather condition and vehicle type (`assignment_8b`).
+
+        The `SSIS` aggregate emits its groups in hash order; here they are sorted by weather condition and vehicle type.
+
+        Returns:
+            `Data`: The rows `weather_condition, vehicle_type, total_damage_cost`.
+        """
+        result = self.cube.query(["Crash.WEATHER_CONDITION", "Vehicle.VEHICLE_TYPE"], ["DAMAGE_COST"])
+        return self._rename(
+            result,
+            {"WEATHER_CONDITION": "weather_condition", "VEHICLE_TYPE": "vehicle_type", "DAMAGE_COST": "total_damage_cost"},
+            ["weather_condition", "vehicle_type", "total_damage_cost"],
+        )
+
+    def units_by_beat_season(self) -> Data:
+        """
+        Computes the number of units involved in crashes of every police beat, in summer and spring
+        versus winter and autumn (`assignment_9b`).
+
+        Returns:
+            `Data`: The rows `beat_of_occurrence, total_num_units, crash_season`, by beat and seasons.
+        """
+        result = self.cube.query(["Location.BEAT_OF_OCCURRENCE", "Date.SEASONS"], ["NUM_UNITS"])
+        return self._rename(
+            result,
+            {"BEAT_OF_OCCURRENCE": "beat_of_occurrence", "SEASONS": "crash_season", "NUM_UNITS": "total_num_units"},
+            ["beat_of_occurrence", "total_num_units", "crash_season"],
+            cast={"total_num_units": int},
+        )
+
+    @staticmethod
+    def export(fieldnames: List[str], rows: Iterable[Sequence[Any]], output_file: str) -> int:
+        """
+        Writes rows to a `CSV` file formatted as by the `SSIS` flat file destination.
+
+        Args:
+            `fieldnames (List[str])`: The header.
+            `rows (Iterable[Sequence[Any]])`: The rows, as sequences of values.
+            `output_file (str)`: The path to the output `CSV` file.
+
+        Returns:
+            `int`: The number of rows written.
+
+        Raises:
+            `IOError`: If an error occurs while writing to the file.
+        """
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        written = 0
+        try:
+            with open(output_file, mode="w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file, lineterminator="\n")
+                writer.writerow(fieldnames)
+                for row in rows:
+                    writer.writerow([ssis_value(value) for value in row])
+                    written += 1
+        except IOError as e:
+            raise IOError(f"Error writing to file {output_file}: {e}") from e
+        return written
+
+    def export_all(self, output_dir: str) -> Dict[str, float]:
+        """
+        Computes every report and writes it under `output_dir`, with the layout of `SSIS/output_assignments`.
+
+        Args:
+            `output_dir (str)`: The output directory.
+
+        Returns:
+            `Dict[str, float]`: The elapsed seconds of every report, computation and export.
+        """
+        timings: Dict[str, float] = {}
+
+        def run(name: str, compute: Callable[[], Data]) -> Data:
+            start = time.perf_counter()
+            result = compute()
+            if isinstance(result, Data):
+                rows = ([row[field] for field in result.fieldnames] for row in result.rows)
+                written = self.export(result.fieldnames, rows, os.path.join(output_dir, self.OUTPUTS[name]))
+            else:
+                written = self.export(self.LISTING_FIELDNAMES, result, os.path.join(output_dir, self.OUTPUTS[name]))
+            timings[name] = time.perf_counter() - start
+            log.info(f"`{name}`: {written} rows in {timings[name]:.3f}s.")
+            return result
+
+        run("6b", self.damage_listing)
+        monthly = run("7b", self.damage_by_period)
+        run("7b_percentages", lambda: self.damage_percentages(monthly))
+        run("8b", self.damage_by_weather_vehicle)
+        run("9b", self.units_by_beat_season)
+        return timings
+
+    @staticmethod
+    def sample(cube: Cube, size: int, seed: int = 0) -> Cube:
+        """
+        Builds a cube of `size` facts drawn with replacement from the facts of another one, over the same dimensions.
+
+        Args:
+            `cube (Cube)`: The cube to draw from.
+            `size (int)`: The number of facts.
+            `seed (int, optional)`: The seed of the draw. Defaults to 0.
+
+        Returns:
+            `Cube`: The sampled cube.
+        """
+        positions = np.random.default_rng(seed).integers(0, len(cube), size)
+        return Cube(
+            cube.dimensions,
+            {name: keys[positions] for name, keys in cube.keys.items()},
+            {name: values[positions] for name, values in cube.values.items()},
+        )
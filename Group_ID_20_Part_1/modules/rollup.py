@@ -0,0 +1,243 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from modules.cube import Cube
+from modules.data import Data
+
+ROLLUPS = {
+    "date_location": ["Date.CRASH_YEAR", "Date.CRASH_MONTH", "Location.LOCATION_POINT"],
+    "weather_vehicle": ["Crash.WEATHER_CONDITION", "Vehicle.VEHICLE_TYPE"],
+    "beat_season": ["Location.BEAT_OF_OCCURRENCE", "Date.CRASH_SEASON"],
+}
+
+class Rollup:
+    """
+    A materialized aggregate of the additive measures of a cube by the members of a set of levels.
+
+    Attributes:
+        `levels (List[str])`: The levels of the aggregate, as `Dimension.ATTRIBUTE`.
+        `measures (List[str])`: The additive measures of the aggregate.
+        `groups (Dict[Tuple, List[float]])`: Mapping of member tuples to the values of the measures.
+    """
+
+    def __init__(self, levels: List[str], measures: List[str], groups: Dict[Tuple, List[float]] = None) -> None:
+        """
+        Initializes a Rollup object.
+
+        Args:
+            `levels (List[str])`: The levels of the aggregate.
+            `measures (List[str])`: The additive measures of the aggregate.
+            `groups (Dict[Tuple, List[float]], optional)`: The aggregated values. Defaults to None (empty).
+        """
+        self.levels = levels
+        self.measures = measures
+        self.groups: Dict[Tuple, List[float]] = groups or {}
+
+    def __len__(self) -> int:
+        """
+        Returns the number of groups of the aggregate.
+        """
+        return len(self.groups)
+
+    def add(self, cube: Cube) -> None:
+        """
+        Adds the facts of a cube to the aggregate.
+
+        Args:
+            `cube (Cube)`: The cube holding the facts to add.
+        """
+        if not len(cube):
+            return
+        result = cube.query(self.levels, self.measures)
+        attributes = result.fieldnames[:len(self.levels)]
+        for row in result.rows:
+            key = tuple(row[attribute] for attribute in attributes)
+            totals = self.groups.setdefault(key, [0.0] * len(self.measures))
+            for position, measure in enumerate(self.measures):
+                totals[position] += row[measure]
+
+    def answer(self, rows: List[str], measures: List[str], where: Optional[Dict[str, Any]] = None) -> Data:
+        """
+        Re-aggregates the aggregate by a subset of its levels.
+
+        Args:
+            `rows (List[str])`: The row levels, among the levels of the aggregate.
+            `measures (List[str])`: The measures, among the measures of the aggregate.
+            `where (Optional[Dict[str, Any]])`: Mapping of levels of the aggregate to the member, or list of members, to keep. Defaults to None.
+
+        Returns:
+            `Data`: One row per non-empty group, sorted by members, as returned by `Cube.query`.
+        """
+        positions = [self.levels.index(level) for level in rows]
+        selected = [self.measures.index(measure) for measure in measures]
+        # The members are converted to the type of the labels of the level, as `Cube._keep` does (e.g. "03" to 3).
+        sample = next(iter(self.groups), None)
+        filters = []
+        for level, members in (where or {}).items():
+            position = self.levels.index(level)
+            label_type = type(sample[position]) if sample is not None else str
+            members = members if isinstance(members, (list, tuple, set)) else [members]
+            filters.append((position, {label_type(member) for member in members}))
+
+        totals: Dict[Tuple, List[float]] = {}
+        for key, values in self.groups.items():
+            if any(key[position] not in members for position, members in filters):
+                continue
+            target = totals.setdefault(tuple(key[position] for position in positions), [0.0] * len(selected))
+            for index, position in enumerate(selected):
+                target[index] += values[position]
+
+        result = Data()
+        result.fieldnames = [level.partition(".")[2] for level in rows] + measures
+        result.rows = [dict(zip(result.fieldnames, key + tuple(values))) for key, values in sorted(totals.items())]
+        return result
+
+class RollupStore:
+    """
+    A class for keeping materialized rollups of a cube and answering queries from them.
+
+    Each rollup aggregates the additive measures of the cube by a set of levels. A query is answered
+    by re-aggregating the smallest rollup holding all its row and slice levels, without touching the
+    facts, and falls back to the cube when no rollup matches. New facts are added to every rollup
+    incrementally, by aggregating only them.
+
+    Attributes:
+        `rollups (Dict[str, Rollup])`: The rollups, by name.
+        `partitions (Dict[str, str])`: The checksums of the fact partitions aggregated, by partition name.
+    """
+
+    MEASURES = [measure for measure, (aggregation, _) in Cube.MEASURES.items() if aggregation in ("sum", "count")]
+
+    def __init__(self, rollups: Dict[str, Rollup] = None, partitions: Dict[str, str] = None) -> None:
+        """
+        Initializes a RollupStore object.
+
+        Args:
+            `rollups (Dict[str, Rollup], optional)`: The rollups, by name. Defaults to None (empty).
+            `partitions (Dict[str, str], optional)`: The checksums of the fact partitions aggregated. Defaults to None (empty).
+        """
+        self.rollups = rollups or {}
+        self.partitions = partitions or {}
+
+    @classmethod
+    def build(cls, cube: Cube, lattices: Dict[str, List[str]] = None) -> "RollupStore":
+        """
+        Materializes rollups of a cube.
+
+        Args:
+            `cube (Cube)`: The cube.
+            `lattices (Dict[str, List[str]], optional)`: The levels of each rollup, by name. Defaults to None (`ROLLUPS`).
+
+        Returns:
+            `RollupStore`: The store.
+        """
+        store = cls({name: Rollup(levels, cls.MEASURES) for name, levels in (lattices or ROLLUPS).items()})
+        store.append(cube)
+        return store
+
+    def append(self, cube: Cube) -> None:
+        """
+        Adds new facts to every rollup.
+
+        Args:
+            `cube (Cube)`: A cube holding only the new facts.
+        """
+        for rollup in self.rollups.values():
+            rollup.add(cube)
+
+    def append_facts(self, facts: Union[Data, List[Dict[str, Any]]], dimensions: Dict[str, Data]) -> Cube:
+        """
+        Adds appended fact rows to every rollup, aggregating only them.
+
+        Args:
+            `facts (Union[Data, List[Dict[str, Any]]])`: The appended fact rows.
+            `dimensions (Dict[str, Data])`: The dimension tables, by dimension name, including the members the new facts reference.
+
+        Returns:
+            `Cube`: The cube of the appended facts, e.g. to add them to other structures.
+        """
+        cube = Cube.from_data(facts, dimensions)
+        self.append(cube)
+        return cube
+
+    def match(self, rows: List[str], measures: List[str], where: Optional[Dict[str, Any]] = None) -> Optional[Rollup]:
+        """
+        Finds the smallest rollup able to answer a query.
+
+        Args:
+            `rows (List[str])`: The row levels.
+            `measures (List[str])`: The measures.
+            `where (Optional[Dict[str, Any]])`: The slice. Defaults to None.
+
+        Returns:
+            `Optional[Rollup]`: The rollup with the fewest groups holding every level and measure of the query, or None.
+        """
+        needed = set(rows) | set(where or {})
+        candidates = [
+            rollup for rollup in self.rollups.values()
+            if needed <= set(rollup.levels) and set(measures) <= set(rollup.measures)
+        ]
+        return min(candidates, key=len, default=None)
+
+    def query(self, cube: Cube, rows: List[str], measures: List[str] = None, where: Optional[Dict[str, Any]] = None) -> Data:
+        """
+        Answers a query from the smallest matching rollup, or from the cube.
+
+        Args:
+            `cube (Cube)`: The cube, used when no rollup matches.
+            `rows (List[str])`: The row levels.
+            `measures (List[str], optional)`: The measures. Defaults to None (the measures of the rollups).
+            `where (Optional[Dict[str, Any]])`: Mapping of levels to the member, or list of members, to keep. Defaults to None.
+
+        Returns:
+            `Data`: One row per non-empty group, sorted by members.
+        """
+        measures = measures or self.MEASURES
+        rollup = self.match(rows, measures, where)
+        if rollup is None:
+            return cube.query(rows, measures, where)
+        return rollup.answer(rows, measures, where)
+
+    def save(self, file_path: str) -> None:
+        """
+        Writes the rollups to a `JSON` file.
+
+        Args:
+            `file_path (str)`: The path to the `JSON` file.
+        """
+        content = {
+            "partitions": self.partitions,
+            "rollups": {
+                name: {
+                    "levels": rollup.levels,
+                    "measures": rollup.measures,
+                    "groups": [list(key) + values for key, values in rollup.groups.items()],
+                }
+                for name, rollup in self.rollups.items()
+            },
+        }
+        with open(file_path, mode="w", encoding="utf-8") as file:
+            json.dump(content, file)
+
+    @classmethod
+    def from_file(cls, file_path: str) -> "RollupStore":
+        """
+        Reads rollups written by `save`.
+
+        Args:
+            `file_path (str)`: The path to the `JSON` file.
+
+        Returns:
+            `RollupStore`: The store.
+        """
+        with open(file_path, mode="r", encoding="utf-8") as file:
+            content = json.load(file)
+        if "rollups" not in content:
+            content = {"rollups": content, "partitions": {}}
+        return cls({
+            name: Rollup(
+                entry["levels"], entry["measures"],
+                {tuple(group[:len(entry["levels"])]): group[len(entry["levels"]):] for group in entry["groups"]}
+            )
+            for name, entry in content["rollups"].items()
+        }, content["partitions"])
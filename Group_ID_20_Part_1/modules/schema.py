@@ -0,0 +1,323 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Definition of columns for each table (schema) in the dataset.
+SCHEMA_DEFINITIONS = {
+    "CRASH": ["CRASH_ID", "RD_NO", "CRASH_DATE", "POSTED_SPEED_LIMIT", "TRAFFIC_CONTROL_DEVICE", 
+              "DEVICE_CONDITION", "WEATHER_CONDITION", "LIGHTING_CONDITION", "FIRST_CRASH_TYPE", 
+              "TRAFFICWAY_TYPE", "ALIGNMENT", "ROADWAY_SURFACE_COND", "ROAD_DEFECT", "REPORT_TYPE", 
+              "CRASH_TYPE", "PRIM_CONTRIBUTORY_CAUSE", "SEC_CONTRIBUTORY_CAUSE"],
+    "DATE": ["DATE_ID", "CRASH_TIME", "CRASH_PERIOD", "CRASH_DAY", "CRASH_MONTH", "CRASH_YEAR", "CRASH_DAY_OF_WEEK", 
+            "CRASH_SEASON", "DATE_POLICE_NOTIFIED"],
+    "LOCATION": ["LOCATION_ID", "STREET_NO", "STREET_DIRECTION", "STREET_NAME", 
+                 "BEAT_OF_OCCURRENCE", "LATITUDE", "LONGITUDE", "LOCATION_POINT"],
+    "INJURY": ["INJURY_ID", "MOST_SEVERE_INJURY", "INJURIES_TOTAL", "INJURIES_FATAL", 
+               "INJURIES_INCAPACITATING", "INJURIES_NON_INCAPACITATING", 
+               "INJURIES_REPORTED_NOT_EVIDENT", "INJURIES_NO_INDICATION"],
+    "PERSON": ["PERSON_ID", "PERSON_TYPE", "CRASH_DATE", "CITY", "STATE", "SEX", "AGE", 
+               "SAFETY_EQUIPMENT", "AIRBAG_DEPLOYED", "EJECTION", "INJURY_CLASSIFICATION", 
+               "DRIVER_ACTION", "DRIVER_VISION", "PHYSICAL_CONDITION", "BAC_RESULT", 
+               "DAMAGE_CATEGORY"],
+    "VEHICLE": ["VEHICLE_ID", "CRASH_DATE", "UNIT_NO", "UNIT_TYPE", "MAKE", "MODEL", 
+                "LIC_PLATE_STATE", "VEHICLE_YEAR", "VEHICLE_DEFECT", "VEHICLE_TYPE", 
+                "VEHICLE_USE", "TRAVEL_DIRECTION", "MANEUVER", "OCCUPANT_CNT", 
+                "FIRST_CONTACT_POINT"],
+    "DAMAGE": ["DAMAGE_COST", "NUM_UNITS", "CRASH_ID", "DATE_ID", "LOCATION_ID", 
+               "INJURY_ID", "PERSON_ID", "VEHICLE_ID"]
+}
+
+# Surrogate key columns of each table (schema) in the dataset.
+SURROGATE_KEYS = {
+    "CRASH": ["CRASH_ID"],
+    "DATE": ["DATE_ID"],
+    "LOCATION": ["LOCATION_ID"],
+    "INJURY": ["INJURY_ID"],
+    "PERSON": ["PERSON_ID"],
+    "VEHICLE": ["VEHICLE_ID"],
+    "DAMAGE": ["CRASH_ID", "DATE_ID", "LOCATION_ID", "INJURY_ID", "PERSON_ID", "VEHICLE_ID"]
+}
+
+class Table:
+    """
+    The definition of a database table, parsed from a `CREATE TABLE` statement.
+
+    Attributes:
+        `name (str)`: The name of the table.
+        `columns (List[Tuple[str, str, bool]])`: The name, `SQL` type and nullability of each column.
+        `primary_key (Optional[str])`: The primary key column, if any.
+        `unique (List[str])`: The columns with a `UNIQUE` constraint.
+        `foreign_keys (List[Tuple[str, str, str, str]])`: The column, referenced table, referenced column
+            and referential actions (e.g. `ON DELETE CASCADE`) of each foreign key.
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        Initializes an empty Table object.
+
+        Args:
+            `name (str)`: The name of the table.
+        """
+        self.name = name
+        self.columns: List[Tuple[str, str, bool]] = []
+        self.primary_key: Optional[str] = None
+        self.unique: List[str] = []
+        self.foreign_keys: List[Tuple[str, str, str, str]] = []
+
+    def __repr__(self) -> str:
+        return f"Table({self.name}, {len(self.columns)} columns)"
+
+class Schema:
+    """
+    A class for handling the `CREATE TABLE` statements of a schema file.
+
+    The statements are parsed into tables, columns and constraints, so that the schema can be
+    recreated in a load-optimized form: tables first created as heaps without any constraint,
+    then primary keys, unique constraints, indexes and foreign keys added once the data is loaded.
+    The variant of the schema with integer surrogate keys is derived from the same statements.
+
+    Attributes:
+        `tables (Dict[str, Table])`: The tables of the schema, in creation order.
+    """
+
+    _TABLE = re.compile(r"CREATE\s+TABLE\s+(\w+)\s*\((.*?)\)\s*;", re.IGNORECASE | re.DOTALL)
+    _FOREIGN_KEY = re.compile(
+        r"FOREIGN\s+KEY\s*\(\s*(\w+)\s*\)\s*REFERENCES\s+(\w+)\s*\(\s*(\w+)\s*\)\s*(.*)",
+        re.IGNORECASE | re.DOTALL
+    )
+    _COLUMN = re.compile(r"(\w+)\s+(\w+(?:\s*\([^)]*\))?)\s*(.*)", re.DOTALL)
+
+    def __init__(self, sql: str) -> None:
+        """
+        Initializes a Schema object by parsing `CREATE TABLE` statements.
+
+        Args:
+            `sql (str)`: The `SQL` statements.
+
+        Raises:
+            `ValueError`: If no table is defined, or a definition cannot be parsed.
+        """
+        self.tables: Dict[str, Table] = {}
+        for name, body in self._TABLE.findall(sql + ";"):
+            self.tables[name] = self._parse_table(name, body)
+        if not self.tables:
+            raise ValueError("No `CREATE TABLE` statement found.")
+
+    @classmethod
+    def from_file(cls, file_path: str, integer_keys: bool = False) -> "Schema":
+        """
+        Parses a schema file.
+
+        Args:
+            `file_path (str)`: The path to the `SQL` file.
+            `integer_keys (bool, optional)`: Whether to parse the variant with integer surrogate keys (see `integer_keys`). Defaults to False.
+
+        Returns:
+            `Schema`: The parsed schema.
+        """
+        with open(file_path, "r", encoding="utf-8") as file:
+            sql = file.read()
+        return cls(cls.integer_keys(sql) if integer_keys else sql)
+
+    @classmethod
+    def integer_keys(cls, sql: str) -> str:
+        """
+        Rewrites `CREATE TABLE` statements so that the primary keys, and the foreign keys referencing them, are integers.
+
+        Args:
+            `sql (str)`: The `SQL` statements.
+
+        Returns:
+            `str`: The statements, with the type of every key column replaced by `INT`.
+        """
+        tables = cls(sql).tables.values()
+        keys = {(table.name, table.primary_key) for table in tables if table.primary_key}
+        keys |= {
+            (table.name, column)
+            for table in tables
+            for column, reference, reference_column, _ in table.foreign_keys
+            if (reference, reference_column) in keys
+        }
+
+        def retype(match: re.Match) -> str:
+            body = match.group(2)
+            for table_name, column in keys:
+                if table_name == match.group(1):
+                    body = re.sub(
+                        rf"(^|,)(\s*{column}\s+)\w+(?:\s*\([^)]*\))?", r"\1\2INT", body, count=1, flags=re.IGNORECASE
+                    )
+            start, end = match.start(2) - match.start(0), match.end(2) - match.start(0)
+            return match.group(0)[:start] + body + match.group(0)[end:]
+
+        return cls._TABLE.sub(retype, sql)
+
+    @staticmethod
+    def _split(body: str) -> List[str]:
+        """
+        Splits the body of a `CREATE TABLE` statement on the commas outside parentheses.
+
+        Args:
+            `body (str)`: The body of the statement.
+
+        Returns:
+            `List[str]`: The non-empty column and constraint definitions.
+        """
+        items, depth, current = [], 0, []
+        for char in body:
+            if char == "," and depth == 0:
+                items.append("".join(current))
+                current = []
+                continue
+            depth += (char == "(") - (char == ")")
+            current.append(char)
+        items.append("".join(current))
+        return [" ".join(item.split()) for item in items if item.strip()]
+
+    def _parse_table(self, name: str, body: str) -> Table:
+        """
+        Parses the body of a `CREATE TABLE` statement.
+
+        Args:
+            `name (str)`: The name of the table.
+            `body (str)`: The body of the statement.
+
+        Returns:
+            `Table`: The parsed table.
+
+        Raises:
+            `ValueError`: If a definition cannot be parsed.
+        """
+        table = Table(name)
+        for item in self._split(body):
+            foreign_key = self._FOREIGN_KEY.fullmatch(item)
+            if foreign_key:
+                column, reference, reference_column, actions = foreign_key.groups()
+                table.foreign_keys.append((column, reference, reference_column, " ".join(actions.upper().split())))
+                continue
+
+            column = self._COLUMN.fullmatch(item)
+            if not column:
+                raise ValueError(f"Cannot parse definition '{item}' of table `{name}`.")
+            column_name, column_type, options = column.groups()
+            options = options.upper()
+            table.columns.append((column_name, column_type, "NOT NULL" not in options and "PRIMARY KEY" not in options))
+            if "PRIMARY KEY" in options:
+                table.primary_key = column_name
+            if "UNIQUE" in options:
+                table.unique.append(column_name)
+        return table
+
+    def heap_statements(self) -> List[str]:
+        """
+        Returns the `CREATE TABLE` statements of the tables without any key, unique or foreign key constraint.
+
+        Returns:
+            `List[str]`: One statement per table.
+        """
+        return [
+            f"CREATE TABLE {table.name}(\n" + ",\n".join(
+                f"    {column} {column_type} {'NULL' if nullable else 'NOT NULL'}"
+                for column, column_type, nullable in table.columns
+            ) + "\n);"
+            for table in self.tables.values()
+        ]
+
+    def key_statements(self) -> List[str]:
+        """
+        Returns the statements adding the primary key and unique constraints.
+
+        Returns:
+            `List[str]`: One `ALTER TABLE` statement per constraint.
+        """
+        statements = []
+        for table in self.tables.values():
+            if table.primary_key:
+                statements.append(
+                    f"ALTER TABLE {table.name} ADD CONSTRAINT pk_{table.name} PRIMARY KEY ({table.primary_key});"
+                )
+            for column in table.unique:
+                statements.append(
+                    f"ALTER TABLE {table.name} ADD CONSTRAINT uq_{table.name}_{column} UNIQUE ({column});"
+                )
+        return statements
+
+    def index_statements(self, columnstore: bool = False, grain: bool = False) -> List[str]:
+        """
+        Returns the statements creating the indexes of the tables with foreign keys (the fact tables).
+
+        Args:
+            `columnstore (bool, optional)`: Whether to store each fact table as a clustered columnstore
+                index, instead of adding a nonclustered index on each of its foreign key columns. Defaults to False.
+            `grain (bool, optional)`: Whether to also cluster each fact table on its grain (see `grain_index_statements`),
+                unless it is stored as a columnstore. Defaults to False.
+
+        Returns:
+            `List[str]`: The `CREATE INDEX` statements.
+        """
+        statements = self.grain_index_statements() if grain and not columnstore else []
+        for table in self.tables.values():
+            if not table.foreign_keys:
+                continue
+            if columnstore:
+                statements.append(f"CREATE CLUSTERED COLUMNSTORE INDEX cci_{table.name} ON {table.name};")
+                continue
+            for column, _, _, _ in table.foreign_keys:
+                statements.append(f"CREATE NONCLUSTERED INDEX ix_{table.name}_{column} ON {table.name} ({column});")
+        return statements
+
+    def grain_index_statements(self) -> List[str]:
+        """
+        Returns the statements clustering each table without primary key but with foreign keys (the fact tables)
+        on the combination of its foreign keys (its grain), on which `MergeLoader` matches their rows.
+
+        Returns:
+            `List[str]`: The `CREATE CLUSTERED INDEX` statements.
+        """
+        return [
+            f"CREATE CLUSTERED INDEX cix_{table.name}_grain ON {table.name} "
+            f"({', '.join(column for column, _, _, _ in table.foreign_keys)});"
+            for table in self.tables.values()
+            if table.foreign_keys and not table.primary_key
+        ]
+
+    def foreign_key_statements(self) -> List[str]:
+        """
+        Returns the statements adding the foreign key constraints, with their referential actions.
+
+        Returns:
+            `List[str]`: One `ALTER TABLE` statement per foreign key.
+        """
+        return [
+            f"ALTER TABLE {table.name} WITH CHECK ADD CONSTRAINT fk_{table.name}_{column} "
+            f"FOREIGN KEY ({column}) REFERENCES {reference}({reference_column})" + (f" {actions}" if actions else "") + ";"
+            for table in self.tables.values()
+            for column, reference, reference_column, actions in table.foreign_keys
+        ]
+
+    def integrity_query(self, table_name: str) -> Tuple[str, List[str]]:
+        """
+        Builds a query counting, in a single pass over a table, the rows violating each of its foreign keys.
+
+        Args:
+            `table_name (str)`: The name of the table holding the foreign keys.
+
+        Returns:
+            `Tuple[str, List[str]]`: The query, returning one row with one count per foreign key,
+                and the foreign key columns in the order of the counts.
+
+        Raises:
+            `KeyError`: If the table is not part of the schema, or has no foreign key.
+        """
+        table = self.tables.get(table_name)
+        if table is None or not table.foreign_keys:
+            raise KeyError(f"Table `{table_name}` has no foreign key in the schema.")
+
+        counts, joins = [], []
+        for position, (column, reference, reference_column, _) in enumerate(table.foreign_keys):
+            alias = f"r{position}"
+            counts.append(
+                f"SUM(CASE WHEN {alias}.{reference_column} IS NULL AND t.{column} IS NOT NULL THEN 1 ELSE 0 END) AS {column}"
+            )
+            joins.append(f"LEFT JOIN {reference} {alias} ON {alias}.{reference_column} = t.{column}")
+
+        query = f"SELECT {', '.join(counts)} FROM {table.name} t " + " ".join(joins) + ";"
+        return query, [column for column, _, _, _ in table.foreign_keys]
@@ -0,0 +1,446 @@
+import math
+import json
+import base64
+import random
+import hashlib
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.data import Data
+
+def hash64(value: Any, salt: bytes = b"") -> int:
+    """
+    Hashes a value into a stable 64-bit integer, the same in every process (unlike `hash`).
+
+    Args:
+        `value (Any)`: The value, hashed through its string form.
+        `salt (bytes, optional)`: A salt, to derive independent hashes. Defaults to no salt.
+
+    Returns:
+        `int`: The hash.
+    """
+    return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8, salt=salt).digest(), "big")
+
+def to_float(value: Any) -> float:
+    """
+    Converts a measure to a float, missing values counting as 0 as in a `SQL` sum.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def encode_array(array: np.ndarray) -> str:
+    """
+    Encodes an array as `base64` text, for the `JSON` files.
+    """
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
+def decode_array(text: str, dtype: Any, shape: Tuple[int, ...]) -> np.ndarray:
+    """
+    Decodes an array encoded by `encode_array`.
+    """
+    return np.frombuffer(base64.b64decode(text), dtype=dtype).reshape(shape).copy()
+
+class HyperLogLog:
+    """
+    A HyperLogLog sketch estimating the number of distinct values of a stream in constant memory.
+
+    Every value is hashed to 64 bits: the first `precision` bits pick one of `2^precision` registers,
+    which keeps the highest position of the first 1-bit seen among the remaining bits. The relative
+    standard error of the estimate is about `1.04 / sqrt(2^precision)`, 1.6% with the default
+    precision, and sketches of disjoint or overlapping streams merge into the sketch of their union.
+
+    Attributes:
+        `precision (int)`: The number of bits indexing the registers.
+        `registers (np.ndarray)`: The registers.
+    """
+
+    def __init__(self, precision: int = 12, registers: Optional[np.ndarray] = None) -> None:
+        """
+        Initializes a HyperLogLog object.
+
+        Args:
+            `precision (int, optional)`: The number of bits indexing the registers, between 4 and 16. Defaults to 12.
+            `registers (Optional[np.ndarray])`: The registers of a saved sketch. Defaults to None (empty).
+
+        Raises:
+            `ValueError`: If the precision is out of range.
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError("The precision of a HyperLogLog sketch must be between 4 and 16.")
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, value: Any) -> None:
+        """
+        Adds a value to the sketch.
+        """
+        hashed = hash64(value)
+        register = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - remainder.bit_length() + 1
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """
+        Returns the sketch of the union of the streams of two sketches.
+
+        Raises:
+            `ValueError`: If the sketches do not have the same precision.
+        """
+        if other.precision != self.precision:
+            raise ValueError("Only HyperLogLog sketches of the same precision can be merged.")
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    def count(self) -> float:
+        """
+        Estimates the number of distinct values added, with the small-range correction of linear counting.
+        """
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * size and empty:
+            estimate = size * math.log(size / empty)
+        return float(estimate)
+
+    @property
+    def error(self) -> float:
+        """
+        Returns the relative standard error of the estimates.
+        """
+        return 1.04 / math.sqrt(len(self.registers))
+
+class CountMinSketch:
+    """
+    A count-min sketch estimating the frequencies of the values of a stream, and tracking its heavy hitters.
+
+    Every value increments one counter in each of `depth` rows of `width` counters, chosen by independent
+    hashes, and its frequency is estimated by the smallest of its counters. Estimates never undercount and
+    overcount by at most `e / width` times the total count, except with probability `e^-depth`. The values
+    with the highest estimates are kept as heavy hitter candidates along the way. Additions are counted
+    per value first and applied to the counters in batches of `batch_size` distinct values.
+
+    Attributes:
+        `width (int)`: The number of counters per row.
+        `depth (int)`: The number of rows.
+        `counters (np.ndarray)`: The counters, one row per hash.
+        `total (int)`: The total count added.
+        `capacity (int)`: The number of heavy hitter candidates kept.
+        `candidates (Dict[str, int])`: The estimated frequencies of the heavy hitter candidates.
+    """
+
+    batch_size = 1024
+
+    def __init__(self, width: int = 2048, depth: int = 5, capacity: int = 64, counters: Optional[np.ndarray] = None) -> None:
+        """
+        Initializes a CountMinSketch object.
+
+        Args:
+            `width (int, optional)`: The number of counters per row. Defaults to 2048.
+            `depth (int, optional)`: The number of rows. Defaults to 5.
+            `capacity (int, optional)`: The number of heavy hitter candidates kept. Defaults to 64.
+            `counters (Optional[np.ndarray])`: The counters of a saved sketch. Defaults to None (empty).
+        """
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        self.counters = counters if counters is not None else np.zeros((depth, width), dtype=np.int64)
+        self.total = int(self.counters[0].sum())
+        self.candidates: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+
+    def _cells(self, value: Any) -> List[int]:
+        """
+        Returns the counter of a value in every row, by double hashing.
+        """
+        first, second = hash64(value), hash64(value, b"count-min") | 1
+        return [(first + row * second) % self.width for row in range(self.depth)]
+
+    def add(self, value: Any, count: int = 1) -> None:
+        """
+        Adds occurrences of a value to the sketch.
+        """
+        key = str(value)
+        self._pending[key] = self._pending.get(key, 0) + count
+        self.total += count
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Applies the pending additions to the counters and updates the heavy hitter candidates.
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        cells = np.array([self._cells(key) for key in pending], dtype=np.int64)
+        rows = np.broadcast_to(np.arange(self.depth), cells.shape)
+        counts = np.array(list(pending.values()), dtype=np.int64)
+        np.add.at(self.counters, (rows, cells), counts[:, None])
+
+        estimates = self.counters[rows, cells].min(axis=1).tolist()
+        for key, estimate in zip(pending, estimates):
+            if key in self.candidates or len(self.candidates) < self.capacity:
+                self.candidates[key] = estimate
+                continue
+            smallest = min(self.candidates, key=self.candidates.get)
+            if estimate > self.candidates[smallest]:
+                del self.candidates[smallest]
+                self.candidates[key] = estimate
+
+    def estimate(self, value: Any) -> int:
+        """
+        Estimates the frequency of a value.
+        """
+        self.flush()
+        return int(self.counters[np.arange(self.depth), self._cells(value)].min())
+
+    def heavy_hitters(self, k: int = 10, fraction: float = 0.0) -> List[Tuple[str, int]]:
+        """
+        Returns the most frequent values.
+
+        Args:
+            `k (int, optional)`: The maximum number of values. Defaults to 10.
+            `fraction (float, optional)`: The minimum share of the total count of a value. Defaults to 0.
+
+        Returns:
+            `List[Tuple[str, int]]`: The values and their estimated frequencies, most frequent first.
+        """
+        self.flush()
+        estimates = sorted(((self.estimate(value), value) for value in self.candidates), reverse=True)
+        return [(value, count) for count, value in estimates[:k] if count >= fraction * self.total]
+
+    @property
+    def error(self) -> float:
+        """
+        Returns the maximum overcount of the estimates, with probability `1 - e^-depth`.
+        """
+        return math.e / self.width * self.total
+
+class StratifiedSample:
+    """
+    A stratified sample of the facts, estimating totals and counts with error bounds.
+
+    Every stratum (e.g. a year) keeps a uniform reservoir sample of at most `capacity` facts, and counts
+    all of its facts, so that the sample stays bounded whatever the number of facts. A total is estimated
+    by expanding the sampled total of every stratum to its size, with the variance of the stratified
+    estimator; strata sampled in full contribute their exact total.
+
+    Attributes:
+        `strata (List[str])`: The columns defining the strata.
+        `capacity (int)`: The maximum number of facts sampled per stratum.
+        `sizes (Dict[Tuple, int])`: The number of facts of every stratum.
+        `rows (Dict[Tuple, List[Dict[str, Any]]])`: The sampled facts of every stratum.
+    """
+
+    def __init__(self, strata: List[str], capacity: int = 1000, seed: int = 0) -> None:
+        """
+        Initializes a StratifiedSample object.
+
+        Args:
+            `strata (List[str])`: The columns defining the strata.
+            `capacity (int, optional)`: The maximum number of facts sampled per stratum. Defaults to 1000.
+            `seed (int, optional)`: The seed of the random generator. Defaults to 0.
+        """
+        self.strata = strata
+        self.capacity = capacity
+        self.sizes: Dict[Tuple, int] = {}
+        self.rows: Dict[Tuple, List[Dict[str, Any]]] = {}
+        self._random = random.Random(seed)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """
+        Offers a fact to the reservoir of its stratum.
+        """
+        stratum = tuple(str(row.get(column)) for column in self.strata)
+        size = self.sizes[stratum] = self.sizes.get(stratum, 0) + 1
+        reservoir = self.rows.setdefault(stratum, [])
+        if len(reservoir) < self.capacity:
+            reservoir.append(dict(row))
+        else:
+            position = self._random.randrange(size)
+            if position < self.capacity:
+                reservoir[position] = dict(row)
+
+    def estimate(self, measure: Optional[str] = None, where: Optional[Dict[str, Any]] = None, confidence: float = 1.96) -> Tuple[float, float]:
+        """
+        Estimates the total of a measure, or the number of facts, over a slice.
+
+        Args:
+            `measure (Optional[str])`: The measure column. Defaults to None (count of facts).
+            `where (Optional[Dict[str, Any]])`: Mapping of columns to the value, or list of values, to keep. Defaults to None.
+            `confidence (float, optional)`: The number of standard errors of the margin. Defaults to 1.96 (95%).
+
+        Returns:
+            `Tuple[float, float]`: The estimate and its margin of error.
+        """
+        filters = [
+            (column, {str(value) for value in (values if isinstance(values, (list, tuple, set)) else [values])})
+            for column, values in (where or {}).items()
+        ]
+        total, variance = 0.0, 0.0
+        for stratum, size in self.sizes.items():
+            sampled = self.rows[stratum]
+            values = np.array([
+                (to_float(row.get(measure)) if measure else 1.0) if all(str(row.get(column)) in kept for column, kept in filters) else 0.0
+                for row in sampled
+            ])
+            total += size * values.mean()
+            if len(sampled) > 1 and len(sampled) < size:
+                variance += size * size * (1 - len(sampled) / size) * values.var(ddof=1) / len(sampled)
+        return float(total), float(confidence * math.sqrt(variance))
+
+class Sketches:
+    """
+    A class for the approximate aggregates of the fact table, built in the streaming pass exporting it.
+
+    The facts are observed one at a time along with some attributes of their crash, and every sketch
+    has a fixed size, so building them costs no more memory than the export, and answering a query
+    only reads the sketches:
+    - `HyperLogLog` sketches of the distinct vehicles and persons of every beat.
+    - A `CountMinSketch` of the primary contributory causes of the facts, with their heavy hitters.
+    - A `StratifiedSample` of the facts by year.
+
+    Attributes:
+        `distinct (Dict[str, Dict[str, HyperLogLog]])`: The sketches of the distinct values of every column of `DISTINCT`, by beat.
+        `causes (CountMinSketch)`: The sketch of the primary contributory causes.
+        `sample (StratifiedSample)`: The sample of the facts.
+    """
+
+    DISTINCT = ["VEHICLE_ID", "PERSON_ID"]
+
+    # Attributes of the crash of every fact observed, besides the fact columns.
+    COLUMNS = ["BEAT_OF_OCCURRENCE", "PRIM_CONTRIBUTORY_CAUSE", "CRASH_YEAR"]
+
+    def __init__(self, precision: int = 12, capacity: int = 1000) -> None:
+        """
+        Initializes a Sketches object.
+
+        Args:
+            `precision (int, optional)`: The precision of the `HyperLogLog` sketches. Defaults to 12.
+            `capacity (int, optional)`: The maximum number of facts sampled per year. Defaults to 1000.
+        """
+        self.precision = precision
+        self.distinct: Dict[str, Dict[str, HyperLogLog]] = {column: {} for column in self.DISTINCT}
+        self.causes = CountMinSketch()
+        self.sample = StratifiedSample(["CRASH_YEAR"], capacity)
+
+    def observe(self, fact: Dict[str, Any]) -> None:
+        """
+        Adds a fact, with the attributes of `COLUMNS`, to every sketch.
+        """
+        beat = str(fact.get("BEAT_OF_OCCURRENCE"))
+        for column, sketches in self.distinct.items():
+            sketch = sketches.get(beat)
+            if sketch is None:
+                sketch = sketches[beat] = HyperLogLog(self.precision)
+            sketch.add(fact.get(column))
+        self.causes.add(fact.get("PRIM_CONTRIBUTORY_CAUSE"))
+        self.sample.add(fact)
+
+    def count_distinct(self, column: str, beats: Optional[List[Any]] = None) -> float:
+        """
+        Estimates the number of distinct values of a column over some beats.
+
+        Args:
+            `column (str)`: The column, among `DISTINCT`.
+            `beats (Optional[List[Any]])`: The beats. Defaults to None (all of them).
+
+        Returns:
+            `float`: The estimate, whose relative standard error is `HyperLogLog.error`.
+        """
+        sketches = self.distinct[column]
+        selected = [sketches[str(beat)] for beat in beats if str(beat) in sketches] if beats is not None else list(sketches.values())
+        union = HyperLogLog(self.precision)
+        for sketch in selected:
+            union = union.merge(sketch)
+        return union.count()
+
+    def distinct_by_beat(self, column: str) -> Data:
+        """
+        Estimates the number of distinct values of a column in every beat.
+
+        Args:
+            `column (str)`: The column, among `DISTINCT`.
+
+        Returns:
+            `Data`: One row per beat, with the estimate as `DISTINCT_<column>`.
+        """
+        result = Data()
+        result.fieldnames = ["BEAT_OF_OCCURRENCE", f"DISTINCT_{column}"]
+        result.rows = [
+            {"BEAT_OF_OCCURRENCE": beat, f"DISTINCT_{column}": round(sketch.count())}
+            for beat, sketch in sorted(self.distinct[column].items())
+        ]
+        return result
+
+    def save(self, file_path: str) -> None:
+        """
+        Writes the sketches to a `JSON` file.
+
+        Args:
+            `file_path (str)`: The path to the `JSON` file.
+        """
+        self.causes.flush()
+        content = {
+            "precision": self.precision,
+            "distinct": {
+                column: {beat: encode_array(sketch.registers) for beat, sketch in sketches.items()}
+                for column, sketches in self.distinct.items()
+            },
+            "causes": {
+                "width": self.causes.width,
+                "depth": self.causes.depth,
+                "capacity": self.causes.capacity,
+                "counters": encode_array(self.causes.counters),
+                "candidates": self.causes.candidates,
+            },
+            "sample": {
+                "strata": self.sample.strata,
+                "capacity": self.sample.capacity,
+                "strata_rows": [
+                    {"stratum": list(stratum), "size": size, "rows": self.sample.rows[stratum]}
+                    for stratum, size in self.sample.sizes.items()
+                ],
+            },
+        }
+        with open(file_path, mode="w", encoding="utf-8") as file:
+            json.dump(content, file)
+
+    @classmethod
+    def from_file(cls, file_path: str) -> "Sketches":
+        """
+        Reads sketches written by `save`.
+
+        Args:
+            `file_path (str)`: The path to the `JSON` file.
+
+        Returns:
+            `Sketches`: The sketches.
+        """
+        with open(file_path, mode="r", encoding="utf-8") as file:
+            content = json.load(file)
+
+        precision = content["precision"]
+        sketches = cls(precision, content["sample"]["capacity"])
+        sketches.distinct = {
+            column: {beat: HyperLogLog(precision, decode_array(text, np.uint8, (1 << precision,))) for beat, text in entries.items()}
+            for column, entries in content["distinct"].items()
+        }
+
+        causes = content["causes"]
+        sketches.causes = CountMinSketch(
+            causes["width"], causes["depth"], causes["capacity"],
+            decode_array(causes["counters"], np.int64, (causes["depth"], causes["width"]))
+        )
+        sketches.causes.candidates = causes["candidates"]
+
+        sketches.sample.strata = content["sample"]["strata"]
+        for entry in content["sample"]["strata_rows"]:
+            stratum = tuple(entry["stratum"])
+            sketches.sample.sizes[stratum] = entry["size"]
+            sketches.sample.rows[stratum] = entry["rows"]
+        return sketches
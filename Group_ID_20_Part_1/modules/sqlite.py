@@ -0,0 +1,321 @@
+import re
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+from modules.database import Database
+
+SQLITE_TYPES = [
+    (re.compile(r"\bN?VARCHAR\s*\(\s*\w+\s*\)", re.IGNORECASE), "TEXT"),
+    (re.compile(r"\bN?CHAR\s*\(\s*\w+\s*\)", re.IGNORECASE), "TEXT"),
+    (re.compile(r"\bDATETIME\b", re.IGNORECASE), "TEXT"),
+    (re.compile(r"\bTIME\b", re.IGNORECASE), "TEXT"),
+    (re.compile(r"\bFLOAT\b", re.IGNORECASE), "REAL"),
+    (re.compile(r"\bINT\b", re.IGNORECASE), "INTEGER"),
+]
+
+# Seconds a connection waits for the write lock held by another one (SQLite has a single writer).
+BUSY_TIMEOUT = 600
+
+def translate_sqlite(sql: str) -> str:
+    """
+    Translates `SQL Server` data definition statements to the `SQLite` dialect.
+
+    Column types are mapped to their `SQLite` storage class, indexes lose their `CLUSTERED` or
+    `NONCLUSTERED` kind, and trailing commas before the closing parenthesis of a `CREATE TABLE`
+    statement are removed.
+
+    Args:
+        `sql (str)`: The `SQL Server` statements.
+
+    Returns:
+        `str`: The `SQLite` statements.
+    """
+    for pattern, replacement in SQLITE_TYPES:
+        sql = pattern.sub(replacement, sql)
+    sql = re.sub(r"\b(?:NON)?CLUSTERED\s+(?=INDEX\b)", "", sql, flags=re.IGNORECASE)
+    return re.sub(r",(\s*\)\s*;)", r"\1", sql)
+
+def split_statements(sql: str) -> List[str]:
+    """
+    Splits a script into its statements, on the semicolons ending a complete statement.
+
+    A semicolon inside a string literal, a quoted identifier, a comment or the body of a trigger
+    does not end a statement (see `sqlite3.complete_statement`).
+
+    Args:
+        `sql (str)`: The script.
+
+    Returns:
+        `List[str]`: The statements, without the empty ones.
+    """
+    statements, start = [], 0
+    for position, char in enumerate(sql):
+        if char == ";" and sqlite3.complete_statement(sql[start:position + 1]):
+            statements.append(sql[start:position + 1].strip())
+            start = position + 1
+    statements.append(sql[start:].strip())
+    return [statement for statement in statements if statement.rstrip(";").strip()]
+
+class SQLiteCursor:
+    """
+    An asynchronous cursor over a `sqlite3` cursor, with the interface of the `aioodbc` cursors.
+
+    Attributes:
+        `connection (SQLiteConnection)`: The connection of the cursor.
+        `description`: The description of the columns of the last result set.
+    """
+
+    def __init__(self, connection: "SQLiteConnection") -> None:
+        """
+        Initializes a SQLiteCursor object.
+
+        Args:
+            `connection (SQLiteConnection)`: The connection of the cursor.
+        """
+        self.connection = connection
+        self._cursor: Optional[sqlite3.Cursor] = None
+        self.description = None
+
+    async def __aenter__(self) -> "SQLiteCursor":
+        self._cursor = await self.connection.run(self.connection.raw.cursor)
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.connection.run(self._cursor.close)
+
+    async def execute(self, query: str, params: Tuple = None) -> None:
+        """
+        Executes a statement, or a script of several statements when no parameter is given.
+
+        The statements of a script are executed one by one in the current transaction, unlike
+        `executescript`, which commits it first.
+
+        Args:
+            `query (str)`: The statement or script.
+            `params (Tuple, optional)`: Parameters for the statement.
+        """
+        if params is not None:
+            await self.connection.run(self._cursor.execute, query, params)
+        else:
+            def script() -> None:
+                for statement in split_statements(query) or [query]:
+                    self._cursor.execute(statement)
+
+            await self.connection.run(script)
+        self.description = self._cursor.description
+
+    async def executemany(self, query: str, rows: List[Tuple]) -> None:
+        """
+        Executes a statement once for each parameter tuple.
+
+        Args:
+            `query (str)`: The statement.
+            `rows (List[Tuple])`: The parameter tuples.
+        """
+        await self.connection.run(self._cursor.executemany, query, rows)
+
+    async def fetchall(self) -> List[Tuple]:
+        """
+        Returns the remaining rows of the result set.
+        """
+        return await self.connection.run(self._cursor.fetchall)
+
+    async def fetchmany(self, size: int) -> List[Tuple]:
+        """
+        Returns the next `size` rows of the result set.
+        """
+        return await self.connection.run(self._cursor.fetchmany, size)
+
+class SQLiteConnection:
+    """
+    An asynchronous connection to a `SQLite` database file, with the interface of the `aioodbc` connections.
+
+    Every call runs on a dedicated thread, so that `sqlite3` never blocks the event loop and the
+    connection is only ever used by one thread at a time.
+
+    Attributes:
+        `raw (sqlite3.Connection)`: The underlying connection.
+    """
+
+    def __init__(self, raw: sqlite3.Connection, executor: ThreadPoolExecutor) -> None:
+        """
+        Initializes a SQLiteConnection object. Use `open` to create one.
+
+        Args:
+            `raw (sqlite3.Connection)`: The underlying connection.
+            `executor (ThreadPoolExecutor)`: The single-thread executor of the connection.
+        """
+        self.raw = raw
+        self._executor = executor
+
+    @classmethod
+    async def open(cls, path: str) -> "SQLiteConnection":
+        """
+        Opens a connection to a database file, in `WAL` mode so that readers do not block the writer.
+
+        Args:
+            `path (str)`: The path to the database file.
+
+        Returns:
+            `SQLiteConnection`: The connection.
+        """
+        executor = ThreadPoolExecutor(max_workers=1)
+
+        def connect() -> sqlite3.Connection:
+            raw = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            raw.execute("PRAGMA journal_mode=WAL")
+            raw.execute("PRAGMA synchronous=NORMAL")
+            raw.execute("PRAGMA foreign_keys=ON")
+            return raw
+
+        raw = await asyncio.get_running_loop().run_in_executor(executor, connect)
+        return cls(raw, executor)
+
+    async def run(self, function, *args) -> Any:
+        """
+        Runs a `sqlite3` call on the thread of the connection.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def cursor(self) -> SQLiteCursor:
+        return SQLiteCursor(self)
+
+    async def commit(self) -> None:
+        await self.run(self.raw.commit)
+
+    async def rollback(self) -> None:
+        await self.run(self.raw.rollback)
+
+    async def close(self) -> None:
+        await self.run(self.raw.close)
+        self._executor.shutdown(wait=False)
+
+class SQLitePool:
+    """
+    A pool of connections to a `SQLite` database file, with the interface of the `aioodbc` pools.
+
+    Attributes:
+        `path (str)`: The path to the database file.
+        `maxsize (int)`: The maximum number of connections.
+    """
+
+    def __init__(self, path: str, maxsize: int) -> None:
+        """
+        Initializes a SQLitePool object. Connections are opened on first use.
+
+        Args:
+            `path (str)`: The path to the database file.
+            `maxsize (int)`: The maximum number of connections.
+        """
+        self.path = path
+        self.maxsize = maxsize
+        self._free: asyncio.Queue = asyncio.Queue()
+        self._connections: List[SQLiteConnection] = []
+        self._opened = 0
+        self._opening = asyncio.Lock()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[SQLiteConnection]:
+        # The slot is reserved before the connection is opened, so that concurrent callers
+        # waiting on the opening do not open more than `maxsize` connections. The connections
+        # are opened one at a time, switching a new file to `WAL` failing if another one does.
+        if self._free.empty() and self._opened < self.maxsize:
+            self._opened += 1
+            try:
+                async with self._opening:
+                    connection = await SQLiteConnection.open(self.path)
+            except BaseException:
+                self._opened -= 1
+                raise
+            self._connections.append(connection)
+        else:
+            connection = await self._free.get()
+        try:
+            yield connection
+        finally:
+            self._free.put_nowait(connection)
+
+    def close(self) -> None:
+        pass
+
+    async def wait_closed(self) -> None:
+        for connection in self._connections:
+            await connection.close()
+        self._connections.clear()
+        self._opened = 0
+
+class SQLiteDatabase(Database):
+    """
+    A local `SQLite` implementation of `Database`, with the same asynchronous interface.
+
+    It allows measuring and testing the load paths without the `SQL Server` instance. The `SQL Server`
+    specific statements (e.g. columnstore indexes, `ALTER TABLE ... ADD CONSTRAINT`) are not translated,
+    so the load mode of `populate_database` is not available on this backend. `MergeLoader` builds
+    `SQLite` statements of its own.
+
+    Attributes:
+        `path (str)`: The path to the database file.
+    """
+
+    dialect = "sqlite"
+    max_parameters = 32766
+
+    def __init__(self, path: str, pool_size: int = 1) -> None:
+        """
+        Initializes a SQLiteDatabase object.
+
+        Args:
+            `path (str)`: The path to the database file.
+            `pool_size (int, optional)`: The maximum number of connections. Defaults to 1.
+        """
+        super().__init__(server="localhost", db=path, user="", pwd="", pool_size=pool_size)
+        self.path = path
+
+    @property
+    def dsn(self) -> str:
+        return self.path
+
+    async def connect(self):
+        """
+        Opens a connection, or a pool of connections, to the database file.
+
+        Raises:
+            `ConnectionError`: If the connection fails.
+        """
+        try:
+            if self.pool_size > 1:
+                self.pool = SQLitePool(self.path, self.pool_size)
+            else:
+                self.connection = await SQLiteConnection.open(self.path)
+                self._lock = asyncio.Lock()
+        except Exception as e:
+            raise ConnectionError(f"Connection Error: {e}")
+
+    async def reconnect(self):
+        """
+        Replaces the single connection with a new one, while holding the lock it is handed out under.
+
+        Raises:
+            `ConnectionError`: If the connection fails.
+        """
+        if self.pool:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.connection:
+                try:
+                    await self.connection.close()
+                except Exception:
+                    pass
+            try:
+                self.connection = await SQLiteConnection.open(self.path)
+            except Exception as e:
+                self.connection = None
+                raise ConnectionError(f"Connection Error: {e}")
+
+    def translate(self, sql: str) -> str:
+        return translate_sqlite(sql)
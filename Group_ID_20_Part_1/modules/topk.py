@@ -0,0 +1,69 @@
+import heapq
+from typing import Any, Dict, Hashable, Iterable, List, Tuple
+
+class TopK:
+    """
+    A grouped Top-K operator keeping a bounded min-heap per group.
+
+    Items are pushed one at a time, in a single pass, and each group only ever holds its `k` best
+    items so far: an item enters the heap of its group if the heap is not full yet, or if it beats
+    the smallest item of the heap, which it then replaces. Memory is therefore `O(groups × k)`
+    whatever the number of items, and no group is ever sorted in full. Among items with the same
+    score, the first one pushed wins.
+
+    Attributes:
+        `k (int)`: The number of items kept per group.
+        `heaps (Dict[Hashable, List[Tuple[float, int, Any]]])`: The heap of every group, as `(score, -sequence, item)`.
+    """
+
+    def __init__(self, k: int) -> None:
+        """
+        Initializes a TopK object.
+
+        Args:
+            `k (int)`: The number of items kept per group.
+
+        Raises:
+            `ValueError`: If `k` is not positive.
+        """
+        if k < 1:
+            raise ValueError("The number of items kept per group must be positive.")
+        self.k = k
+        self.heaps: Dict[Hashable, List[Tuple[float, int, Any]]] = {}
+        self._sequence = 0
+
+    def push(self, group: Hashable, score: float, item: Any) -> None:
+        """
+        Offers an item to the heap of its group.
+
+        Args:
+            `group (Hashable)`: The group of the item.
+            `score (float)`: The score the items are ranked by, highest first.
+            `item (Any)`: The item.
+        """
+        self._sequence += 1
+        entry = (score, -self._sequence, item)
+        heap = self.heaps.setdefault(group, [])
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    def extend(self, entries: Iterable[Tuple[Hashable, float, Any]]) -> None:
+        """
+        Offers several `(group, score, item)` entries, in order.
+        """
+        for group, score, item in entries:
+            self.push(group, score, item)
+
+    def result(self, group: Hashable) -> List[Tuple[float, Any]]:
+        """
+        Returns the best items of a group.
+
+        Args:
+            `group (Hashable)`: The group.
+
+        Returns:
+            `List[Tuple[float, Any]]`: The `(score, item)` pairs, best first.
+        """
+        return [(score, item) for score, _, item in sorted(self.heaps.get(group, []), reverse=True)]
@@ -1,9 +1,10 @@
 import os
 import re
 import json
+import hashlib
 import logging as log
 import asyncio
-from typing import Dict, Callable
+from typing import Any, Dict, List, Callable, Awaitable
 
 def log_execution(function: Callable):
     """
@@ -34,6 +35,39 @@ def log_execution(function: Callable):
     return wrapper
 
 
+async def gather_limited(awaitables: List[Awaitable], limit: int) -> List[Any]:
+    """
+    Runs awaitables concurrently, with at most `limit` of them running at the same time.
+
+    When one of them fails, the others are cancelled, and waited for, before the error is raised,
+    so that none keeps running, e.g. on a connection about to be closed.
+
+    Args:
+        `awaitables (List[Awaitable])`: The awaitables to run.
+        `limit (int)`: The maximum number of awaitables running at the same time.
+
+    Returns:
+        `List[Any]`: The results, in the order of the awaitables.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(awaitable: Awaitable) -> Any:
+        async with semaphore:
+            return await awaitable
+
+    tasks = [asyncio.ensure_future(run(awaitable)) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for awaitable in awaitables:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+        raise
+
+
 def get_root(folder_root: str) -> str:
     """
     Retrieves the root directory path based on the folder name.
@@ -89,6 +123,12 @@ def get_paths(root_path: str, mode: str) -> Dict[str, str]:
             "PERSON": ("splitted", "person.csv"),
             "VEHICLE": ("splitted", "vehicle.csv"),
             "DAMAGE": ("splitted", "damage.csv"),
+            "DAMAGE_MANIFEST": (os.path.join("splitted", "damage"), "manifest.json"),
+            "ROLLUPS": ("splitted", "rollups.json"),
+            "GEO_INDEX": ("splitted", "geo_index.json"),
+            "SKETCHES": ("splitted", "sketches.json"),
+            "COLUMNAR": ("splitted", "columnar"),
+            "VERSION": ("splitted", "version.json"),
         },
     }
 
@@ -104,6 +144,39 @@ def get_paths(root_path: str, mode: str) -> Dict[str, str]:
     }
 
 
+def surrogate_key(prefix: str, integer_keys: bool = False) -> Callable[[int], Any]:
+    """
+    Returns a function generating surrogate keys from zero-based row positions.
+
+    Args:
+        `prefix (str)`: The prefix of the formatted keys (e.g. `CRS` for `CRS_000001`).
+        `integer_keys (bool)`: If True, generate compact integer keys starting from 1 instead of formatted strings. Default is False.
+
+    Returns:
+        `Callable[[int], Any]`: A function mapping a row position to its surrogate key.
+    """
+    if integer_keys:
+        return lambda idx: idx + 1
+    return lambda idx: f"{prefix}_{idx + 1:06d}"
+
+
+def file_checksum(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    Computes the `SHA-1` checksum of the content of a file, read in blocks.
+
+    Args:
+        `file_path (str)`: The path to the file.
+        `block_size (int, optional)`: The number of bytes read at a time. Defaults to 1,048,576.
+
+    Returns:
+        `str`: The hexadecimal checksum.
+    """
+    digest = hashlib.sha1()
+    with open(file_path, mode="rb") as file:
+        while block := file.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
 def read_json(file_path: str) -> Dict[str, str]:
     """
     Reads a `JSON` file and returns its content as a dictionary.
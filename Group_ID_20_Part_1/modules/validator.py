@@ -0,0 +1,272 @@
+import os
+import re
+import csv
+import math
+import logging as log
+import numpy as np
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from modules.data import Data
+from modules.schema import Schema, Table
+
+INT_RANGE = (-2 ** 31, 2 ** 31 - 1)
+
+# The formats of the `DATETIME` and `TIME` values of the splitted datasets, and the ISO ones.
+DATETIME_FORMATS = ("%m/%d/%Y %I:%M:%S %p", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d")
+TIME_FORMATS = ("%H:%M:%S", "%I:%M:%S %p", "%H:%M")
+
+# The first year of the `SQL Server` `DATETIME` range.
+MIN_DATETIME_YEAR = 1753
+
+def _is_int(value: Any) -> bool:
+    # Integers written as floats (e.g. "1.0") are accepted, as long as they have no fractional part.
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return False
+    return number.is_integer() and INT_RANGE[0] <= number <= INT_RANGE[1]
+
+def _is_float(value: Any) -> bool:
+    try:
+        return math.isfinite(float(value))
+    except (TypeError, ValueError):
+        return False
+
+def _parses(value: Any, formats: Tuple[str, ...], minimum_year: int = 1) -> bool:
+    for date_format in formats:
+        try:
+            return datetime.strptime(str(value).strip(), date_format).year >= minimum_year
+        except ValueError:
+            continue
+    return False
+
+def _is_datetime(value: Any) -> bool:
+    return _parses(value, DATETIME_FORMATS, MIN_DATETIME_YEAR)
+
+def _is_time(value: Any) -> bool:
+    return _parses(value, TIME_FORMATS)
+
+def _per_distinct(check: Callable[[Any], bool]) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Vectorizes a check of a single value, running it once per distinct value of a column.
+
+    Args:
+        `check (Callable[[Any], bool])`: The check of a single value.
+
+    Returns:
+        `Callable[[np.ndarray], np.ndarray]`: The check of a column, returning whether each of its values passes it.
+    """
+    def vectorized(values: np.ndarray) -> np.ndarray:
+        distinct, inverse = np.unique(values, return_inverse=True)
+        return np.fromiter(map(check, distinct), dtype=bool, count=len(distinct))[inverse]
+
+    return vectorized
+
+class Validator:
+    """
+    A class for validating datasets against the constraints of the schema before loading them.
+
+    Each column of a table gets its checks compiled once from the `CREATE TABLE` definition: not null,
+    maximum length of `NCHAR(n)`/`NVARCHAR(n)` values, `INT`, `FLOAT`, `DATETIME` and `TIME` conversions.
+    The checks run on whole columns: null and length checks as array operations, conversions once per
+    distinct value of the column (the dates and codes of the datasets repeat a lot), and the coverage of
+    the foreign keys by the keys of the tables validated earlier as a single membership test. Only the
+    uniqueness of the primary and unique keys is checked row by row, with a set lookup, the first valid
+    occurrence of a key being kept. Offending rows are removed from the dataset and, if requested,
+    written to a quarantine file along with their violations.
+
+    Attributes:
+        `schema (Schema)`: The schema of the tables.
+        `keys (Dict[str, Set[str]])`: The primary key values of the valid rows of each validated table.
+        `violations (Dict[str, Counter])`: The number of violations of each table, per column and check.
+        `quarantined (Dict[str, int])`: The number of rows removed from each table.
+        `unique_values (Dict[Tuple[str, str], Set[str]])`: The values of the unique columns of the valid rows, per table and column.
+    """
+
+    def __init__(self, schema: Schema) -> None:
+        """
+        Initializes a Validator object.
+
+        Args:
+            `schema (Schema)`: The schema of the tables.
+        """
+        self.schema = schema
+        self.keys: Dict[str, Set[str]] = {}
+        self.violations: Dict[str, Counter] = {}
+        self.quarantined: Dict[str, int] = {}
+        self.unique_values: Dict[Tuple[str, str], Set[str]] = {}
+
+    @staticmethod
+    def _column_checks(column_type: str) -> List[Tuple[str, Callable[[Any], bool]]]:
+        """
+        Compiles the checks of a column from its definition.
+
+        Args:
+            `column_type (str)`: The `SQL` type of the column.
+
+        Returns:
+            `List[Tuple[str, Callable[[np.ndarray], np.ndarray]]]`: The name of each check and a function returning
+                whether each value of a column of non-empty strings passes it.
+        """
+        checks = []
+        length = re.fullmatch(r"N?(?:VAR)?CHAR\s*\(\s*(\d+)\s*\)", column_type, re.IGNORECASE)
+        conversions = {"INT": _is_int, "FLOAT": _is_float, "DATETIME": _is_datetime, "TIME": _is_time}
+        if length:
+            maximum = int(length.group(1))
+            checks.append(("length", lambda values: np.fromiter(map(len, values), dtype=np.int64, count=len(values)) <= maximum))
+        elif column_type.upper() in conversions:
+            checks.append(("type", _per_distinct(conversions[column_type.upper()])))
+        return checks
+
+    def _fieldnames(self, table: Table, data: Data) -> Dict[str, str]:
+        """
+        Maps the columns of a table to the fields of a dataset, ignoring case.
+
+        Raises:
+            `KeyError`: If a column of the table is missing from the dataset.
+        """
+        fields = {field.lower(): field for field in data.fieldnames}
+        missing = [column for column, _, _ in table.columns if column.lower() not in fields]
+        if missing:
+            raise KeyError(f"Columns {', '.join(missing)} of `{table.name}` are not present in the dataset.")
+        return {column: fields[column.lower()] for column, _, _ in table.columns}
+
+    def validate(self, table_name: str, data: Data, quarantine_file: str = None) -> int:
+        """
+        Validates a dataset against the constraints of a table, removing the offending rows.
+
+        Tables referenced by foreign keys must be validated first. A table can be validated in
+        several datasets (e.g. the partitions of a fact table): uniqueness is checked across all of them.
+
+        Args:
+            `table_name (str)`: The name of the table.
+            `data (Data)`: The dataset to validate.
+            `quarantine_file (str, optional)`: The path to the `CSV` file the offending rows are appended to,
+                with a `VIOLATIONS` column listing the failed checks. Defaults to None.
+
+        Returns:
+            `int`: The number of offending rows.
+
+        Raises:
+            `KeyError`: If the table is not part of the schema, a column is missing from the dataset,
+                or a referenced table has not been validated yet.
+        """
+        table = self.schema.tables.get(table_name)
+        if table is None:
+            raise KeyError(f"Table `{table_name}` is not part of the schema.")
+        fields = self._fieldnames(table, data)
+
+        column_checks = [
+            (fields[column], not nullable, self._column_checks(column_type))
+            for column, column_type, nullable in table.columns
+        ]
+        if table.primary_key:
+            self.unique_values[(table_name, table.primary_key)] = self.keys.setdefault(table_name, set())
+        unique_checks = [
+            (fields[column], self.unique_values.setdefault((table_name, column), set()))
+            for column in ([table.primary_key] if table.primary_key else []) + table.unique
+        ]
+        foreign_checks = []
+        for column, reference, _, _ in table.foreign_keys:
+            if reference not in self.keys:
+                raise KeyError(f"Table `{reference}`, referenced by `{table_name}`, has not been validated yet.")
+            foreign_checks.append((fields[column], self.keys[reference]))
+
+        rows = data.rows
+
+        def column(field: str) -> np.ndarray:
+            values = np.empty(len(rows), dtype=object)
+            values[:] = ["" if row.get(field) is None else str(row.get(field)) for row in rows]
+            return values
+
+        failures: List[Tuple[str, np.ndarray]] = []
+        for field, required, checks in column_checks:
+            values = column(field)
+            empty = values == ""
+            if required:
+                failures.append((f"{field}:null", empty))
+            filled = np.flatnonzero(~empty)
+            for name, check in checks:
+                failed = np.zeros(len(rows), dtype=bool)
+                failed[filled] = ~check(values[filled])
+                failures.append((f"{field}:{name}", failed))
+        orphans = []
+        for field, keys in foreign_checks:
+            values = column(field)
+            orphans.append((f"{field}:orphan", (values != "") & ~np.isin(values, np.array(list(keys), dtype=object))))
+
+        invalid = np.zeros(len(rows), dtype=bool)
+        for _, failed in failures + orphans:
+            invalid |= failed
+        duplicates = [(f"{field}:duplicate", np.zeros(len(rows), dtype=bool)) for field, _ in unique_checks]
+        for position, row in enumerate(rows):
+            duplicate = False
+            for (field, seen), (_, failed) in zip(unique_checks, duplicates):
+                if str(row.get(field)) in seen:
+                    failed[position] = duplicate = True
+            if not duplicate and not invalid[position]:
+                for field, seen in unique_checks:
+                    seen.add(str(row.get(field)))
+            invalid[position] |= duplicate
+
+        counts = self.violations.setdefault(table_name, Counter())
+        checked = [(label, failed) for label, failed in failures + duplicates + orphans if failed.any()]
+        counts.update({label: int(failed.sum()) for label, failed in checked})
+        offending = [
+            (rows[position], [label for label, failed in checked if failed[position]])
+            for position in np.flatnonzero(invalid)
+        ]
+
+        if offending:
+            data.rows = [rows[position] for position in np.flatnonzero(~invalid)]
+            self.quarantined[table_name] = self.quarantined.get(table_name, 0) + len(offending)
+            if quarantine_file:
+                self._quarantine(quarantine_file, data.fieldnames, offending)
+        return len(offending)
+
+    @staticmethod
+    def _quarantine(quarantine_file: str, fieldnames: List[str], offending: List[Tuple[Dict[str, Any], List[str]]]) -> None:
+        """
+        Appends offending rows to a quarantine file, writing the header if the file is new.
+
+        Raises:
+            `IOError`: If an error occurs while writing to the file.
+        """
+        os.makedirs(os.path.dirname(quarantine_file) or ".", exist_ok=True)
+        new = not os.path.exists(quarantine_file)
+        try:
+            with open(quarantine_file, mode="a", newline="", encoding="utf-8") as file:
+                writer = csv.DictWriter(file, fieldnames=fieldnames + ["VIOLATIONS"], extrasaction="ignore")
+                if new:
+                    writer.writeheader()
+                for row, failed in offending:
+                    writer.writerow({**row, "VIOLATIONS": ";".join(failed)})
+        except IOError as e:
+            raise IOError(f"Error writing to file {quarantine_file}: {e}") from e
+
+    def report(self) -> str:
+        """
+        Summarizes the violations found so far.
+
+        Returns:
+            `str`: One line per table with offending rows, listing the number of violations per column and check.
+        """
+        lines = []
+        for table_name, counts in self.violations.items():
+            if not counts:
+                continue
+            details = ", ".join(f"{label} x{count}" for label, count in counts.most_common())
+            lines.append(f"`{table_name}`: {self.quarantined.get(table_name, 0)} rows quarantined ({details})")
+        return "\n".join(lines)
+
+    def log_report(self) -> None:
+        """
+        Logs the summary of the violations, or that every dataset is valid.
+        """
+        report = self.report()
+        if report:
+            log.warning(f"Constraint violations found:\n{report}")
+        else:
+            log.info("All datasets satisfy the constraints of the schema.")
@@ -0,0 +1,199 @@
+import numpy as np
+from typing import Any, List, Optional, Tuple
+
+from modules.data import Data
+
+class Window:
+    """
+    A class computing window functions over the rows of a sorted group-by result, e.g. the output of `Cube.query`.
+
+    The rows are split once into partitions, the runs of consecutive rows sharing the values of the
+    `partition_by` columns, so the rows must be sorted by them first, as query results are. Every function
+    then reads its column once, computes the new column with array operations over the partitions and adds
+    it to the rows, so that these measures cost no more than the aggregation itself.
+
+    Example:
+        `Window(cube.query(["Location.LOCATION_POINT", "Date.CRASH_YEAR"], ["DAMAGE_COST"]), ["LOCATION_POINT"]).change("DAMAGE_COST", by="CRASH_YEAR")`
+        computes the year-over-year change of the damage costs of every location, as in `assignment_4.mdx`.
+
+    Attributes:
+        `data (Data)`: The rows, completed in place with the computed columns.
+        `partition_by (List[str])`: The partitioning columns.
+        `starts (np.ndarray)`: The position of the first row of every partition.
+        `partitions (np.ndarray)`: The partition of every row.
+    """
+
+    def __init__(self, data: Data, partition_by: Optional[List[str]] = None) -> None:
+        """
+        Initializes a Window object.
+
+        Args:
+            `data (Data)`: The rows, sorted by the partitioning columns.
+            `partition_by (Optional[List[str]])`: The partitioning columns. Defaults to None (a single partition).
+        """
+        self.data = data
+        self.partition_by = partition_by or []
+        keys = [tuple(row[column] for column in self.partition_by) for row in data.rows]
+        new = np.array([index == 0 or key != keys[index - 1] for index, key in enumerate(keys)], dtype=bool)
+        self.starts = np.flatnonzero(new)
+        self.partitions = np.cumsum(new) - 1
+
+    def _column(self, column: str) -> np.ndarray:
+        """
+        Reads a numeric column of the rows.
+
+        Raises:
+            `KeyError`: If the column is not present.
+        """
+        if column not in self.data.fieldnames:
+            raise KeyError(f"The column '{column}' is not present in the dataset.")
+        return np.array([row[column] for row in self.data.rows], dtype=float)
+
+    def _add(self, name: str, values: np.ndarray, present: Optional[np.ndarray] = None, default: Any = None) -> "Window":
+        """
+        Adds a column to the rows, with `default` where `present` is False.
+        """
+        if name not in self.data.fieldnames:
+            self.data.fieldnames = self.data.fieldnames + [name]
+        values = values.tolist()
+        flags = present.tolist() if present is not None else None
+        for index, row in enumerate(self.data.rows):
+            row[name] = values[index] if flags is None or flags[index] else default
+        return self
+
+    def _shifted(self, offset: int, by: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds, for every row, the row `offset` positions before it in its partition (after it if negative),
+        or the row whose `by` member is `offset` less than its own.
+
+        Returns:
+            `Tuple[np.ndarray, np.ndarray]`: The position of that row, and whether it exists.
+        """
+        positions = np.arange(len(self.data.rows))
+        if not len(positions):
+            return positions, np.zeros(0, dtype=bool)
+        if by is None:
+            source = positions - offset
+            valid = (source >= 0) & (source < len(positions))
+            source = np.clip(source, 0, len(positions) - 1)
+            return source, valid & (self.partitions[source] == self.partitions)
+
+        members = self._column(by)
+        members = members - members.min()
+        codes = self.partitions * (members.max() + abs(offset) + 1) + members
+        wanted = codes - offset
+        source = np.clip(np.searchsorted(codes, wanted), 0, len(codes) - 1)
+        return source, codes[source] == wanted
+
+    def lag(self, column: str, offset: int = 1, name: Optional[str] = None, by: Optional[str] = None, default: Any = None) -> "Window":
+        """
+        Adds the value of a column `offset` rows before, within the partition, as `LAG` does.
+
+        Args:
+            `column (str)`: The column.
+            `offset (int, optional)`: The number of rows. Defaults to 1.
+            `name (Optional[str])`: The name of the new column. Defaults to None (`<column>_LAG`).
+            `by (Optional[str])`: A numeric column whose members are followed instead of the rows (e.g. `CRASH_YEAR`,
+                so that the value of 2014 is not used as the previous one of 2016). Must be the last sort key. Defaults to None.
+            `default (Any, optional)`: The value when there is no such row. Defaults to None.
+
+        Returns:
+            `Window`: The window, for chaining.
+        """
+        values = self._column(column)
+        source, present = self._shifted(offset, by)
+        return self._add(name or f"{column}_LAG", values[source], present, default)
+
+    def lead(self, column: str, offset: int = 1, name: Optional[str] = None, by: Optional[str] = None, default: Any = None) -> "Window":
+        """
+        Adds the value of a column `offset` rows after, within the partition, as `LEAD` does.
+
+        Args:
+            `column (str)`: The column.
+            `offset (int, optional)`: The number of rows. Defaults to 1.
+            `name (Optional[str])`: The name of the new column. Defaults to None (`<column>_LEAD`).
+            `by (Optional[str])`: A numeric column whose members are followed instead of the rows, as in `lag`. Defaults to None.
+            `default (Any, optional)`: The value when there is no such row. Defaults to None.
+
+        Returns:
+            `Window`: The window, for chaining.
+        """
+        values = self._column(column)
+        source, present = self._shifted(-offset, by)
+        return self._add(name or f"{column}_LEAD", values[source], present, default)
+
+    def change(self, column: str, offset: int = 1, name: Optional[str] = None, by: Optional[str] = None) -> "Window":
+        """
+        Adds the percentage change of a column from its value `offset` rows (or members) before,
+        or 0 when there is none, as the `Damage Cost Change` measure of `assignment_4.mdx`.
+
+        Args:
+            `column (str)`: The column.
+            `offset (int, optional)`: The number of rows. Defaults to 1.
+            `name (Optional[str])`: The name of the new column. Defaults to None (`<column>_CHANGE`).
+            `by (Optional[str])`: A numeric column whose members are followed instead of the rows, as in `lag`. Defaults to None.
+
+        Returns:
+            `Window`: The window, for chaining.
+        """
+        values = self._column(column)
+        source, present = self._shifted(offset, by)
+        previous = values[source]
+        present = present & (previous != 0)
+        changes = np.divide(values - previous, previous, out=np.zeros_like(values), where=present) * 100
+        return self._add(name or f"{column}_CHANGE", changes)
+
+    def running_total(self, column: str, name: Optional[str] = None) -> "Window":
+        """
+        Adds the cumulative sum of a column within the partition.
+
+        Args:
+            `column (str)`: The column.
+            `name (Optional[str])`: The name of the new column. Defaults to None (`<column>_RUNNING`).
+
+        Returns:
+            `Window`: The window, for chaining.
+        """
+        totals = np.cumsum(self._column(column))
+        before = np.concatenate(([0.0], totals))[self.starts][self.partitions] if len(totals) else totals
+        return self._add(name or f"{column}_RUNNING", totals - before)
+
+    def percent_of_parent(self, column: str, name: Optional[str] = None) -> "Window":
+        """
+        Adds the share of a column in the total of the partition, as a percentage.
+
+        Args:
+            `column (str)`: The column.
+            `name (Optional[str])`: The name of the new column. Defaults to None (`<column>_PERCENT`).
+
+        Returns:
+            `Window`: The window, for chaining.
+        """
+        values = self._column(column)
+        totals = np.add.reduceat(values, self.starts)[self.partitions] if len(values) else values
+        shares = np.divide(values, totals, out=np.zeros_like(values), where=totals != 0) * 100
+        return self._add(name or f"{column}_PERCENT", shares)
+
+    def rank(self, column: str, name: Optional[str] = None, descending: bool = True) -> "Window":
+        """
+        Adds the rank of a column within the partition, equal values sharing the same rank, as `RANK` does.
+
+        Args:
+            `column (str)`: The column.
+            `name (Optional[str])`: The name of the new column. Defaults to None (`<column>_RANK`).
+            `descending (bool, optional)`: Whether the highest value ranks first. Defaults to True.
+
+        Returns:
+            `Window`: The window, for chaining.
+        """
+        values = self._column(column)
+        keys = -values if descending else values
+        order = np.lexsort((keys, self.partitions))
+        ordered, partitions = keys[order], self.partitions[order]
+        new = np.ones(len(order), dtype=bool)
+        new[1:] = (ordered[1:] != ordered[:-1]) | (partitions[1:] != partitions[:-1])
+        positions = np.arange(len(order))
+        first = np.maximum.accumulate(np.where(new, positions, 0))
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = first - self.starts[partitions] + 1
+        return self._add(name or f"{column}_RANK", ranks)
@@ -0,0 +1,162 @@
+import os
+import sys
+import asyncio
+import random
+import geohash
+import pytest
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.data import Data
+from modules.sqlite import SQLiteDatabase
+
+SEASONS = {12: "WINTER", 1: "WINTER", 2: "WINTER", 3: "SPRING", 4: "SPRING", 5: "SPRING",
+           6: "SUMMER", 7: "SUMMER", 8: "SUMMER", 9: "AUTUMN", 10: "AUTUMN", 11: "AUTUMN"}
+
+WEATHER = ["CLEAR", "RAIN", "SNOW", "FOG", ""]
+
+VEHICLE_TYPES = ["PASSENGER", "TRUCK", "BUS", "MOTORCYCLE"]
+
+def make_data(rows: List[Dict[str, Any]]) -> Data:
+    """
+    Builds a dataset from rows, without reading any file.
+    """
+    data = Data()
+    data.fieldnames = list(rows[0]) if rows else []
+    data.rows = rows
+    return data
+
+def with_database(path: str, work: Callable[[SQLiteDatabase], Awaitable[Any]], pool_size: int = 1) -> Any:
+    """
+    Runs `work` on a connected `SQLite` database file and returns its result.
+    """
+    async def run() -> Any:
+        database = SQLiteDatabase(str(path), pool_size=pool_size)
+        await database.connect()
+        try:
+            return await work(database)
+        finally:
+            await database.disconnect()
+
+    return asyncio.run(run())
+
+def make_star(seed: int = 20, facts: int = 600) -> Tuple[List[Dict[str, str]], Dict[str, Data]]:
+    """
+    Builds a small random star schema shaped like the splitted files: string cells, a few points
+    sharing their geohash prefixes, and a few facts referencing missing members.
+
+    Returns:
+        `Tuple[List[Dict[str, str]], Dict[str, Data]]`: The fact rows, and the dimension tables by dimension name.
+    """
+    generator = random.Random(seed)
+    dates = [
+        {"DATE_ID": f"DT_{index:06d}", "CRASH_YEAR": str(year), "CRASH_MONTH": str(month), "CRASH_DAY": str(day),
+         "CRASH_HOUR": f"{generator.randrange(1, 13):02d}:00:00", "CRASH_SEASON": SEASONS[month]}
+        for index, (year, month, day) in enumerate(
+            (year, month, day) for year in (2014, 2015, 2016) for month in range(1, 13) for day in (1, 15)
+        )
+    ]
+    centers = [(41.88, -87.63), (41.79, -87.60), (41.95, -87.70)]
+    locations = []
+    for index in range(60):
+        latitude, longitude = generator.choice(centers)
+        point = geohash.encode(latitude + generator.uniform(-0.03, 0.03), longitude + generator.uniform(-0.03, 0.03), 12)
+        locations.append({"LOCATION_ID": f"LOC_{index:06d}", "LOCATION_POINT": point,
+                          "BEAT_OF_OCCURRENCE": str(generator.randrange(100, 120)), "STREET_NAME": f"STREET {index % 7}"})
+    # Two locations at the same point, aggregated together by the geo index.
+    locations[1]["LOCATION_POINT"] = locations[0]["LOCATION_POINT"]
+    crashes = [{"CRASH_ID": f"CRS_{index:06d}", "WEATHER_CONDITION": generator.choice(WEATHER)} for index in range(150)]
+    injuries = [{"INJURY_ID": f"INJ_{index:06d}", "MOST_SEVERE_INJURY": generator.choice(["NONE", "FATAL"])} for index in range(5)]
+    people = [{"PERSON_ID": f"PER_{index:06d}", "SEX": generator.choice(["M", "F"])} for index in range(80)]
+    vehicles = [{"VEHICLE_ID": f"VEH_{index:06d}", "VEHICLE_TYPE": generator.choice(VEHICLE_TYPES),
+                 "MAKE": generator.choice(["FORD", "TOYOTA"]), "MODEL": generator.choice(["A", "B", "C"])} for index in range(70)]
+
+    # Every crash happens at one date and location.
+    crash_places = {crash["CRASH_ID"]: (generator.choice(dates)["DATE_ID"], generator.choice(locations)["LOCATION_ID"]) for crash in crashes}
+    rows = []
+    for index in range(facts):
+        crash_id = generator.choice(crashes)["CRASH_ID"]
+        date_id, location_id = crash_places[crash_id]
+        rows.append({
+            "CRASH_ID": crash_id, "DATE_ID": date_id, "LOCATION_ID": location_id,
+            "INJURY_ID": generator.choice(injuries)["INJURY_ID"], "PERSON_ID": generator.choice(people)["PERSON_ID"],
+            "VEHICLE_ID": generator.choice(vehicles)["VEHICLE_ID"],
+            "DAMAGE_COST": str(generator.choice([250, 500.5, 1500, 0])) if index % 37 else "",
+            "NUM_UNITS": str(generator.randrange(1, 4)),
+        })
+    rows[5]["PERSON_ID"] = "PER_999999"
+    rows[9]["VEHICLE_ID"] = "VEH_999999"
+
+    dimensions = {
+        "Crash": make_data(crashes), "Date": make_data(dates), "Location": make_data(locations),
+        "Injury": make_data(injuries), "Person": make_data(people), "Vehicle": make_data(vehicles),
+    }
+    return rows, dimensions
+
+def join(facts: List[Dict[str, str]], dimensions: Dict[str, Data]) -> List[Dict[str, Dict[str, str]]]:
+    """
+    Joins every fact to its members, dropping the facts referencing a missing member, one dictionary per dimension.
+    """
+    keys = {"Crash": "CRASH_ID", "Date": "DATE_ID", "Location": "LOCATION_ID", "Injury": "INJURY_ID", "Person": "PERSON_ID", "Vehicle": "VEHICLE_ID"}
+    members = {name: {row[key]: row for row in dimensions[name].rows} for name, key in keys.items()}
+    joined = []
+    for fact in facts:
+        row = {name: members[name].get(fact[key]) for name, key in keys.items()}
+        if all(member is not None for member in row.values()):
+            row["FACT"] = fact
+            joined.append(row)
+    return joined
+
+def value(row: Dict[str, Dict[str, str]], level: str) -> str:
+    """
+    Returns the member of a level for a joined fact, as a string.
+    """
+    dimension, _, attribute = level.partition(".")
+    if level == "Location.GEOHASH":
+        return row["Location"]["LOCATION_POINT"][:5]
+    return row[dimension][attribute]
+
+def brute_query(joined: List[Dict[str, Dict[str, str]]], rows: List[str], where: Optional[Dict[str, List[str]]] = None) -> Dict[Tuple, Dict[str, float]]:
+    """
+    Aggregates the measures of the cube with plain loops, keyed by the members of the row levels as strings.
+    """
+    groups = defaultdict(lambda: {"DAMAGE_COST": 0.0, "NUM_UNITS": 0.0, "NUM_FACTS": 0, "CRASHES": set()})
+    for row in joined:
+        if any(value(row, level) not in members for level, members in (where or {}).items()):
+            continue
+        group = groups[tuple(value(row, level) for level in rows)]
+        group["DAMAGE_COST"] += float(row["FACT"]["DAMAGE_COST"] or 0)
+        group["NUM_UNITS"] += float(row["FACT"]["NUM_UNITS"] or 0)
+        group["NUM_FACTS"] += 1
+        group["CRASHES"].add(row["FACT"]["CRASH_ID"])
+    return {
+        key: {"DAMAGE_COST": group["DAMAGE_COST"], "NUM_UNITS": group["NUM_UNITS"], "NUM_FACTS": group["NUM_FACTS"], "NUM_CRASHES": len(group["CRASHES"])}
+        for key, group in groups.items()
+    }
+
+def by_members(result: Data, rows: List[str]) -> Dict[Tuple, Dict[str, Any]]:
+    """
+    Keys the rows of a query result by the members of the row levels as strings.
+    """
+    attributes = [level.partition(".")[2] for level in rows]
+    return {tuple(str(row[attribute]) for attribute in attributes): row for row in result.rows}
+
+def assert_same(result: Data, expected: Dict[Tuple, Dict[str, float]], rows: List[str], measures: List[str]) -> None:
+    """
+    Checks a query result against brute-force aggregates.
+    """
+    actual = by_members(result, rows)
+    assert set(actual) == set(expected)
+    for key, totals in expected.items():
+        for measure in measures:
+            assert actual[key][measure] == pytest.approx(totals[measure]), (key, measure)
+
+@pytest.fixture
+def star() -> Tuple[List[Dict[str, str]], Dict[str, Data]]:
+    return make_star()
+
+@pytest.fixture
+def joined(star) -> List[Dict[str, Dict[str, str]]]:
+    return join(*star)
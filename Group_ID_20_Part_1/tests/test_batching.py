@@ -0,0 +1,43 @@
+import json
+import pytest
+
+from modules.batching import BatchTuner, Checkpoints
+
+def test_tuner_grows_while_the_throughput_improves():
+    tuner = BatchTuner(1000, minimum=100, maximum=3000, factor=2)
+    assert [tuner.update(rows, 0.1) for rows in (1000, 2000, 3000, 3000)] == [2000, 3000, 3000, 3000]
+    # Throughput dropping reverses the direction.
+    assert tuner.update(3000, 1.0) == 1500
+    assert tuner.update(1500, 0.2) == 750
+
+def test_tuner_shrinks_slow_batches_within_bounds():
+    tuner = BatchTuner(50000, minimum=500, maximum=200000, target_latency=1.0)
+    sizes = [tuner.update(tuner.size, 5.0) for _ in range(30)]
+    assert sizes == sorted(sizes, reverse=True)
+    assert sizes[-1] == 500
+    assert BatchTuner(10, minimum=500).size == 500
+
+def test_checkpoints_persist_and_reset(tmp_path):
+    file_path = tmp_path / "checkpoints.json"
+    checkpoints = Checkpoints(str(file_path))
+    checkpoints.save("damage", 1000)
+    checkpoints.save("damage.2000", 2500)
+    checkpoints.reset("damage")
+    assert Checkpoints(str(file_path)).offsets == {"damage.2000": 2500}
+    assert Checkpoints(str(file_path)).get("damage") == 0
+    assert [path.name for path in tmp_path.iterdir()] == ["checkpoints.json"]
+
+def test_interrupted_save_keeps_the_committed_offsets(tmp_path, monkeypatch):
+    file_path = tmp_path / "checkpoints.json"
+    checkpoints = Checkpoints(str(file_path))
+    checkpoints.save("damage", 1000)
+
+    def interrupted(offsets, file, **kwargs):
+        file.write('{"damage": ')
+        raise IOError("No space left on device")
+
+    monkeypatch.setattr(json, "dump", interrupted)
+    with pytest.raises(IOError):
+        checkpoints.save("damage", 2000)
+    monkeypatch.undo()
+    assert Checkpoints(str(file_path)).get("damage") == 1000
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from modules.cube import Cube
+from modules.bitmap import Bitmap, BitmapIndex, ARRAY_LIMIT, CHUNK_SIZE
+from conftest import value
+
+def positions(generator, size, dense):
+    """
+    Draws sorted distinct positions over three chunks, the first one dense enough to be stored as a bitset.
+    """
+    values = np.concatenate((
+        generator.choice(CHUNK_SIZE, dense, replace=False),
+        generator.choice(np.arange(CHUNK_SIZE, 3 * CHUNK_SIZE), size, replace=False),
+    ))
+    return np.unique(values)
+
+@pytest.fixture
+def pair():
+    generator = np.random.default_rng(41)
+    return positions(generator, 3000, 2 * ARRAY_LIMIT), positions(generator, 500, ARRAY_LIMIT // 2)
+
+def test_round_trip(pair):
+    for values in pair:
+        bitmap = Bitmap.from_positions(values)
+        assert len(bitmap) == len(values)
+        assert np.array_equal(bitmap.to_positions(), values)
+        assert np.array_equal(np.flatnonzero(bitmap.to_mask(3 * CHUNK_SIZE)), values)
+
+def test_operations_match_sets(pair):
+    left, right = (Bitmap.from_positions(values) for values in pair)
+    expected_and = sorted(set(pair[0].tolist()) & set(pair[1].tolist()))
+    expected_or = sorted(set(pair[0].tolist()) | set(pair[1].tolist()))
+    assert (left & right).to_positions().tolist() == expected_and
+    assert (left | right).to_positions().tolist() == expected_or
+    assert Bitmap.intersection([left, right]).to_positions().tolist() == expected_and
+    assert Bitmap.union([left, right]).to_positions().tolist() == expected_or
+    assert len(left & Bitmap.from_positions(np.array([], dtype=np.int64))) == 0
+
+def test_index_selects_the_members():
+    generator = np.random.default_rng(7)
+    codes = generator.integers(0, 6, 200000)
+    index = BitmapIndex(codes, 6)
+    for members in ([0], [2, 5], [], [0, 1, 2, 3, 4, 5]):
+        assert np.array_equal(index.select(members).to_positions(), np.flatnonzero(np.isin(codes, members)))
+
+def test_indexed_slices_match_scans(star, joined):
+    cube = Cube.from_data(*star)
+    where = {"Date.CRASH_SEASON": ["SUMMER", "WINTER"], "Crash.WEATHER_CONDITION": ["", "FOG"], "Vehicle.VEHICLE_TYPE": "TRUCK"}
+    expected = np.array([all(value(row, level) in np.atleast_1d(members) for level, members in where.items()) for row in joined])
+    scanned = cube.mask(where)
+
+    cube.index(["Date.CRASH_SEASON", "Crash.WEATHER_CONDITION"])
+    with pytest.raises(KeyError):
+        cube.select(where)
+    selected = cube.select({level: where[level] for level in cube.indexes})
+    indexed = np.array([all(value(row, level) in where[level] for level in cube.indexes) for row in joined])
+
+    assert np.array_equal(scanned, expected)
+    assert np.array_equal(selected.to_positions(), np.flatnonzero(indexed))
+    assert np.array_equal(cube.mask(where), expected)
+
+def test_indexed_totals_match_scans(star, joined):
+    cube = Cube.from_data(*star)
+    where = {"Date.CRASH_YEAR": ["2014", "2016"], "Crash.WEATHER_CONDITION": "CLEAR"}
+    expected = cube.total("DAMAGE_COST", where)
+    cube.index(list(where))
+    assert cube.total("DAMAGE_COST", where) == pytest.approx(expected)
+    assert expected == pytest.approx(sum(
+        float(row["FACT"]["DAMAGE_COST"] or 0) for row in joined
+        if value(row, "Date.CRASH_YEAR") in ("2014", "2016") and value(row, "Crash.WEATHER_CONDITION") == "CLEAR"
+    ))
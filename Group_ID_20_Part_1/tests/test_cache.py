@@ -0,0 +1,100 @@
+import os
+import csv
+import asyncio
+
+from modules.cube import Cube
+from modules.cache import DataVersion, ResultCache
+from modules.columnar import ColumnarTable
+from modules.utils import get_paths
+
+def test_keys_are_normalized():
+    assert ResultCache.key({"rows": ["A"], "where": {"B": {2, 1}, "C": "x"}}) == ResultCache.key({"where": {"C": "x", "B": {1, 2}}, "rows": ["A"]})
+    assert ResultCache.key({"rows": ["A", "B"]}) != ResultCache.key({"rows": ["B", "A"]})
+
+def test_entries_are_versioned_copies(tmp_path):
+    cache = ResultCache(max_entries=2, file_path=str(tmp_path / "cache.pkl"))
+    cache.put({"query": 1}, "v1", {"rows": [1]})
+    found, result = cache.get({"query": 1}, "v1")
+    result["rows"].append(2)
+    assert found and cache.get({"query": 1}, "v1") == (True, {"rows": [1]})
+
+    assert cache.get({"query": 1}, "v2") == (False, None)
+    assert len(cache) == 0
+
+    for query in range(3):
+        cache.put({"query": query}, "v2", query)
+    assert [cache.get({"query": query}, "v2")[0] for query in range(3)] == [False, True, True]
+    assert len(ResultCache(max_entries=2, file_path=str(tmp_path / "cache.pkl"))) == 2
+    assert cache.prune("v3") == 2 and len(cache) == 0
+
+def test_cached_queries_are_keyed_on_the_version(star):
+    cube = Cube.from_data(*star)
+    cube.cache, cube.version = ResultCache(), "v1"
+    first = cube.query(["Date.CRASH_YEAR"], ["NUM_FACTS"], {"Crash.WEATHER_CONDITION": ["SNOW", "RAIN"]})
+    first.rows[0]["NUM_FACTS"] = -1
+    second = cube.query(["Date.CRASH_YEAR"], ["NUM_FACTS"], {"Crash.WEATHER_CONDITION": ["RAIN", "SNOW"]})
+    assert (cube.cache.hits, cube.cache.misses) == (1, 1)
+    assert second.rows[0]["NUM_FACTS"] != -1
+
+    cube.version = "v2"
+    cube.query(["Date.CRASH_YEAR"], ["NUM_FACTS"], {"Crash.WEATHER_CONDITION": ["RAIN", "SNOW"]})
+    assert (cube.cache.hits, cube.cache.misses) == (1, 2)
+
+def test_versions(tmp_path):
+    source = tmp_path / "damage.csv"
+    source.write_text("facts")
+    version = DataVersion(str(tmp_path / "version.json"), [str(source)])
+    fingerprint = version.current()
+    assert fingerprint == DataVersion.fingerprint([str(source)])
+    published = version.publish()
+    assert version.current() == published != fingerprint
+    version.invalidate()
+    assert version.current() == fingerprint
+    assert DataVersion(str(tmp_path / "version.json")).current() is None
+
+def write_splitted(root_path, star):
+    """
+    Writes the star schema as the splitted files, with the columnar copy of the facts.
+    """
+    facts, dimensions = star
+    paths = get_paths(root_path, "splitted")
+    os.makedirs(paths["COLUMNAR"])
+    for name, (dataset_key, _) in Cube.DIMENSIONS.items():
+        with open(paths[dataset_key], mode="w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, dimensions[name].fieldnames)
+            writer.writeheader()
+            writer.writerows(dimensions[name].rows)
+    with open(paths["DAMAGE"], mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, list(facts[0]))
+        writer.writeheader()
+        writer.writerows(facts)
+
+    years = {row["DATE_ID"]: row["CRASH_YEAR"] for row in dimensions["Date"].rows}
+
+    async def batches():
+        for start in range(0, len(facts), 100):
+            yield facts[start:start + 100]
+
+    asyncio.run(ColumnarTable.write(
+        os.path.join(paths["COLUMNAR"], "damage"), batches(), list(facts[0]),
+        {"CRASH_YEAR": lambda row: years[row["DATE_ID"]]}, sources=[paths["DAMAGE"]]
+    ))
+    return paths
+
+def test_filtered_cubes_have_their_own_version(tmp_path, star):
+    paths = write_splitted(str(tmp_path), star)
+    full = asyncio.run(Cube.load(paths))
+    filtered = asyncio.run(Cube.load(paths, where={"CRASH_YEAR": (2015, 2016)}))
+    same = asyncio.run(Cube.load(paths, where={"CRASH_YEAR": (2015, 2016)}))
+    listed = asyncio.run(Cube.load(paths, where={"CRASH_YEAR": [2015, 2016]}))
+
+    assert full.version == DataVersion(paths["VERSION"], [path for key, path in paths.items() if key != "VERSION"]).current()
+    assert filtered.version != full.version
+    assert filtered.version == same.version
+    assert listed.version not in (full.version, filtered.version)
+
+    cache = ResultCache()
+    full.cache = filtered.cache = cache
+    years = full.query(["Date.CRASH_YEAR"], ["NUM_FACTS"])
+    assert filtered.query(["Date.CRASH_YEAR"], ["NUM_FACTS"]).rows == [row for row in years.rows if row["CRASH_YEAR"] >= 2015]
+    assert cache.hits == 0
@@ -0,0 +1,106 @@
+import asyncio
+import random
+import pytest
+
+from modules.columnar import ColumnarTable
+
+COLUMNS = ["CRASH_ID", "BEAT_OF_OCCURRENCE", "WEATHER_CONDITION", "DAMAGE_COST"]
+
+def make_batches():
+    """
+    Builds batches of rows sorted by year, so that most chunks hold a single year, with empty and multi-digit values.
+    """
+    generator = random.Random(13)
+    rows = [
+        {"CRASH_ID": f"CRS_{index:06d}", "BEAT_OF_OCCURRENCE": str(generator.choice([9, 10, 99, 111])),
+         "WEATHER_CONDITION": generator.choice(["CLEAR", "RAIN", "SNOW", ""]),
+         "DAMAGE_COST": str(generator.choice([250, 500.5, 1500])) if index % 11 else "", "YEAR": 2014 + index * 3 // 400}
+        for index in range(400)
+    ]
+    return [rows[start:start + 45] for start in range(0, len(rows), 45)]
+
+def read(table, columns=None, where=None):
+    async def collect():
+        return [row async for batch in table.read(columns, where) for row in batch]
+    return asyncio.run(collect())
+
+@pytest.fixture
+def source(tmp_path):
+    file_path = tmp_path / "damage.csv"
+    file_path.write_text("source")
+    return str(file_path)
+
+@pytest.fixture
+def batches():
+    return make_batches()
+
+@pytest.fixture
+def table(tmp_path, batches, source):
+    async def stream():
+        for batch in batches:
+            yield batch
+    return asyncio.run(ColumnarTable.write(
+        str(tmp_path / "damage"), stream(), COLUMNS, {"CRASH_YEAR": lambda row: row["YEAR"]}, sources=[source]
+    ))
+
+def test_reads_every_row(table, batches):
+    rows = [row for batch in batches for row in batch]
+    assert len(table) == len(rows)
+    assert read(table) == [{column: row[column] for column in COLUMNS} for row in rows]
+    assert table.skipped == 0
+
+@pytest.mark.parametrize("where", [
+    {"CRASH_YEAR": (2015, 2015)},
+    {"CRASH_YEAR": (2016, None)},
+    {"CRASH_YEAR": [2014, "2016"]},
+    {"BEAT_OF_OCCURRENCE": (10, 99)},
+    {"WEATHER_CONDITION": ["RAIN", "SNOW"], "CRASH_YEAR": (None, 2014)},
+    {"DAMAGE_COST": (500, None)},
+    {"CRASH_YEAR": 2030},
+])
+def test_predicates_match_a_filter(table, batches, where):
+    def keep(row):
+        for column, condition in where.items():
+            if column == "CRASH_YEAR":
+                values = condition if isinstance(condition, (tuple, list)) else [condition]
+                if isinstance(condition, tuple):
+                    low, high = condition
+                    if not ((low is None or row["YEAR"] >= low) and (high is None or row["YEAR"] <= high)):
+                        return False
+                elif row["YEAR"] not in [int(value) for value in values]:
+                    return False
+            elif column in ("BEAT_OF_OCCURRENCE", "DAMAGE_COST"):
+                low, high = condition
+                if row[column] == "" or not ((low is None or float(row[column]) >= low) and (high is None or float(row[column]) <= high)):
+                    return False
+            elif row[column] not in condition:
+                return False
+        return True
+
+    expected = [{column: row[column] for column in COLUMNS} for batch in batches for row in batch if keep(row)]
+    assert read(table, where=where) == expected
+    # Every chunk without a matching row is skipped when its zone map rules it out.
+    if list(where) == ["CRASH_YEAR"]:
+        assert table.skipped == sum(not any(keep(row) for row in batch) for batch in batches)
+
+def test_projection_and_missing_columns(table, batches):
+    assert read(table, ["CRASH_ID"], {"CRASH_YEAR": (2016, 2016)}) == [
+        {"CRASH_ID": row["CRASH_ID"]} for batch in batches for row in batch if row["YEAR"] == 2016
+    ]
+    with pytest.raises(KeyError):
+        read(table, ["MISSING"])
+    with pytest.raises(KeyError):
+        table.chunks({"MISSING": 1})
+
+def test_statistics(table, batches):
+    rows = [row for batch in batches for row in batch]
+    statistics = table.statistics()
+    assert statistics["BEAT_OF_OCCURRENCE"]["min"] == 9 and statistics["BEAT_OF_OCCURRENCE"]["max"] == 111
+    assert statistics["DAMAGE_COST"]["nulls"] == sum(row["DAMAGE_COST"] == "" for row in rows)
+    assert statistics["CRASH_YEAR"]["min"] == 2014 and statistics["CRASH_YEAR"]["max"] == 2016
+
+def test_is_current(table, source):
+    assert table.is_current([source])
+    with open(source, mode="a", encoding="utf-8") as file:
+        file.write(", changed")
+    assert not table.is_current([source])
@@ -0,0 +1,35 @@
+import pytest
+
+from modules.cube import Cube
+from conftest import brute_query, assert_same
+
+MEASURES = ["DAMAGE_COST", "NUM_UNITS", "NUM_CRASHES"]
+
+@pytest.fixture
+def cube(star):
+    return Cube.from_data(*star)
+
+def test_drops_facts_with_missing_members(cube, joined):
+    assert len(cube) == len(joined)
+
+@pytest.mark.parametrize("rows, where", [
+    (["Date.CRASH_YEAR"], None),
+    (["Date.CRASH_YEAR", "Date.CRASH_MONTH"], {"Crash.WEATHER_CONDITION": ["RAIN", "SNOW"]}),
+    (["Location.GEOHASH", "Vehicle.VEHICLE_TYPE"], {"Date.CRASH_YEAR": "2015"}),
+    (["Crash.WEATHER_CONDITION"], {"Date.CRASH_SEASON": ["WINTER"], "Location.BEAT_OF_OCCURRENCE": ["101", "105", "110"]}),
+    ([], {"Vehicle.MAKE": "FORD"}),
+])
+def test_query(cube, joined, rows, where):
+    expected_where = {level: members if isinstance(members, list) else [members] for level, members in (where or {}).items()}
+    assert_same(cube.query(rows, MEASURES, where), brute_query(joined, rows, expected_where), rows, MEASURES)
+
+def test_query_converts_members_to_the_labels(cube, joined):
+    # "03" is the month 3 once the months are encoded as integers.
+    result = cube.query(["Date.CRASH_YEAR"], ["DAMAGE_COST"], {"Date.CRASH_MONTH": "03"})
+    assert_same(result, brute_query(joined, ["Date.CRASH_YEAR"], {"Date.CRASH_MONTH": ["3"]}), ["Date.CRASH_YEAR"], ["DAMAGE_COST"])
+    assert cube.query(["Date.CRASH_YEAR"], ["DAMAGE_COST"], {"Date.CRASH_MONTH": 3}).rows == result.rows
+
+def test_rollup_follows_the_hierarchy(cube, joined):
+    levels = cube.levels("Date", 2)
+    assert levels == ["Date.CRASH_YEAR", "Date.CRASH_MONTH"]
+    assert_same(cube.rollup("Date", 2, MEASURES), brute_query(joined, levels), levels, MEASURES)
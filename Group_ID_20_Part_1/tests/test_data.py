@@ -0,0 +1,79 @@
+import random
+import pytest
+
+from conftest import make_data
+
+@pytest.fixture
+def data():
+    """
+    Builds crashes sharing report numbers, with empty beats.
+    """
+    generator = random.Random(4)
+    rows = [
+        {"RD_NO": f"JA{generator.randrange(40):04d}", "BEAT_OF_OCCURRENCE": generator.choice(["", "101", "105", "110"]),
+         "CRASH_DATE": f"{generator.randrange(1, 13):02d}/15/2016 0{generator.randrange(1, 10)}:30:00 PM", "POSITION": position}
+        for position in range(200)
+    ]
+    return make_data(rows)
+
+def test_create_index_groups_the_rows(data):
+    index = data.create_index("RD_NO")
+    assert data.create_index("RD_NO") is index
+    assert sorted(index.buckets) == sorted({row["RD_NO"] for row in data.rows})
+    for value, bucket in index.buckets.items():
+        assert bucket == [row for row in data.rows if row["RD_NO"] == value]
+    assert index.get("missing") == []
+
+    with pytest.raises(ValueError):
+        data.create_index("RD_NO", unique=True)
+    assert data.create_index("POSITION", unique=True).unique
+    with pytest.raises(KeyError):
+        data.create_index("MISSING")
+
+@pytest.mark.parametrize("values", [["101", "110"], ["", "missing"], []])
+def test_filter_rows_removes_the_values(data, values):
+    expected = [row for row in data.rows if row["BEAT_OF_OCCURRENCE"] not in values]
+    data.filter_rows("BEAT_OF_OCCURRENCE", values=values)
+    assert data.rows == expected
+    assert data.select_rows("BEAT_OF_OCCURRENCE", values[0] if values else "") == \
+        [row for row in expected if row["BEAT_OF_OCCURRENCE"] == (values[0] if values else "")]
+
+def test_filter_rows_evaluates_the_condition(data):
+    expected = [row for row in data.rows if row["BEAT_OF_OCCURRENCE"]]
+    data.filter_rows("BEAT_OF_OCCURRENCE")
+    assert data.rows == expected
+    data.filter_rows("BEAT_OF_OCCURRENCE", lambda beat: int(beat) > 104)
+    assert data.rows == [row for row in expected if int(row["BEAT_OF_OCCURRENCE"]) <= 104]
+
+def test_select_rows_follows_the_changes(data):
+    report = data.rows[0]["RD_NO"]
+    assert data.select_rows("RD_NO", report) == [row for row in data.rows if row["RD_NO"] == report]
+
+    data.replace_column_values("RD_NO", lambda value: value == report, "JA9999")
+    assert data.select_rows("RD_NO", report) == []
+    assert data.select_rows("RD_NO", "JA9999") == [row for row in data.rows if row["RD_NO"] == "JA9999"]
+
+    data.rows = data.rows[:10]
+    assert len(data.select_rows("BEAT_OF_OCCURRENCE", "101")) == sum(row["BEAT_OF_OCCURRENCE"] == "101" for row in data.rows)
+
+def test_added_columns_are_indexed_again(data):
+    data.split_datetime("CRASH_DATE")
+    for month in ("03", "11"):
+        assert data.select_rows("CRASH_MONTH", month) == [row for row in data.rows if row["CRASH_DATE"].startswith(month)]
+
+    assert data.select_rows("CRASH_SEASON", "OTHER") == []
+    data.remove_columns(["CRASH_SEASON"])
+    data.add_column("CRASH_SEASON", lambda row: "WINTER" if row["CRASH_MONTH"] in ("12", "01", "02") else "OTHER")
+    assert data.select_rows("CRASH_SEASON", "OTHER") == [row for row in data.rows if row["CRASH_SEASON"] == "OTHER"]
+
+def test_drop_duplicates_keeps_the_first_rows(data):
+    seen, expected = set(), []
+    for row in data.rows:
+        if row["RD_NO"] not in seen:
+            seen.add(row["RD_NO"])
+            expected.append(row)
+    data.create_index("RD_NO")
+
+    data.drop_duplicates("RD_NO")
+    assert data.rows == expected
+    assert data.create_index("RD_NO", unique=True).unique
@@ -0,0 +1,223 @@
+import asyncio
+import pytest
+
+from modules.batching import Checkpoints
+from modules.database import Database
+from modules.loader import PipelinedLoader
+from modules.sqlite import SQLiteDatabase
+from conftest import make_data, with_database
+
+COLUMNS = ["crash_id", "num_units", "damage_cost"]
+ROWS = [{"crash_id": f"CRS_{index:05d}", "num_units": str(index % 7), "damage_cost": str(index * 2.5)} for index in range(2500)]
+CAST = {"num_units": int, "damage_cost": float}
+
+def expected(rows):
+    return sorted((row["crash_id"], int(row["num_units"]), float(row["damage_cost"])) for row in rows)
+
+async def create_damage(database):
+    await database.execute_query("CREATE TABLE damage (crash_id TEXT, num_units INTEGER, damage_cost REAL)")
+
+async def fetch_damage(database):
+    return sorted(await database.fetch_query("SELECT crash_id, num_units, damage_cost FROM damage"))
+
+def test_query_to_csv_writes_the_header_of_empty_results(tmp_path):
+    async def run():
+        database = SQLiteDatabase(str(tmp_path / "test.db"))
+        await database.connect()
+        try:
+            await database.execute_query("CREATE TABLE damage (a INTEGER, b TEXT)")
+            empty = await database.query_to_csv("SELECT a, b FROM damage", str(tmp_path / "empty.csv"))
+            await database.execute_query("INSERT INTO damage VALUES (1, 'x'), (2, 'y')")
+            written = await database.query_to_csv("SELECT a, b FROM damage WHERE a > ?", str(tmp_path / "rows.csv"), (1,))
+        finally:
+            await database.disconnect()
+        return empty, written
+
+    assert asyncio.run(run()) == (0, 1)
+    assert (tmp_path / "empty.csv").read_text() == "a,b\n"
+    assert (tmp_path / "rows.csv").read_text() == "a,b\n2,y\n"
+
+@pytest.mark.parametrize("pool_size, parallel", [(1, False), (3, False), (3, True)])
+def test_data_to_db_loads_every_row(tmp_path, pool_size, parallel):
+    async def work(database):
+        await create_damage(database)
+        if parallel:
+            await database.data_to_db_parallel(make_data(ROWS), "damage", batch_size=300, cast=CAST, commit_every=1000)
+        else:
+            await database.data_to_db(make_data(ROWS), "damage", batch_size=300, cast=CAST, adaptive=True)
+        return await fetch_damage(database)
+
+    assert with_database(tmp_path / "test.db", work, pool_size) == expected(ROWS)
+
+def test_data_to_db_resumes_after_the_checkpoint(tmp_path):
+    checkpoints = Checkpoints(str(tmp_path / "checkpoints.json"))
+    checkpoints.save("damage", 1200)
+
+    async def work(database):
+        await create_damage(database)
+        await database.data_to_db(make_data(ROWS), "damage", batch_size=500, cast=CAST, commit_every=500, checkpoints=checkpoints)
+        return await fetch_damage(database)
+
+    assert with_database(tmp_path / "test.db", work) == expected(ROWS[1200:])
+    assert Checkpoints(str(tmp_path / "checkpoints.json")).get("damage") == len(ROWS)
+
+@pytest.mark.parametrize("count", [0, 5, 8, 23, 40])
+def test_insert_rows_chunks_the_statements(tmp_path, count):
+    rows = ROWS[:count]
+
+    async def work(database):
+        # 24 parameters hold 8 rows of 3 columns: 23 rows are sent as 16 + 4 + 2 + 1.
+        database.max_parameters = 24
+        await create_damage(database)
+        async with database.acquire() as connection, connection.cursor() as cursor:
+            await database.insert_rows(cursor, "damage", COLUMNS, database.to_tuples(rows, COLUMNS, CAST))
+            await connection.commit()
+        return await fetch_damage(database), sorted(key[2] for key in database._statements)
+
+    loaded, sizes = with_database(tmp_path / "test.db", work)
+    assert loaded == expected(rows)
+    assert sizes == sorted(({8} if count >= 8 else set()) | {1 << bit for bit in range(3) if count % 8 & 1 << bit})
+
+class RecordingCursor:
+    """
+    Records the statements sent to the driver, with their rows of parameters.
+    """
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, query, params=()):
+        self.statements.append((query, [params]))
+
+    async def executemany(self, query, params):
+        self.statements.append((query, list(params)))
+
+@pytest.mark.parametrize("columns, count, sizes", [
+    # 2099 parameters hold 262 rows of 8 columns: 1000 rows are sent as 3 x 262 + 128 + 64 + 16 + 4 + 2.
+    (8, 1000, [262, 128, 64, 16, 4, 2]),
+    # Rows of 2 columns are bound by the 1000 rows of a `VALUES` clause rather than by the parameters.
+    (2, 2500, [1000, 256, 128, 64, 32, 16, 4]),
+    # A row wider than the parameter limit is still sent, one row per statement.
+    (2100, 3, [1]),
+])
+def test_insert_rows_respects_the_server_limits(columns, count, sizes):
+    database = Database("server", "db", "user", "pwd")
+    fieldnames = [f"column_{index}" for index in range(columns)]
+    rows = [tuple(f"{row}.{column}" for column in range(columns)) for row in range(count)]
+    cursor = RecordingCursor()
+    asyncio.run(database.insert_rows(cursor, "damage", fieldnames, rows))
+
+    sent = []
+    for query, params in cursor.statements:
+        size = query.count("(?")
+        assert query == database.insert_statement("damage", fieldnames, size)
+        assert size <= database.max_values_rows
+        assert size * columns <= max(database.max_parameters, columns)
+        assert all(len(values) == size * columns for values in params)
+        sent.append(size)
+        rows_sent = [values[i:i + columns] for values in params for i in range(0, len(values), columns)]
+        assert rows_sent == rows[:len(rows_sent)]
+        rows = rows[len(rows_sent):]
+    assert sent == sizes
+    assert rows == []
+    assert sorted(key[2] for key in database._statements) == sorted(sizes)
+
+def test_insert_statements_are_cached_per_table_and_columns():
+    database = Database("server", "db", "user", "pwd")
+    statement = database.insert_statement("damage", ["crash_id", "num_units"], 2)
+    assert statement == "INSERT INTO damage (crash_id, num_units) VALUES (?, ?), (?, ?)"
+    assert database.insert_statement("damage", ["crash_id", "num_units"], 2) is statement
+
+    database.insert_statement("damage", ["num_units", "crash_id"], 2)
+    database.insert_statement("crash", ["crash_id", "num_units"], 2)
+    database.insert_statement("damage", ["crash_id", "num_units"])
+    assert set(database._statements) == {
+        ("damage", ("crash_id", "num_units"), 2), ("damage", ("num_units", "crash_id"), 2),
+        ("crash", ("crash_id", "num_units"), 2), ("damage", ("crash_id", "num_units"), 1),
+    }
+    assert database.rows_per_statement(8) == 262
+    assert database.rows_per_statement(2) == database.rows_per_statement(1) == 1000
+    assert database.rows_per_statement(3000) == 1
+
+def test_pipelined_load(tmp_path):
+    csv_file = tmp_path / "damage.csv"
+    csv_file.write_text("".join(",".join(row) + "\n" for row in [COLUMNS] + [[row[column] for column in COLUMNS] for row in ROWS]))
+    checkpoints = Checkpoints(str(tmp_path / "checkpoints.json"))
+
+    async def work(database):
+        await create_damage(database)
+        loader = PipelinedLoader(database, batch_size=300, queue_size=2)
+        stats = await loader.load(str(csv_file), "damage", cast=CAST, commit_every=1000, checkpoints=checkpoints)
+        return stats, await fetch_damage(database)
+
+    stats, loaded = with_database(tmp_path / "test.db", work)
+    assert stats["rows"] == len(ROWS)
+    assert stats["queues"]["converted"]["max_depth"] <= 2
+    assert loaded == expected(ROWS)
+    assert checkpoints.get("damage") == len(ROWS)
+
+def fail_once(database, calls):
+    """
+    Makes the insertion of a batch raise a transient error once, after `calls` batches, its rows being written but not committed.
+    Returns the list the raised errors are appended to.
+    """
+    insert_rows, count, raised = database.insert_rows, 0, []
+
+    async def failing(*args, **kwargs):
+        nonlocal count
+        await insert_rows(*args, **kwargs)
+        count += 1
+        if count == calls:
+            raised.append(Exception("08S01", "Communication link failure"))
+            raise raised[-1]
+
+    database.insert_rows = failing
+    return raised
+
+@pytest.mark.parametrize("pool_size, parallel", [(1, False), (3, True)])
+def test_data_to_db_retries_from_the_last_commit(tmp_path, pool_size, parallel):
+    checkpoints = Checkpoints(str(tmp_path / "checkpoints.json"))
+
+    async def work(database):
+        await create_damage(database)
+        raised = fail_once(database, 4)
+        load = database.data_to_db_parallel if parallel else database.data_to_db
+        await load(make_data(ROWS), "damage", batch_size=300, cast=CAST, commit_every=600, checkpoints=checkpoints, backoff=0)
+        return raised, await fetch_damage(database)
+
+    raised, loaded = with_database(tmp_path / "test.db", work, pool_size)
+    assert len(raised) == 1
+    assert loaded == expected(ROWS)
+
+def test_data_to_db_gives_up_on_other_errors(tmp_path):
+    async def work(database):
+        await create_damage(database)
+        insert_rows = database.insert_rows
+
+        async def failing(cursor, *args, **kwargs):
+            await insert_rows(cursor, *args, **kwargs)
+            raise Exception("42000", "Syntax error")
+
+        database.insert_rows = failing
+        with pytest.raises(Exception, match="Syntax error"):
+            await database.data_to_db(make_data(ROWS), "damage", batch_size=300, cast=CAST, backoff=0)
+        return await fetch_damage(database)
+
+    assert with_database(tmp_path / "test.db", work) == []
+
+def test_pipelined_load_retries_from_the_last_commit(tmp_path):
+    csv_file = tmp_path / "damage.csv"
+    csv_file.write_text("".join(",".join(row) + "\n" for row in [COLUMNS] + [[row[column] for column in COLUMNS] for row in ROWS]))
+    checkpoints = Checkpoints(str(tmp_path / "checkpoints.json"))
+
+    async def work(database):
+        await create_damage(database)
+        raised = fail_once(database, 5)
+        loader = PipelinedLoader(database, batch_size=300, queue_size=2)
+        stats = await loader.load(str(csv_file), "damage", cast=CAST, commit_every=600, checkpoints=checkpoints, backoff=0)
+        return raised, stats, await fetch_damage(database)
+
+    raised, stats, loaded = with_database(tmp_path / "test.db", work)
+    assert len(raised) == 1
+    assert stats["rows"] == len(ROWS)
+    assert loaded == expected(ROWS)
+    assert checkpoints.get("damage") == len(ROWS)
@@ -0,0 +1,105 @@
+import csv
+import json
+import random
+import pytest
+
+from modules.data import Data
+from modules.fact import FactBuilder
+from modules.utils import file_checksum
+from conftest import make_data
+
+COLUMNS = ["CRASH_ID", "PERSON_ID", "VEHICLE_ID", "DAMAGE", "NUM_UNITS", "MAKE"]
+
+def join_data(obj1: Data, obj2: Data, column: str) -> Data:
+    """
+    Joins two datasets as the exports did before the facts were streamed: the last row of `obj1`
+    holding a key is joined to every row of `obj2`, whose values win.
+    """
+    obj1_dict = {row[column]: row for row in obj1.rows}
+    joined_data = []
+    for row in obj2.rows:
+        key = row[column]
+        if key in obj1_dict:
+            joined_data.append({**obj1_dict[key], **{k: v for k, v in row.items() if k != column}})
+    return make_data(joined_data)
+
+@pytest.fixture
+def datasets():
+    """
+    Builds crashes, people and vehicles sharing some columns, with reports held by several crashes
+    and vehicles, and people without any.
+    """
+    generator = random.Random(6)
+    reports = [f"JA{number:04d}" for number in range(60)]
+    crashes = [{"RD_NO": generator.choice(reports), "CRASH_ID": f"CRS_{index}", "DAMAGE": "CRASH",
+                "NUM_UNITS": str(generator.randrange(1, 4)), "CRASH_YEAR": str(generator.randrange(2014, 2017)),
+                "CRASH_MONTH": f"{generator.randrange(1, 4):02d}"} for index in range(70)]
+    vehicles = [{"RD_NO": generator.choice(reports), "VEHICLE_ID": f"VHC_{index}", "NUM_UNITS": "VEHICLE",
+                 "MAKE": generator.choice(["FORD", "TOYOTA", ""])} for index in range(80)]
+    people = [{"RD_NO": generator.choice(reports), "PERSON_ID": f"PRS_{index}", "VEHICLE_ID": f"PERSON_{index}",
+               "DAMAGE": str(generator.randrange(0, 1500))} for index in range(120)]
+    return make_data(crashes), make_data(people), make_data(vehicles)
+
+def test_facts_match_the_joined_datasets(datasets, tmp_path):
+    crashes, people, vehicles = datasets
+    merged = join_data(vehicles, join_data(crashes, people, "RD_NO"), "RD_NO")
+    expected = [{column: row.get(column) for column in COLUMNS} for row in merged.rows]
+    assert 0 < len(expected) < len(people.rows)
+
+    builder = FactBuilder(people, [crashes, vehicles], "RD_NO", COLUMNS)
+    assert list(builder.stream()) == expected
+
+    assert builder.export_csv(tmp_path / "damage.csv") == len(expected)
+    with open(tmp_path / "damage.csv", newline="", encoding="utf-8") as file:
+        assert list(csv.DictReader(file)) == [{column: str(value) for column, value in row.items()} for row in expected]
+
+def test_missing_columns_are_rejected(datasets):
+    crashes, people, vehicles = datasets
+    with pytest.raises(KeyError):
+        FactBuilder(people, [crashes, vehicles], "RD_NO", COLUMNS + ["MISSING"])
+    with pytest.raises(KeyError):
+        FactBuilder(people, [crashes, vehicles], "CRASH_ID", COLUMNS)
+
+def read_rows(file_path):
+    with open(file_path, newline="", encoding="utf-8") as file:
+        return list(csv.DictReader(file))
+
+def test_partitions_split_the_facts(datasets, tmp_path):
+    crashes, people, vehicles = datasets
+    builder = FactBuilder(people, [crashes, vehicles], "RD_NO", COLUMNS)
+    facts = list(builder.stream(["CRASH_YEAR", "CRASH_MONTH"]))
+    (tmp_path / "damage_2013_12.csv").write_text("stale")
+    (tmp_path / "vehicle_2016_01.csv").write_text("other table")
+
+    manifest = builder.export_partitions(tmp_path, "damage", ["CRASH_YEAR", "CRASH_MONTH"])
+    assert json.loads((tmp_path / "manifest.json").read_text()) == manifest
+    assert manifest["columns"] == COLUMNS and manifest["partition_by"] == ["CRASH_YEAR", "CRASH_MONTH"]
+
+    expected = sorted({(fact["CRASH_YEAR"], fact["CRASH_MONTH"]) for fact in facts})
+    assert [tuple(partition["values"].values()) for partition in manifest["partitions"]] == expected
+    for partition in manifest["partitions"]:
+        year, month = partition["values"]["CRASH_YEAR"], partition["values"]["CRASH_MONTH"]
+        assert partition["name"] == f"{year}_{month}" and partition["file"] == f"damage_{year}_{month}.csv"
+        rows = read_rows(tmp_path / partition["file"])
+        assert rows == [{column: str(fact[column]) for column in COLUMNS} for fact in facts
+                        if (fact["CRASH_YEAR"], fact["CRASH_MONTH"]) == (year, month)]
+        assert partition["rows"] == len(rows)
+        assert partition["checksum"] == file_checksum(tmp_path / partition["file"])
+
+    assert not (tmp_path / "damage_2013_12.csv").exists()
+    assert (tmp_path / "vehicle_2016_01.csv").exists()
+
+def test_partitions_of_a_previous_export_are_removed(datasets, tmp_path):
+    crashes, people, vehicles = datasets
+    builder = FactBuilder(people, [crashes, vehicles], "RD_NO", COLUMNS)
+    monthly = builder.export_partitions(tmp_path, "damage", ["CRASH_YEAR", "CRASH_MONTH"])
+    yearly = builder.export_partitions(tmp_path, "damage", ["CRASH_YEAR"])
+
+    files = sorted(path.name for path in tmp_path.glob("damage_*.csv"))
+    assert files == sorted(partition["file"] for partition in yearly["partitions"])
+    assert sum(partition["rows"] for partition in yearly["partitions"]) == \
+        sum(partition["rows"] for partition in monthly["partitions"])
+
+    # An unchanged partition keeps its checksum from one export to the next.
+    again = builder.export_partitions(tmp_path, "damage", ["CRASH_YEAR"])
+    assert [partition["checksum"] for partition in again["partitions"]] == [partition["checksum"] for partition in yearly["partitions"]]
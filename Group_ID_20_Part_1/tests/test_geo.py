@@ -0,0 +1,75 @@
+import geohash
+import pytest
+from collections import defaultdict
+
+from modules.cube import Cube
+from modules.geo import GeoIndex
+
+@pytest.fixture
+def points(joined):
+    """
+    Aggregates the facts by point with plain loops, counting the crashes of every point.
+    """
+    totals = defaultdict(lambda: {"DAMAGE_COST": 0.0, "NUM_UNITS": 0.0, "NUM_FACTS": 0, "CRASHES": set()})
+    for row in joined:
+        point = totals[row["Location"]["LOCATION_POINT"]]
+        point["DAMAGE_COST"] += float(row["FACT"]["DAMAGE_COST"] or 0)
+        point["NUM_UNITS"] += float(row["FACT"]["NUM_UNITS"])
+        point["NUM_FACTS"] += 1
+        point["CRASHES"].add(row["FACT"]["CRASH_ID"])
+    return totals
+
+def brute_sum(points, keep):
+    totals = {"DAMAGE_COST": 0.0, "NUM_UNITS": 0.0, "NUM_FACTS": 0.0, "NUM_CRASHES": 0.0}
+    for point, values in points.items():
+        if keep(point):
+            for measure in ("DAMAGE_COST", "NUM_UNITS", "NUM_FACTS"):
+                totals[measure] += values[measure]
+            totals["NUM_CRASHES"] += len(values["CRASHES"])
+    return totals
+
+@pytest.fixture
+def index(star):
+    return GeoIndex.build(Cube.from_data(*star))
+
+def test_prefixes(index, points):
+    assert len(index) == len(points)
+    some_point = sorted(points)[len(points) // 2]
+    for length in (1, 3, 4, 5, 6, 8, 9, 12):
+        prefix = some_point[:length]
+        assert index.prefix(prefix) == pytest.approx(brute_sum(points, lambda point: point.startswith(prefix)))
+    assert index.prefix("zzzz") == pytest.approx(brute_sum(points, lambda point: False))
+
+@pytest.mark.parametrize("box", [
+    (41.85, -87.66, 41.91, -87.60),
+    (41.76, -87.75, 41.98, -87.57),
+    (41.80, -87.62, 41.81, -87.61),
+    (40.00, -80.00, 40.10, -79.90),
+])
+def test_bounding_boxes(index, points, box):
+    south, west, north, east = box
+
+    def inside(point):
+        latitude, longitude, _, _ = geohash.decode_exactly(point)
+        return south <= latitude <= north and west <= longitude <= east
+
+    assert index.bbox(*box) == pytest.approx(brute_sum(points, inside))
+
+def test_heat_map(index, points):
+    cells = {row["GEOHASH"]: row for row in index.heat_map(5).rows}
+    assert set(cells) == {point[:5] for point in points}
+    for cell, row in cells.items():
+        assert row["DAMAGE_COST"] == pytest.approx(brute_sum(points, lambda point: point.startswith(cell))["DAMAGE_COST"])
+
+def test_added_facts_match_a_rebuild(star, index, tmp_path):
+    facts, dimensions = star
+    # The facts are split by crash year, as the partitions are, so that no crash is counted twice.
+    years = {row["DATE_ID"]: row["CRASH_YEAR"] for row in dimensions["Date"].rows}
+    incremental = GeoIndex.build(Cube.from_data([fact for fact in facts if years[fact["DATE_ID"]] != "2016"], dimensions))
+    incremental.add(Cube.from_data([fact for fact in facts if years[fact["DATE_ID"]] == "2016"], dimensions))
+    assert incremental.points.tolist() == index.points.tolist()
+    assert incremental.values == pytest.approx(index.values)
+
+    index.save(tmp_path / "geo_index.json")
+    loaded = GeoIndex.from_file(tmp_path / "geo_index.json")
+    assert loaded.bbox(41.76, -87.75, 41.98, -87.57) == pytest.approx(index.bbox(41.76, -87.75, 41.98, -87.57))
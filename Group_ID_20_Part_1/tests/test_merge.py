@@ -0,0 +1,86 @@
+import pytest
+
+from modules.merge import MergeLoader
+from modules.schema import Schema
+from conftest import make_data, with_database
+
+SCHEMA = """
+CREATE TABLE date(
+    date_id INT PRIMARY KEY,
+    crash_year INT NOT NULL
+);
+
+CREATE TABLE vehicle(
+    vehicle_id INT PRIMARY KEY
+);
+
+CREATE TABLE damage(
+    date_id INT NOT NULL,
+    vehicle_id INT NOT NULL,
+    damage_cost FLOAT NULL,
+    FOREIGN KEY (date_id) REFERENCES date(date_id),
+    FOREIGN KEY (vehicle_id) REFERENCES vehicle(vehicle_id)
+);
+"""
+
+DATES = [{"date_id": str(index), "crash_year": str(2014 + index % 3)} for index in range(30)]
+VEHICLES = [{"vehicle_id": str(index)} for index in range(400)]
+FACTS = [{"date_id": str(index % 30), "vehicle_id": str(index), "damage_cost": str(index * 10.0)} for index in range(400)]
+CAST = {"date_id": int, "vehicle_id": int, "damage_cost": float}
+
+def write_csv(path, rows):
+    path.write_text("".join(",".join(row) + "\n" for row in [list(rows[0])] + [list(row.values()) for row in rows]))
+    return str(path)
+
+def load(tmp_path, steps):
+    """
+    Creates the tables, loads the dimensions, runs each `(facts, scope)` step and returns the facts after each one.
+    """
+    async def work(database):
+        schema = Schema(SCHEMA)
+        await database.execute_query(database.translate(SCHEMA))
+        merger = MergeLoader(database, schema, batch_size=64)
+        loaded = []
+        for facts, scope in steps:
+            await merger.load(make_data(DATES), "date", cast=CAST)
+            await merger.load(make_data(VEHICLES), "vehicle", cast=CAST)
+            stats = await merger.load(
+                write_csv(tmp_path / "damage.csv", facts), "damage", cast=CAST,
+                scope="target.date_id IN (SELECT date_id FROM date WHERE crash_year = ?)" if scope else None,
+                params=(scope,) if scope else ()
+            )
+            assert stats["rows"] == len(facts)
+            assert await database.fetch_query("SELECT COUNT(*) FROM date") == [(len(DATES),)]
+            loaded.append(sorted(await database.fetch_query("SELECT date_id, vehicle_id, damage_cost FROM damage")))
+        return loaded
+
+    return with_database(tmp_path / "test.db", work)
+
+def rows(facts):
+    return sorted((int(fact["date_id"]), int(fact["vehicle_id"]), float(fact["damage_cost"])) for fact in facts)
+
+def test_loading_a_partition_twice_changes_nothing(tmp_path):
+    first, second = load(tmp_path, [(FACTS, None), (FACTS, None)])
+    assert first == second == rows(FACTS)
+
+def test_merge_updates_the_present_rows_with_the_last_staged(tmp_path):
+    changed = [dict(fact, damage_cost=str(float(fact["damage_cost"]) + 1)) for fact in FACTS[:100]]
+    repeated = [dict(fact, damage_cost="-1.0") for fact in FACTS[:50]]
+    _, merged = load(tmp_path, [(FACTS[:300], None), (repeated + changed + FACTS[300:], None)])
+    assert merged == rows(changed + FACTS[100:])
+
+@pytest.mark.parametrize("year", [2014, 2016])
+def test_scoped_merge_replaces_the_partition(tmp_path, year):
+    years = {date["date_id"]: int(date["crash_year"]) for date in DATES}
+    partition = [fact for fact in FACTS if years[fact["date_id"]] == year]
+    kept = partition[::2]
+    _, replaced, again = load(tmp_path, [(FACTS, None), (kept, year), (kept, year)])
+    assert replaced == again == rows(kept + [fact for fact in FACTS if years[fact["date_id"]] != year])
+
+def test_grain_index_is_only_built_for_upserts():
+    schema = Schema(SCHEMA)
+    grain = "CREATE CLUSTERED INDEX cix_damage_grain ON damage (date_id, vehicle_id);"
+    assert schema.grain_index_statements() == [grain]
+    assert grain not in schema.index_statements()
+    assert grain in schema.index_statements(grain=True)
+    assert schema.index_statements(columnstore=True, grain=True) == ["CREATE CLUSTERED COLUMNSTORE INDEX cci_damage ON damage;"]
@@ -0,0 +1,114 @@
+import os
+import csv
+import math
+import random
+import pytest
+
+from modules.cube import Cube
+from modules.reports import Reports, ssis_value
+from conftest import make_data, join
+
+OUTPUTS = os.path.join(os.path.dirname(__file__), "..", "SSIS", "output_assignments")
+
+# Members of the derived levels, and a `DATE` row falling into them.
+PERIODS = {"DAY": {"CRASH_TIME": "10:00:00", "CRASH_PERIOD": "AM"}, "NIGHT": {"CRASH_TIME": "10:00:00", "CRASH_PERIOD": "PM"}}
+SEASONS = {"SUMMER_SPRING": "SUMMER", "WINTER_AUTUMN": "WINTER"}
+
+# Members of the attributes a group of an output does not set, so that every report can be computed.
+DEFAULTS = {
+    "Crash": {"WEATHER_CONDITION": "CLEAR"},
+    "Date": {"CRASH_MONTH": "1", "CRASH_YEAR": "2014", "CRASH_SEASON": "WINTER", **PERIODS["DAY"]},
+    "Location": {"BEAT_OF_OCCURRENCE": "111"},
+    "Vehicle": {"VEHICLE_TYPE": "PASSENGER"},
+    "Person": {"CITY": "CHICAGO", "STATE": "IL", "SEX": "M", "AGE": "30"},
+}
+
+def read_output(name):
+    with open(os.path.join(OUTPUTS, Reports.OUTPUTS[name]), newline="", encoding="utf-8") as file:
+        return file.read()
+
+def ssis_cube(groups):
+    """
+    Builds a cube whose facts add up to the groups of an `SSIS` output: every group is split into
+    two facts, the integral part and the rest of its measure, which add up to it exactly.
+
+    Args:
+        `groups (List[Tuple[Dict[str, Dict[str, str]], str, float]])`: The members of every group by dimension, the measure and its total.
+    """
+    members = {name: [] for name in Cube.DIMENSIONS}
+    facts = []
+    for members_of_group, measure, total in groups:
+        for part in (math.floor(total), total - math.floor(total)):
+            fact = {"DAMAGE_COST": "0", "NUM_UNITS": "0", measure: repr(part)}
+            for name, (_, key) in Cube.DIMENSIONS.items():
+                fact[key] = f"{name}_{len(facts)}"
+                members[name].append({key: fact[key], **DEFAULTS.get(name, {}), **members_of_group.get(name, {})})
+            facts.append(fact)
+    return Cube.from_data(facts, {name: make_data(rows) for name, rows in members.items()})
+
+def export(reports, name, tmp_path):
+    """
+    Writes every report with `export_all`, returning the text of the output of one of them.
+    """
+    reports.export_all(tmp_path)
+    with open(os.path.join(tmp_path, Reports.OUTPUTS[name]), newline="", encoding="utf-8") as file:
+        return file.read()
+
+def test_damage_by_period_matches_7b(tmp_path):
+    expected = read_output("7b")
+    groups = []
+    for row in csv.DictReader(expected.splitlines()):
+        date = {"CRASH_MONTH": row["crash_month"], "CRASH_YEAR": row["crash_year"], **PERIODS[row["crash_period"]]}
+        groups.append(({"Date": date}, "DAMAGE_COST", float(row["total_damage_cost"])))
+
+    reports = Reports(ssis_cube(groups))
+    assert export(reports, "7b", tmp_path) == expected
+    assert export(reports, "7b_percentages", tmp_path) == read_output("7b_percentages")
+
+def test_damage_by_weather_vehicle_matches_8b(tmp_path):
+    expected = read_output("8b")
+    groups = [
+        ({"Crash": {"WEATHER_CONDITION": row["weather_condition"]}, "Vehicle": {"VEHICLE_TYPE": row["vehicle_type"]}},
+         "DAMAGE_COST", float(row["total_damage_cost"]))
+        for row in csv.DictReader(expected.splitlines())
+    ]
+    # The groups of the `SSIS` aggregate come out in hash order.
+    rows = list(csv.reader(export(Reports(ssis_cube(groups)), "8b", tmp_path).splitlines()))
+    expected_rows = list(csv.reader(expected.splitlines()))
+    assert rows[0] == expected_rows[0]
+    assert rows[1:] == sorted(expected_rows[1:])
+
+def test_units_by_beat_season_matches_9b(tmp_path):
+    expected = read_output("9b")
+    groups = [
+        ({"Location": {"BEAT_OF_OCCURRENCE": row["beat_of_occurrence"]}, "Date": {"CRASH_SEASON": SEASONS[row["crash_season"]]}},
+         "NUM_UNITS", float(row["total_num_units"]))
+        for row in csv.DictReader(expected.splitlines())
+    ]
+    assert export(Reports(ssis_cube(groups)), "9b", tmp_path) == expected
+
+def test_damage_listing_follows_6b(star, tmp_path):
+    # No output of `assignment_6b` is kept, so the listing is checked against the facts: every
+    # fact with its vehicle type and person, by decreasing damage cost, ties in fact order.
+    facts, dimensions = star
+    generator = random.Random(2)
+    for row in dimensions["Person"].rows:
+        row.update({"CITY": generator.choice(["CHICAGO", "EVANSTON"]), "STATE": "IL", "AGE": str(generator.randrange(16, 90))})
+    dimensions["Person"].fieldnames += ["CITY", "STATE", "AGE"]
+    for row in dimensions["Date"].rows:
+        row.update(PERIODS[generator.choice(list(PERIODS))])
+
+    joined = sorted(join(facts, dimensions), key=lambda row: -float(row["FACT"]["DAMAGE_COST"] or 0))
+    expected = [
+        [ssis_value(float(row["FACT"]["DAMAGE_COST"] or 0)), row["Vehicle"]["VEHICLE_TYPE"],
+         row["Person"]["CITY"], row["Person"]["STATE"], row["Person"]["SEX"], row["Person"]["AGE"]]
+        for row in joined
+    ]
+    text = export(Reports(Cube.from_data(facts, dimensions)), "6b", tmp_path)
+    rows = list(csv.reader(text.splitlines()))
+    assert rows[0] == Reports.LISTING_FIELDNAMES
+    assert rows[1:] == expected
+
+@pytest.mark.parametrize("text", ["8529.6870179061461", "4.1446786612703984E-2", "139727.38752731684", "109.0654308271684", "0"])
+def test_values_are_formatted_as_ssis(text):
+    assert ssis_value(float(text)) == text
@@ -0,0 +1,62 @@
+import json
+import pytest
+
+from modules.cube import Cube
+from modules.rollup import RollupStore, ROLLUPS
+
+QUERIES = [
+    (["Date.CRASH_YEAR"], ["DAMAGE_COST", "NUM_FACTS"], None),
+    (["Date.CRASH_MONTH"], ["NUM_UNITS"], {"Date.CRASH_YEAR": [2014, 2016]}),
+    (["Date.CRASH_YEAR"], ["DAMAGE_COST"], {"Date.CRASH_MONTH": "03"}),
+    (["Vehicle.VEHICLE_TYPE"], ["DAMAGE_COST", "NUM_UNITS"], {"Crash.WEATHER_CONDITION": ["", "RAIN"]}),
+    (["Location.BEAT_OF_OCCURRENCE", "Date.CRASH_SEASON"], ["NUM_FACTS"], {"Date.CRASH_SEASON": "WINTER"}),
+]
+
+def assert_same_rows(actual, expected):
+    assert actual.fieldnames == expected.fieldnames
+    assert len(actual.rows) == len(expected.rows)
+    for left, right in zip(actual.rows, expected.rows):
+        assert left == pytest.approx(right)
+
+@pytest.fixture
+def cube(star):
+    return Cube.from_data(*star)
+
+@pytest.mark.parametrize("rows, measures, where", QUERIES)
+def test_answers_match_the_cube(cube, rows, measures, where):
+    store = RollupStore.build(cube)
+    assert store.match(rows, measures, where) is not None
+    assert_same_rows(store.query(cube, rows, measures, where), cube.query(rows, measures, where))
+
+def test_falls_back_to_the_cube(cube):
+    store = RollupStore.build(cube)
+    rows, measures = ["Person.SEX"], ["NUM_CRASHES"]
+    assert store.match(rows, measures) is None
+    assert_same_rows(store.query(cube, rows, measures), cube.query(rows, measures))
+
+def test_appended_facts_match_a_rebuild(star, cube):
+    facts, dimensions = star
+    store = RollupStore.build(Cube.from_data(facts[:250], dimensions))
+    appended = store.append_facts(facts[250:], dimensions)
+    assert len(appended) == len(Cube.from_data(facts[250:], dimensions))
+
+    rebuilt = RollupStore.build(cube)
+    for name in ROLLUPS:
+        assert store.rollups[name].groups.keys() == rebuilt.rollups[name].groups.keys()
+        for key, values in rebuilt.rollups[name].groups.items():
+            assert store.rollups[name].groups[key] == pytest.approx(values)
+
+@pytest.mark.parametrize("legacy", [False, True])
+def test_saved_rollups_answer_the_same(cube, tmp_path, legacy):
+    store = RollupStore.build(cube)
+    store.partitions = {"damage_2014.csv": "checksum"}
+    file_path = tmp_path / "rollups.json"
+    store.save(file_path)
+    if legacy:
+        # Files written before the partitions were recorded only hold the rollups.
+        file_path.write_text(json.dumps(json.loads(file_path.read_text())["rollups"]))
+
+    loaded = RollupStore.from_file(file_path)
+    assert loaded.partitions == ({} if legacy else store.partitions)
+    for rows, measures, where in QUERIES:
+        assert_same_rows(loaded.query(cube, rows, measures, where), cube.query(rows, measures, where))
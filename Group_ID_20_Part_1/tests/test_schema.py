@@ -0,0 +1,52 @@
+import os
+import pytest
+
+from modules.schema import Schema, SURROGATE_KEYS
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "..", "sql", "schema.sql")
+
+@pytest.fixture
+def schemas():
+    return Schema.from_file(SCHEMA_FILE), Schema.from_file(SCHEMA_FILE, integer_keys=True)
+
+def test_integer_keys_retype_only_the_keys(schemas):
+    schema, integer_schema = schemas
+    assert list(integer_schema.tables) == list(schema.tables)
+    for name, table in schema.tables.items():
+        integer_table = integer_schema.tables[name]
+        keys = {column.lower() for column in SURROGATE_KEYS[name.upper()]}
+        assert integer_table.primary_key == table.primary_key
+        assert integer_table.unique == table.unique
+        assert integer_table.foreign_keys == table.foreign_keys
+        assert [column[0] for column in integer_table.columns] == [column[0] for column in table.columns]
+        for (column, column_type, nullable), (_, integer_type, integer_nullable) in zip(table.columns, integer_table.columns):
+            assert integer_type == ("INT" if column in keys else column_type)
+            assert integer_nullable == nullable
+
+def test_integer_keys_follow_the_references():
+    sql = """
+        CREATE TABLE crash(
+            crash_id NVARCHAR(50) PRIMARY KEY,
+            crash_id_source NVARCHAR(50) NOT NULL,
+            rd_no NCHAR(8) UNIQUE NOT NULL
+        );
+        CREATE TABLE note(
+            note_id NVARCHAR(50) NOT NULL,
+            crash_id NVARCHAR(50) NOT NULL, rd_no NCHAR(8) NOT NULL,
+            FOREIGN KEY(crash_id) REFERENCES crash(crash_id) ON DELETE CASCADE,
+            FOREIGN KEY(rd_no) REFERENCES crash(rd_no)
+        );
+    """
+    rewritten = Schema.integer_keys(sql)
+    types = {(name, column): column_type for name, table in Schema(rewritten).tables.items() for column, column_type, _ in table.columns}
+    assert types == {
+        ("crash", "crash_id"): "INT",
+        ("crash", "crash_id_source"): "NVARCHAR(50)",
+        ("crash", "rd_no"): "NCHAR(8)",
+        ("note", "note_id"): "NVARCHAR(50)",
+        ("note", "crash_id"): "INT",
+        ("note", "rd_no"): "NCHAR(8)",
+    }
+    # Only the types change, and rewriting twice changes nothing more.
+    assert rewritten.replace("INT", "NVARCHAR(50)") == sql
+    assert Schema.integer_keys(rewritten) == rewritten
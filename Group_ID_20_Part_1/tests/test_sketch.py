@@ -0,0 +1,56 @@
+import math
+import random
+import pytest
+from collections import Counter
+
+from modules.sketch import HyperLogLog, CountMinSketch, StratifiedSample
+
+@pytest.mark.parametrize("distinct", [50, 3000, 40000])
+def test_hyperloglog_within_its_error(distinct):
+    sketch = HyperLogLog(12)
+    for value in range(distinct):
+        sketch.add(f"CRS_{value:06d}")
+        sketch.add(f"CRS_{value:06d}")
+    assert abs(sketch.count() - distinct) <= 4 * sketch.error * distinct
+
+def test_hyperloglog_merges_into_the_union():
+    left, right, union = HyperLogLog(10), HyperLogLog(10), HyperLogLog(10)
+    for value in range(5000):
+        (left if value % 3 else right).add(value)
+        union.add(value)
+    assert (left.merge(right).registers == union.registers).all()
+
+def test_count_min_never_undercounts():
+    generator = random.Random(3)
+    stream = [f"BEAT_{int(generator.paretovariate(1.2))}" for _ in range(20000)]
+    counts = Counter(stream)
+    sketch = CountMinSketch(width=256, depth=5, capacity=16)
+    for value in stream:
+        sketch.add(value)
+
+    overcounts = [sketch.estimate(value) - count for value, count in counts.items()]
+    assert min(overcounts) >= 0
+    # The bound holds for each value with probability 1 - e^-depth.
+    assert sum(overcount <= sketch.error for overcount in overcounts) >= (1 - 2 * math.exp(-5)) * len(counts)
+    assert [value for value, _ in sketch.heavy_hitters(3)] == [value for value, _ in counts.most_common(3)]
+
+def test_stratified_sample_is_exact_below_capacity():
+    generator = random.Random(5)
+    rows = [{"CRASH_YEAR": str(2014 + index % 3), "DAMAGE_COST": str(generator.randrange(0, 1500))} for index in range(900)]
+    sample = StratifiedSample(["CRASH_YEAR"], capacity=1000)
+    for row in rows:
+        sample.add(row)
+    total, margin = sample.estimate("DAMAGE_COST", {"CRASH_YEAR": 2015})
+    assert total == pytest.approx(sum(float(row["DAMAGE_COST"]) for row in rows if row["CRASH_YEAR"] == "2015"))
+    assert margin == 0
+
+def test_stratified_sample_covers_the_total():
+    generator = random.Random(8)
+    rows = [{"CRASH_YEAR": str(2014 + index % 3), "DAMAGE_COST": str(generator.randrange(0, 1500))} for index in range(30000)]
+    sample = StratifiedSample(["CRASH_YEAR"], capacity=500, seed=1)
+    for row in rows:
+        sample.add(row)
+    count, _ = sample.estimate()
+    total, margin = sample.estimate("DAMAGE_COST")
+    assert count == len(rows)
+    assert abs(total - sum(float(row["DAMAGE_COST"]) for row in rows)) <= 2 * margin
@@ -0,0 +1,68 @@
+import os
+import asyncio
+import sqlite3
+import pytest
+
+from modules.schema import Schema
+from modules.sqlite import SQLitePool, split_statements
+from conftest import with_database
+
+def test_pool_never_opens_more_than_its_size(tmp_path):
+    async def run():
+        pool = SQLitePool(str(tmp_path / "test.db"), 2)
+        in_use, peak = 0, 0
+
+        async def work():
+            nonlocal in_use, peak
+            async with pool.acquire():
+                in_use += 1
+                peak = max(peak, in_use)
+                await asyncio.sleep(0.01)
+                in_use -= 1
+
+        await asyncio.gather(*[work() for _ in range(8)])
+        opened = len(pool._connections)
+        await pool.wait_closed()
+        return opened, peak
+
+    assert asyncio.run(run()) == (2, 2)
+
+def test_split_statements_keeps_the_literals():
+    script = "CREATE TABLE t (a TEXT);\nINSERT INTO t VALUES ('x;y'); -- done; really\nINSERT INTO \"t\" VALUES ('z');"
+    assert split_statements(script) == [
+        "CREATE TABLE t (a TEXT);",
+        "INSERT INTO t VALUES ('x;y');",
+        "-- done; really\nINSERT INTO \"t\" VALUES ('z');",
+    ]
+    assert split_statements("SELECT 1") == ["SELECT 1"]
+
+def test_scripts_run_in_the_current_transaction(tmp_path):
+    async def work(database):
+        await database.execute_query("CREATE TABLE t (a TEXT)")
+        async with database.acquire() as connection, connection.cursor() as cursor:
+            await cursor.execute("INSERT INTO t VALUES ('x;y'); INSERT INTO t VALUES ('z');")
+            await connection.rollback()
+        rolled_back = await database.fetch_query("SELECT a FROM t")
+        await database.execute_query("INSERT INTO t VALUES ('x;y'); INSERT INTO t VALUES ('z');")
+        return rolled_back, sorted(await database.fetch_query("SELECT a FROM t"))
+
+    assert with_database(tmp_path / "test.db", work) == ([], [("x;y",), ("z",)])
+
+def test_heap_and_key_statements():
+    schema = Schema.from_file(os.path.join(os.path.dirname(__file__), "..", "sql", "schema.sql"))
+    keys = schema.key_statements()
+    for table in schema.tables.values():
+        assert (f"ALTER TABLE {table.name} ADD CONSTRAINT pk_{table.name} PRIMARY KEY ({table.primary_key});" in keys) == bool(table.primary_key)
+        for column in table.unique:
+            assert f"ALTER TABLE {table.name} ADD CONSTRAINT uq_{table.name}_{column} UNIQUE ({column});" in keys
+    assert len(keys) == sum(bool(table.primary_key) + len(table.unique) for table in schema.tables.values())
+
+    # The heaps accept the rows the keys would reject, so that the keys are checked once, after the load.
+    connection = sqlite3.connect(":memory:")
+    connection.executescript("\n".join(schema.heap_statements()))
+    connection.executemany("INSERT INTO date (date_id, crash_time, crash_period, crash_day, crash_month, crash_year, "
+                           "crash_day_of_week, crash_season, date_police_notified) VALUES (?, '10:00:00', 'AM', 1, 1, 2015, 'THURSDAY', 'WINTER', ?)",
+                           [("D1", "2015-01-01"), ("D1", "2015-01-02")])
+    assert connection.execute("SELECT COUNT(*) FROM date").fetchone() == (2,)
+    with pytest.raises(sqlite3.IntegrityError):
+        connection.execute("INSERT INTO date (date_id) VALUES ('D2')")
@@ -0,0 +1,48 @@
+import random
+import pytest
+
+from modules.cube import Cube
+from modules.topk import TopK
+from conftest import brute_query
+
+@pytest.mark.parametrize("k", [1, 3, 50])
+def test_heaps_keep_the_best_items(k):
+    generator = random.Random(k)
+    entries = [(generator.choice("ABCD"), float(generator.randrange(20)), index) for index in range(400)]
+    heaps = TopK(k)
+    heaps.extend(entries)
+
+    for group in "ABCD":
+        # Sorting is stable, so that the first item pushed wins among the same scores.
+        expected = sorted(((score, item) for entry_group, score, item in entries if entry_group == group), key=lambda entry: -entry[0])
+        assert heaps.result(group) == expected[:k]
+    assert heaps.result("E") == []
+    with pytest.raises(ValueError):
+        TopK(0)
+
+@pytest.mark.parametrize("rows, items, k, where", [
+    (["Date.CRASH_YEAR"], ["Vehicle.VEHICLE_TYPE", "Crash.WEATHER_CONDITION"], 1, None),
+    (["Date.CRASH_YEAR", "Date.CRASH_SEASON"], ["Vehicle.MAKE"], 3, None),
+    (["Vehicle.VEHICLE_TYPE"], ["Location.BEAT_OF_OCCURRENCE"], 4, {"Date.CRASH_YEAR": ["2015"]}),
+    ([], ["Person.SEX", "Vehicle.MODEL"], 2, None),
+])
+def test_top_matches_the_sorted_groups(star, joined, rows, items, k, where):
+    result = Cube.from_data(*star).top(rows, items, "DAMAGE_COST", k, where)
+    expected = brute_query(joined, rows + items, where)
+    attributes = [level.partition(".")[2] for level in rows + items]
+
+    groups = {}
+    for key, totals in expected.items():
+        groups.setdefault(key[:len(rows)], []).append(totals["DAMAGE_COST"])
+
+    selected = {}
+    for row in result.rows:
+        key = tuple(str(row[attribute]) for attribute in attributes)
+        # Every combination returned holds the measure it is ranked by.
+        assert row["DAMAGE_COST"] == pytest.approx(expected[key]["DAMAGE_COST"])
+        selected.setdefault(key[:len(rows)], []).append(row["DAMAGE_COST"])
+
+    assert list(selected) == sorted(selected, key=lambda group: [int(member) if member.isdigit() else member for member in group])
+    assert selected.keys() == groups.keys()
+    for group, values in groups.items():
+        assert selected[group] == pytest.approx(sorted(values, reverse=True)[:k])
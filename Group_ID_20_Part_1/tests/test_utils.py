@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+
+from modules.utils import gather_limited
+
+def test_gather_limited_bounds_the_concurrency():
+    running, peak = 0, 0
+
+    async def work(value):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+        return value
+
+    assert asyncio.run(gather_limited([work(value) for value in range(10)], 3)) == list(range(10))
+    assert peak == 3
+
+def test_gather_limited_cancels_the_others_on_failure():
+    cancelled, finished = [], []
+
+    async def work(value):
+        try:
+            await asyncio.sleep(0.001 if value == 1 else 1)
+            if value == 1:
+                raise ValueError("Failed load")
+            finished.append(value)
+        except asyncio.CancelledError:
+            cancelled.append(value)
+            raise
+
+    async def run():
+        with pytest.raises(ValueError, match="Failed load"):
+            await gather_limited([work(value) for value in range(6)], 3)
+        await asyncio.sleep(0)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    # The loads started alongside the failed one are cancelled, and none of the others completes.
+    assert {0, 2} <= set(cancelled)
+    assert finished == []
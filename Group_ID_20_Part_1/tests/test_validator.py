@@ -0,0 +1,107 @@
+import csv
+import pytest
+
+from modules.schema import Schema
+from modules.validator import Validator
+from conftest import make_data
+
+SCHEMA = Schema("""
+CREATE TABLE crash(
+    crash_id NVARCHAR(10) PRIMARY KEY,
+    rd_no NCHAR(8) UNIQUE NOT NULL,
+    crash_date DATETIME NOT NULL,
+    crash_time TIME NULL,
+    posted_speed_limit INT NOT NULL,
+    latitude FLOAT NULL
+);
+
+CREATE TABLE damage(
+    crash_id NVARCHAR(10) NOT NULL,
+    damage_cost FLOAT NULL,
+    FOREIGN KEY (crash_id) REFERENCES crash(crash_id)
+);
+""")
+
+def crash(crash_id, **values):
+    row = {"CRASH_ID": crash_id, "RD_NO": f"JA{crash_id[-6:]}", "CRASH_DATE": "10/28/2014 01:00:00 PM",
+           "CRASH_TIME": "13:00:00", "POSTED_SPEED_LIMIT": "30", "LATITUDE": "41.88"}
+    row.update(values)
+    return row
+
+CRASHES = [
+    crash("CRS_000001"),
+    crash("CRS_000002", POSTED_SPEED_LIMIT="25.0", CRASH_DATE="2014-10-28 13:00:00", CRASH_TIME="", LATITUDE=""),
+    crash("CRS_000003", RD_NO=""),
+    crash("CRS_000004", RD_NO="JA0000040"),
+    crash("CRS_000005", POSTED_SPEED_LIMIT="30.5"),
+    crash("CRS_000006", POSTED_SPEED_LIMIT="3000000000"),
+    crash("CRS_000007", LATITUDE="north"),
+    crash("CRS_000008", CRASH_DATE="13/28/2014 01:00:00 PM"),
+    crash("CRS_000009", CRASH_DATE="01/01/1700 01:00:00 PM"),
+    crash("CRS_000010", CRASH_TIME="25:00:00"),
+    crash("CRS_000001", RD_NO="JA999999"),
+    crash("CRS_000011", RD_NO="JA000001"),
+    crash("CRS_0000012", POSTED_SPEED_LIMIT="x"),
+]
+
+EXPECTED = {
+    "CRS_000003": ["RD_NO:null"],
+    "CRS_000004": ["RD_NO:length"],
+    "CRS_000005": ["POSTED_SPEED_LIMIT:type"],
+    "CRS_000006": ["POSTED_SPEED_LIMIT:type"],
+    "CRS_000007": ["LATITUDE:type"],
+    "CRS_000008": ["CRASH_DATE:type"],
+    "CRS_000009": ["CRASH_DATE:type"],
+    "CRS_000010": ["CRASH_TIME:type"],
+    "CRS_000011": ["RD_NO:duplicate"],
+    "CRS_0000012": ["CRASH_ID:length", "POSTED_SPEED_LIMIT:type"],
+}
+
+def test_rejects_the_rows_violating_the_columns_and_keys(tmp_path):
+    validator = Validator(SCHEMA)
+    data = make_data([dict(row) for row in CRASHES])
+    quarantine_file = tmp_path / "quarantine" / "crash.csv"
+    assert validator.validate("crash", data, str(quarantine_file)) == len(EXPECTED) + 1
+
+    assert [row["CRASH_ID"] for row in data.rows] == ["CRS_000001", "CRS_000002"]
+    assert validator.keys["crash"] == {"CRS_000001", "CRS_000002"}
+    assert validator.quarantined == {"crash": len(EXPECTED) + 1}
+    assert validator.violations["crash"]["POSTED_SPEED_LIMIT:type"] == 3
+    assert validator.violations["crash"]["CRASH_ID:duplicate"] == 1
+
+    with open(quarantine_file, newline="", encoding="utf-8") as file:
+        quarantined = list(csv.DictReader(file))
+    assert list(quarantined[0]) == list(CRASHES[0]) + ["VIOLATIONS"]
+    # The duplicate of the first crash is reported on its key, the second one on its unique column.
+    assert [(row["CRASH_ID"], row["VIOLATIONS"]) for row in quarantined] == [
+        (row["CRASH_ID"], ";".join(EXPECTED.get(row["CRASH_ID"], ["CRASH_ID:duplicate"])))
+        for row in CRASHES[2:]
+    ]
+    assert quarantined[1]["RD_NO"] == "JA0000040"
+
+def test_rejects_the_orphans_across_datasets(tmp_path):
+    validator = Validator(SCHEMA)
+    with pytest.raises(KeyError, match="has not been validated yet"):
+        validator.validate("damage", make_data([{"CRASH_ID": "CRS_000001", "DAMAGE_COST": "500"}]))
+
+    validator.validate("crash", make_data([dict(row) for row in CRASHES]))
+    quarantine_file = tmp_path / "damage.csv"
+    for part in ([{"CRASH_ID": "CRS_000001", "DAMAGE_COST": "500"}, {"CRASH_ID": "CRS_000003", "DAMAGE_COST": "500"}],
+                 [{"CRASH_ID": "CRS_000002", "DAMAGE_COST": ""}, {"CRASH_ID": "", "DAMAGE_COST": "1.5"}]):
+        validator.validate("damage", make_data(part), str(quarantine_file))
+
+    assert validator.violations["damage"] == {"CRASH_ID:orphan": 1, "CRASH_ID:null": 1}
+    with open(quarantine_file, newline="", encoding="utf-8") as file:
+        assert [row["VIOLATIONS"] for row in csv.DictReader(file)] == ["CRASH_ID:orphan", "CRASH_ID:null"]
+    assert validator.report().split("\n")[1] == "`damage`: 2 rows quarantined (CRASH_ID:orphan x1, CRASH_ID:null x1)"
+
+def test_empty_and_valid_datasets(tmp_path):
+    validator = Validator(SCHEMA)
+    empty = make_data([])
+    empty.fieldnames = list(CRASHES[0])
+    assert validator.validate("crash", empty) == 0
+    assert validator.validate("crash", make_data([crash("CRS_000001")]), str(tmp_path / "crash.csv")) == 0
+    assert not (tmp_path / "crash.csv").exists()
+    assert validator.report() == ""
+    with pytest.raises(KeyError, match="crash_time"):
+        validator.validate("crash", make_data([{key: value for key, value in crash("CRS_000002").items() if key != "CRASH_TIME"}]))
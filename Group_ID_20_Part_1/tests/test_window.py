@@ -0,0 +1,62 @@
+import random
+import pytest
+
+from modules.window import Window
+from conftest import make_data
+
+@pytest.fixture
+def data():
+    """
+    Builds a query result sorted by location and year, with missing years and tied values.
+    """
+    generator = random.Random(11)
+    rows = []
+    for location in ("dp3w", "dp3x", "dp3y"):
+        for year in sorted(generator.sample(range(2014, 2020), 4)):
+            rows.append({"LOCATION_POINT": location, "CRASH_YEAR": year, "DAMAGE_COST": float(generator.choice([0, 250, 500, 500, 1500]))})
+    return make_data(rows)
+
+def partitions(rows):
+    groups = {}
+    for row in rows:
+        groups.setdefault(row["LOCATION_POINT"], []).append(row)
+    return groups.values()
+
+@pytest.mark.parametrize("offset", [1, 2])
+def test_lag_and_lead_follow_the_rows(data, offset):
+    Window(data, ["LOCATION_POINT"]).lag("DAMAGE_COST", offset, default=-1).lead("DAMAGE_COST", offset)
+    for group in partitions(data.rows):
+        for position, row in enumerate(group):
+            assert row["DAMAGE_COST_LAG"] == (group[position - offset]["DAMAGE_COST"] if position >= offset else -1)
+            assert row["DAMAGE_COST_LEAD"] == (group[position + offset]["DAMAGE_COST"] if position + offset < len(group) else None)
+
+def test_lag_and_change_follow_the_members(data):
+    Window(data, ["LOCATION_POINT"]).lag("DAMAGE_COST", by="CRASH_YEAR", name="PREVIOUS").change("DAMAGE_COST", by="CRASH_YEAR")
+    for group in partitions(data.rows):
+        by_year = {row["CRASH_YEAR"]: row["DAMAGE_COST"] for row in group}
+        for row in group:
+            previous = by_year.get(row["CRASH_YEAR"] - 1)
+            assert row["PREVIOUS"] == previous
+            expected = (row["DAMAGE_COST"] - previous) / previous * 100 if previous else 0
+            assert row["DAMAGE_COST_CHANGE"] == pytest.approx(expected)
+
+def test_running_total_percent_and_rank(data):
+    Window(data, ["LOCATION_POINT"]).running_total("DAMAGE_COST").percent_of_parent("DAMAGE_COST").rank("DAMAGE_COST")
+    for group in partitions(data.rows):
+        total = sum(row["DAMAGE_COST"] for row in group)
+        running = 0
+        for row in group:
+            running += row["DAMAGE_COST"]
+            assert row["DAMAGE_COST_RUNNING"] == pytest.approx(running)
+            assert row["DAMAGE_COST_PERCENT"] == pytest.approx(row["DAMAGE_COST"] / total * 100 if total else 0)
+            assert row["DAMAGE_COST_RANK"] == 1 + sum(other["DAMAGE_COST"] > row["DAMAGE_COST"] for other in group)
+
+def test_single_partition_and_empty_rows(data):
+    Window(data).rank("DAMAGE_COST", descending=False)
+    for row in data.rows:
+        assert row["DAMAGE_COST_RANK"] == 1 + sum(other["DAMAGE_COST"] < row["DAMAGE_COST"] for other in data.rows)
+
+    empty = make_data([])
+    empty.fieldnames = ["LOCATION_POINT", "DAMAGE_COST"]
+    Window(empty, ["LOCATION_POINT"]).lag("DAMAGE_COST").running_total("DAMAGE_COST").percent_of_parent("DAMAGE_COST")
+    assert empty.rows == []